@@ -12,6 +12,7 @@ import click_log
 from click_log import ColorFormatter
 
 from splitgraph.__version__ import __version__
+from splitgraph.commandline.cache import cache_c
 from splitgraph.commandline.cloud import cloud_c
 from splitgraph.commandline.engine import engine_c
 from splitgraph.commandline.example import example
@@ -183,6 +184,9 @@ cli.add_command(status_c)
 # Engine management
 cli.add_command(engine_c)
 
+# Object cache
+cli.add_command(cache_c)
+
 # Miscellaneous
 cli.add_command(mount_c)
 cli.add_command(rm_c)
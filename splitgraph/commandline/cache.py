@@ -0,0 +1,200 @@
+"""
+sgr commands related to the local object cache
+"""
+
+import click
+
+
+@click.group(name="cache")
+def cache_c():
+    """Inspect and tune the local object cache."""
+
+
+@click.command(name="simulate")
+@click.argument("trace", type=click.File("r"))
+@click.option(
+    "-s",
+    "--cache-size",
+    type=int,
+    default=None,
+    help="Size of the simulated cache, in MB. Default is SG_OBJECT_CACHE_SIZE.",
+)
+@click.option(
+    "-p",
+    "--policy",
+    multiple=True,
+    help="Eviction policy to simulate. Can be passed multiple times. Default is all policies.",
+)
+@click.option(
+    "-a",
+    "--admission-fraction",
+    type=float,
+    default=None,
+    help="Only keep objects larger than this fraction of the cache if they've been used at least twice.",
+)
+def simulate_c(trace, cache_size, policy, admission_fraction):
+    """
+    Replay an object access trace against different cache eviction policies.
+
+    The trace can be recorded by setting SG_OBJECT_ACCESS_TRACE to a file path. For every
+    policy, this outputs the fraction of object accesses and of bytes accessed that would have
+    been served from the cache.
+    """
+    from tabulate import tabulate
+    from splitgraph.config import CONFIG, get_singleton
+    from splitgraph.core.eviction import (
+        EVICTION_POLICIES,
+        SizeAdmissionPolicy,
+        get_eviction_policy,
+        read_trace,
+        simulate,
+    )
+    from splitgraph.core.output import pretty_size
+
+    if cache_size is None:
+        cache_size = int(get_singleton(CONFIG, "SG_OBJECT_CACHE_SIZE"))
+    cache_size *= 1024 * 1024
+    accesses = list(read_trace(trace))
+
+    results = []
+    for name in policy or EVICTION_POLICIES:
+        admission = (
+            SizeAdmissionPolicy(admission_fraction * cache_size)
+            if admission_fraction is not None
+            else None
+        )
+        result = simulate(
+            accesses,
+            cache_size,
+            get_eviction_policy(
+                name,
+                cache_size,
+                decay=float(get_singleton(CONFIG, "SG_EVICTION_DECAY")),
+                floor=float(get_singleton(CONFIG, "SG_EVICTION_FLOOR")) * 1024 * 1024,
+            ),
+            admission,
+            policy_name=name,
+        )
+        results.append(
+            (
+                result.policy,
+                result.hits,
+                result.misses,
+                "%.2f%%" % (result.hit_ratio * 100),
+                pretty_size(result.bytes_missed),
+                "%.2f%%" % (result.byte_hit_ratio * 100),
+                result.evictions,
+            )
+        )
+
+    click.echo(
+        tabulate(
+            results,
+            headers=[
+                "Policy",
+                "Hits",
+                "Misses",
+                "Hit ratio",
+                "Downloaded",
+                "Byte hit ratio",
+                "Evictions",
+            ],
+        )
+    )
+
+
+def _heat_bar(value: int, max_value: int, width: int = 20) -> str:
+    from splitgraph.config import SG_CMD_ASCII
+
+    char = "#" if SG_CMD_ASCII else "\u2588"
+    return char * max(1, round(width * value / max_value)) if value else ""
+
+
+@click.command(name="stats")
+@click.option("-t", "--tables", "tables_only", is_flag=True, help="Only show table statistics.")
+@click.option("-o", "--objects", "objects_only", is_flag=True, help="Only show object statistics.")
+@click.option("-n", "--limit", type=int, default=20, help="Number of tables/objects to show.")
+@click.option("--reset", is_flag=True, help="Delete all recorded statistics.")
+def stats_c(tables_only, objects_only, limit, reset):
+    """
+    Show table and object access heat maps.
+
+    Access statistics are only recorded when SG_ACCESS_STATS is set to true. For every table, this
+    shows how many times it has been queried, what fraction of its fragments queries had to scan
+    after filtering them (lower is better) and which qualifiers (columns and operators) were
+    recently used to query it. For every object, this shows how many times it has been used and
+    how much data that amounted to.
+    """
+    from tabulate import tabulate
+    from splitgraph.core.access_stats import (
+        get_object_access_stats,
+        get_table_access_stats,
+        reset_access_stats,
+    )
+    from splitgraph.core.output import pretty_size
+    from splitgraph.engine import get_engine
+
+    engine = get_engine()
+    if reset:
+        reset_access_stats(engine)
+        engine.commit()
+        click.echo("Access statistics deleted.")
+        return
+
+    if not objects_only:
+        table_stats = get_table_access_stats(engine, limit)
+        max_queries = max([t.query_count for t in table_stats], default=0)
+        click.echo(
+            tabulate(
+                [
+                    (
+                        "%s%s:%s"
+                        % (
+                            t.namespace + "/" if t.namespace else "",
+                            t.repository,
+                            t.image_hash[:12],
+                        ),
+                        t.table_name,
+                        t.query_count,
+                        _heat_bar(t.query_count, max_queries),
+                        "%.2f%%" % (t.filter_hit_rate * 100),
+                        t.rows_scanned,
+                        "; ".join(
+                            " AND ".join(
+                                "(%s)" % " OR ".join("%s %s" % tuple(q) for q in clause)
+                                for clause in shape
+                            )
+                            for shape in t.last_quals
+                        ),
+                    )
+                    for t in table_stats
+                ],
+                headers=["Image", "Table", "Queries", "", "Scanned", "Rows", "Recent quals"],
+            )
+        )
+        if not tables_only:
+            click.echo()
+
+    if not tables_only:
+        object_stats = get_object_access_stats(engine, limit)
+        max_scans = max([o.scan_count for o in object_stats], default=0)
+        click.echo(
+            tabulate(
+                [
+                    (
+                        o.object_id,
+                        o.scan_count,
+                        _heat_bar(o.scan_count, max_scans),
+                        pretty_size(o.bytes_read),
+                        o.rows_read,
+                        o.last_scanned,
+                    )
+                    for o in object_stats
+                ],
+                headers=["Object", "Scans", "", "Read", "Rows", "Last used"],
+            )
+        )
+
+
+cache_c.add_command(simulate_c)
+cache_c.add_command(stats_c)
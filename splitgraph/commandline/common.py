@@ -1,6 +1,7 @@
 """
 Various common functions used by the command line interface.
 """
+import itertools
 import json
 from functools import wraps
 from typing import Optional, Tuple, TYPE_CHECKING, Union, List, Any
@@ -199,6 +200,10 @@ def emit_sql_results(results, use_json=False, show_all=False):
     if results is None:
         return
 
+    if not isinstance(results, list):
+        # Only consume as much of a streamed result as we need to show.
+        results = list(itertools.islice(results, None if show_all else 11))
+
     if len(results) > 10 and not show_all:
         click.echo(sql_results_to_str(results[:10], use_json))
         if not json:
@@ -26,7 +26,15 @@ from splitgraph.exceptions import TableNotFoundError
     is_flag=True,
     default=False,
 )
-def checkout_c(image_spec, force, uncheckout, layered):
+@click.option(
+    "-j",
+    "--jobs",
+    default=int(get_singleton(CONFIG, "SG_CHECKOUT_WORKERS")),
+    type=int,
+    help="Number of tables to materialize in parallel, each one using a separate engine connection. "
+    "The default value is governed by the SG_CHECKOUT_WORKERS configuration parameter.",
+)
+def checkout_c(image_spec, force, uncheckout, layered, jobs):
     """
     Check out a Splitgraph image into a Postgres schema.
 
@@ -48,6 +56,10 @@ def checkout_c(image_spec, force, uncheckout, layered):
     changes) and removes the HEAD pointer.
 
     If ``--force`` isn't passed and the schema has pending changes, this will fail.
+
+    If ``-j`` or ``--jobs`` is greater than 1, multiple tables are materialized at the same time. In this
+    case, all objects required by the image are downloaded first and the new tables replace the currently
+    checked out ones only once all of them have been materialized.
     """
     repository, image = image_spec
 
@@ -55,7 +67,7 @@ def checkout_c(image_spec, force, uncheckout, layered):
         repository.uncheckout(force=force)
         click.echo("Unchecked out %s." % (str(repository),))
     else:
-        image.checkout(force=force, layered=layered)
+        image.checkout(force=force, layered=layered, workers=jobs)
         click.echo("Checked out %s:%s." % (str(repository), image.image_hash[:12]))
 
 
@@ -77,6 +89,14 @@ def checkout_c(image_spec, force, uncheckout, layered):
     help="Split new tables into chunks of this many rows (by primary key). The default "
     "value is governed by the SG_COMMIT_CHUNK_SIZE configuration parameter.",
 )
+@click.option(
+    "-j",
+    "--jobs",
+    default=int(get_singleton(CONFIG, "SG_COMMIT_WORKERS")),
+    type=int,
+    help="Number of parallel engine connections to use when splitting new tables into chunks. "
+    "The default value is governed by the SG_COMMIT_WORKERS configuration parameter.",
+)
 @click.option(
     "-k",
     "--chunk-sort-keys",
@@ -105,6 +125,7 @@ def commit_c(
     repository,
     snap,
     chunk_size,
+    jobs,
     chunk_sort_keys,
     split_changesets,
     index_options,
@@ -120,7 +141,8 @@ def commit_c(
 
     When a table is stored as a full snapshot, `--chunk-size` sets the maximum size, in rows, of the fragments
     that the table will be split into (default is no splitting). The splitting is done by the
-    table's primary key.
+    table's primary key. `--jobs` sets the number of parallel engine connections used to create these
+    fragments.
 
     If `--split-changesets` is passed, delta-compressed changes will also be split up according to the original
     table chunk boundaries. For example, if there's a change to the first and the 20000th row of a table that was
@@ -166,6 +188,7 @@ def commit_c(
         extra_indexes=index_options,
         in_fragment_order=chunk_sort_keys,
         overwrite=overwrite,
+        workers=jobs,
     ).image_hash
     click.echo("Committed %s as %s." % (str(repository), new_hash[:12]))
 
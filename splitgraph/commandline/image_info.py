@@ -2,6 +2,7 @@
 sgr commands related to getting information out of / about images
 """
 
+import re
 from collections import Counter, defaultdict
 from typing import List, Optional, Tuple, Union, Dict, cast, TYPE_CHECKING
 
@@ -395,7 +396,12 @@ def sql_c(sql, schema, image, show_all, json, no_transaction):
     if not image:
         if schema:
             engine.run_sql("SET search_path TO %s", (schema,))
-        results = engine.run_sql(sql)
+        # Stream the results of read-only queries so that we don't have to
+        # load all of them into memory just to show the first few.
+        if _is_single_query(sql):
+            results = engine.run_sql_iter(sql)
+        else:
+            results = engine.run_sql(sql)
     else:
         repo, image = image
         with image.query_schema() as s:
@@ -404,6 +410,20 @@ def sql_c(sql, schema, image, show_all, json, no_transaction):
     emit_sql_results(results, use_json=json, show_all=show_all)
 
 
+def _is_single_query(sql: str) -> bool:
+    # Check if the statement is a single query that a server-side cursor can be declared for.
+    # SELECT ... INTO creates a table and data-modifying CTEs (WITH ... INSERT/UPDATE/DELETE)
+    # change data, so neither can be run through DECLARE CURSOR.
+    sql = sql.strip().rstrip(";")
+    words = sql.split(None, 1)
+    return (
+        bool(words)
+        and words[0].lower() in ("select", "values", "table")
+        and ";" not in sql
+        and not re.search(r"\binto\b", sql, re.IGNORECASE)
+    )
+
+
 def _emit_repository_data(repositories, engine):
     from splitgraph.engine import ResultShape
     from tabulate import tabulate
@@ -30,7 +30,16 @@ DEFAULTS: ConfigDict = {
     # by about 50% (101s -> 53s) for the version that runs a single big join against multiple images.
     "SG_LQ_TUNING": "SET enable_sort=off; SET enable_hashagg=on;",
     "SG_COMMIT_CHUNK_SIZE": "10000",
+    "SG_COMMIT_WORKERS": "1",
+    "SG_COMMIT_CHANGESET_BATCH_SIZE": "100000",
+    "SG_CHECKOUT_WORKERS": "1",
+    "SG_MATERIALIZE_BULK_LOAD": "true",
+    "SG_CHECKOUT_INCREMENTAL": "true",
     "SG_ENGINE_POOL": "16",
+    "SG_ENGINE_KEEPALIVE": "false",
+    "SG_ENGINE_IDLE_TIMEOUT": "300",
+    "SG_ENGINE_MAX_CONN_AGE": "3600",
+    "SG_ENGINE_FETCH_SIZE": "10000",
     "SG_CONFIG_FILE": "",
     "SG_META_SCHEMA": "splitgraph_meta",
     "SG_CONFIG_DIRS": "",
@@ -44,9 +53,24 @@ DEFAULTS: ConfigDict = {
     "SG_S3_KEY": "",
     "SG_S3_PWD": "",
     "SG_OBJECT_CACHE_SIZE": "10240",
+    "SG_OBJECT_PK_CACHE_SIZE": "100000",
+    "SG_OBJECT_META_CACHE_SIZE": "64",
+    "SG_QUERY_PLAN_CACHE_SIZE": "1000",
+    "SG_QUERY_WORKERS": "1",
+    "SG_LQ_MERGE_ON_READ": "true",
+    "SG_LQ_DOWNLOAD_BATCH_SIZE": "0",
+    "SG_OBJECT_TRANSFER_PART_SIZE": "64",
+    "SG_OBJECT_TRANSFER_THREADS": "4",
+    "SG_OBJECT_LEASE_TIME": "0",
     "SG_EVICTION_DECAY": "0.002",
     "SG_EVICTION_FLOOR": "1",
     "SG_EVICTION_MIN_FRACTION": "0.05",
+    "SG_EVICTION_POLICY": "decay",
+    "SG_EVICTION_ADMISSION_MAX_FRACTION": "1",
+    "SG_OBJECT_ACCESS_TRACE": "",
+    "SG_ACCESS_STATS": "false",
+    "SG_ACCESS_STATS_FLUSH_INTERVAL": "30",
+    "SG_ACCESS_STATS_QUALS": "5",
     "SG_FDW_CLASS": "splitgraph.core.fdw_checkout.QueryingForeignDataWrapper",
     "SG_CMD_ASCII": "false",
     # Update checks and metrics
@@ -140,7 +164,16 @@ This can also be changed by passing `--verbosity` to `sgr`, e.g. `sgr --verbosit
     "SG_ENGINE_OBJECT_PATH": "Path on the engine's filesystem where Splitgraph physical object files are stored.",
     "SG_LQ_TUNING": "Postgres query planner configuration for Splitfile execution and table imports. This is run before a layered query is executed and allows to tune query planning in case of LQ performance issues. For possible values, see the [PostgreSQL documentation](https://www.postgresql.org/docs/12/runtime-config-query.html).",
     "SG_COMMIT_CHUNK_SIZE": "Default chunk size when `sgr commit` is run. Can be overriden in the command line client by passing `--chunk-size`",
+    "SG_COMMIT_WORKERS": "Number of parallel engine connections used to split new tables into chunks when `sgr commit` is run. Can be overriden in the command line client by passing `--jobs`",
+    "SG_COMMIT_CHANGESET_BATCH_SIZE": "Maximum number of changed rows to process in memory at a time when committing changes to an existing table. Tables with more pending changes than this are stored as multiple patch fragments.",
+    "SG_CHECKOUT_WORKERS": "Number of tables to materialize at the same time when checking out an image, each one on a separate engine connection (capped by SG_ENGINE_POOL). All objects required by the image are downloaded up front, so the object cache has to be large enough to hold all of them. Default 1 (tables are materialized one by one).",
+    "SG_MATERIALIZE_BULK_LOAD": "When materializing a table, load fragments that don't overlap any other fragments with plain INSERTs into a table without a primary key (only overlapping fragments get applied to one another) and add the primary key at the end. Set to false to apply every fragment to the table in order instead.",
+    "SG_CHECKOUT_INCREMENTAL": "When checking out an image over a checked out image without pending changes, update tables whose fragments are the same as in the current image plus some new fragments at the end in place by applying only the new fragments. Set to false to always rematerialize all tables.",
     "SG_ENGINE_POOL": "Size of the connection pool used to download/upload objects. Note that in the case of layered querying with joins on multiple tables, each table will use this many parallel threads to download objects, which can overwhelm the engine. Decrease this value in that case.",
+    "SG_ENGINE_KEEPALIVE": "Set to `true` to keep connections to the engine open between transactions and reuse them instead of reconnecting every time. Note that this means session state (e.g. settings changed with `SET`) persists between transactions.",
+    "SG_ENGINE_IDLE_TIMEOUT": "If `SG_ENGINE_KEEPALIVE` is enabled, time in seconds after which an unused connection to the engine gets closed instead of being reused.",
+    "SG_ENGINE_MAX_CONN_AGE": "If `SG_ENGINE_KEEPALIVE` is enabled, time in seconds after which a connection to the engine gets closed instead of being reused.",
+    "SG_ENGINE_FETCH_SIZE": "Number of rows fetched from the engine at a time when streaming large query results (e.g. in layered querying or `sgr sql`).",
     "SG_CONFIG_FILE": "Location of the Splitgraph configuration file. By default, Splitgraph looks for the configuration in `~/.splitgraph/.sgconfig` and then the current directory.",
     "SG_META_SCHEMA": "Name of the metadata schema. Note that whilst this can be changed, it hasn't been tested and won't be taken into account by engines connecting to this one.",
     "SG_CONFIG_DIRS": "List of directories used to look up the configuration file.",
@@ -154,9 +187,24 @@ This can also be changed by passing `--verbosity` to `sgr`, e.g. `sgr --verbosit
     "SG_S3_KEY": "S3 access key.",
     "SG_S3_PWD": "S3 secure key.",
     "SG_OBJECT_CACHE_SIZE": "Object cache size, in megabytes. This only concerns objects downloaded from an external location or a remote engine. When there is no space in the object cache, an eviction is run and objects that haven't been used recently or that are small enough to be easily redownloaded are deleted to free up space.",
-    "SG_EVICTION_DECAY": "Significance of recent usage time and object size in cache eviction. See documentation for splitgraph.core.object_manager for an explanation.",
-    "SG_EVICTION_FLOOR": "Significance of recent usage time and object size in cache eviction. See documentation for splitgraph.core.object_manager for an explanation.",
+    "SG_OBJECT_PK_CACHE_SIZE": "Maximum number of object primary key ranges kept in memory. These are used to plan layered queries and split changes into fragments without querying the metadata engine every time.",
+    "SG_OBJECT_META_CACHE_SIZE": "Maximum size of the in-memory cache of object metadata (including object indexes), in megabytes. This cache is used to avoid fetching the metadata for the same objects from the engine every time a table is queried.",
+    "SG_QUERY_PLAN_CACHE_SIZE": "Maximum number of layered query plans (lists of fragments to scan for given table, qualifiers and columns) kept in memory, so that repeated queries to the same table don't need to filter its fragments again.",
+    "SG_QUERY_WORKERS": "Number of engine connections used to scan independent fragments of a table in parallel when it's queried with `Table.query()` without being checked out. Fragments scanned in parallel have their results buffered in memory instead of streamed.",
+    "SG_LQ_MERGE_ON_READ": "If true (default), layered querying resolves groups of overlapping fragments with a single read-only query instead of applying them to a temporary staging table. Tables without a primary key always use a staging table.",
+    "SG_LQ_DOWNLOAD_BATCH_SIZE": "If set, layered querying downloads objects in batches of this many objects in the order they're queried in, returning the first results before the rest of the objects are downloaded. By default (0), all objects required by a query are downloaded before it starts.",
+    "SG_OBJECT_TRANSFER_PART_SIZE": "Size of the parts, in megabytes, that the engine splits large objects into when downloading them from S3-compatible storage. The parts are downloaded in parallel and a failed download only refetches the parts that weren't downloaded.",
+    "SG_OBJECT_TRANSFER_THREADS": "Number of parts of a single object that the engine downloads from S3-compatible storage at the same time. Note that this is on top of multiple objects being downloaded in parallel.",
+    "SG_OBJECT_LEASE_TIME": "If set, a process that has used cached objects keeps its claims on them for this many seconds, so that queries that use the same objects again don't have to write to the object cache status table. Objects that are leased can't be evicted by other processes. Leases are released when the process exits normally, but a process that crashes (or a Postgres backend running layered queries) can keep them indefinitely. Disabled by default (0).",
+    "SG_EVICTION_DECAY": "Significance of recent usage time and object size in cache eviction. See documentation for splitgraph.core.eviction.DecayPolicy for an explanation.",
+    "SG_EVICTION_FLOOR": "Significance of recent usage time and object size in cache eviction. See documentation for splitgraph.core.eviction.DecayPolicy for an explanation.",
     "SG_EVICTION_MIN_FRACTION": "Minimum fraction of the total cache size that has to get freed when an eviction is run. This is to avoid frequent evictions.",
+    "SG_EVICTION_POLICY": "Policy used to choose objects to evict from the cache: one of `decay` (default, see SG_EVICTION_DECAY), `lru`, `lfu`, `gdsf` or `arc`. State of the `lfu`, `gdsf` and `arc` policies is kept per process: it's seeded from the access counts and last usage times of cached objects. Use `sgr cache simulate` to compare policies on a recorded access trace.",
+    "SG_EVICTION_ADMISSION_MAX_FRACTION": "Objects larger than this fraction of the cache size are evicted as soon as they're not in use unless they've been used at least twice, so that one-off scans of large objects don't flush the cache. Disabled by default (1).",
+    "SG_OBJECT_ACCESS_TRACE": "If set, path to a file that the object manager appends object accesses to (as CSV: timestamp, object ID, size), for use with `sgr cache simulate`.",
+    "SG_ACCESS_STATS": "Set to `true` to record object and table access statistics (how often objects are used and tables are queried, how many fragments queries scan and which qualifiers they use) on the engine. Use `sgr cache stats` to view them.",
+    "SG_ACCESS_STATS_FLUSH_INTERVAL": "Access statistics are accumulated in memory and written out to the engine at most every this many seconds (and on exit).",
+    "SG_ACCESS_STATS_QUALS": "Number of the most recent distinct qualifier shapes (columns and operators) to keep in access statistics for every table.",
     "SG_FDW_CLASS": "Name of the class used by the layered querying foreign data wrapper on the engine. Internal.",
     "SG_CMD_ASCII": "Set to `true` to disable Unicode output in sgr. Note that `sgr sql` will still output Unicode data.",
     "SG_UPDATE_REMOTE": "Name of the Splitgraph registry to check for sgr updates.",
@@ -0,0 +1,309 @@
+"""
+Object and table access statistics.
+
+When `SG_ACCESS_STATS` is enabled, object managers record how often every object is used
+(and how many bytes and rows that amounts to) and layered queries record how often every
+table is queried, how many of its fragments the queries had to scan after filtering and
+what qualifiers they used. This can be used to inform cache sizing, prefetching and
+rechunking of tables.
+
+To avoid writing to the engine on every query, statistics are accumulated in memory and
+written out in batches every `SG_ACCESS_STATS_FLUSH_INTERVAL` seconds (and when the
+process exits).
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, OrderedDict
+from datetime import datetime as dt
+from typing import Any, DefaultDict, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from psycopg2.sql import SQL, Identifier
+
+from splitgraph.config import CONFIG, SPLITGRAPH_META_SCHEMA, get_singleton
+from splitgraph.core.types import Quals
+from splitgraph.engine import ResultShape
+
+if TYPE_CHECKING:
+    from splitgraph.core.table import Table
+    from splitgraph.engine.postgres.engine import PsycopgEngine
+
+
+class ObjectAccessStats(NamedTuple):
+    object_id: str
+    scan_count: int
+    bytes_read: int
+    rows_read: int
+    last_scanned: dt
+
+
+class TableAccessStats(NamedTuple):
+    namespace: str
+    repository: str
+    image_hash: str
+    table_name: str
+    query_count: int
+    fragments_total: int
+    fragments_scanned: int
+    rows_scanned: int
+    last_quals: List[Any]
+    last_queried: dt
+
+    @property
+    def filter_hit_rate(self) -> float:
+        """Fraction of the table's fragments that queries had to scan."""
+        return self.fragments_scanned / max(self.fragments_total, 1)
+
+
+_TableKey = Tuple[str, str, str, str]
+
+
+def qual_shape(quals: Optional[Quals]) -> List[List[List[str]]]:
+    """
+    Strip the values out of the qualifiers, leaving only the columns and operators.
+
+    :param quals: List of qualifiers in conjunctive normal form.
+    :return: List of OR-clauses, each one a sorted list of [column, operator].
+    """
+    return [
+        sorted([[column, operator] for column, operator, _ in clause]) for clause in quals or []
+    ]
+
+
+class AccessStatsRecorder:
+    """Accumulates access statistics in memory and writes them out to the engine in batches."""
+
+    def __init__(self, engine: "PsycopgEngine") -> None:
+        self.engine = engine
+        self.flush_interval = float(get_singleton(CONFIG, "SG_ACCESS_STATS_FLUSH_INTERVAL"))
+        self.max_quals = int(get_singleton(CONFIG, "SG_ACCESS_STATS_QUALS"))
+        self.last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Object ID -> [scan_count, bytes_read, rows_read, last_scanned]
+        self._objects: Dict[str, List[Any]] = {}
+        # Table -> [query_count, fragments_total, fragments_scanned, rows_scanned, last_queried]
+        self._tables: Dict[_TableKey, List[Any]] = {}
+        # Table -> qual shape (JSON) -> None, most recent last
+        self._quals: DefaultDict[_TableKey, "OrderedDict[str, None]"] = defaultdict(OrderedDict)
+
+    def record_objects(self, objects: List[Tuple[str, int, int]]) -> None:
+        """
+        Record objects being used.
+
+        :param objects: List of (object ID, size, number of rows)
+        """
+        now = dt.utcnow()
+        with self._lock:
+            for object_id, size, rows in objects:
+                stats = self._objects.setdefault(object_id, [0, 0, 0, now])
+                stats[0] += 1
+                stats[1] += size
+                stats[2] += rows
+                stats[3] = now
+
+    def record_table_query(
+        self,
+        table: "Table",
+        quals: Optional[Quals],
+        fragments_total: int,
+        fragments_scanned: int,
+        rows_scanned: int,
+    ) -> None:
+        """
+        Record a query against a table.
+
+        :param table: Table that was queried
+        :param quals: Qualifiers that the query used
+        :param fragments_total: Number of fragments in the table
+        :param fragments_scanned: Number of fragments the query had to scan
+        :param rows_scanned: Estimated number of rows the query had to scan
+        """
+        key = (
+            table.repository.namespace,
+            table.repository.repository,
+            table.image.image_hash,
+            table.table_name,
+        )
+        now = dt.utcnow()
+        with self._lock:
+            stats = self._tables.setdefault(key, [0, 0, 0, 0, now])
+            stats[0] += 1
+            stats[1] += fragments_total
+            stats[2] += fragments_scanned
+            stats[3] += rows_scanned
+            stats[4] = now
+
+            if quals:
+                table_quals = self._quals[key]
+                shape = json.dumps(qual_shape(quals))
+                table_quals.pop(shape, None)
+                table_quals[shape] = None
+                while len(table_quals) > self.max_quals:
+                    table_quals.popitem(last=False)
+
+    def flush_if_needed(self) -> None:
+        """Write out the statistics if they haven't been written out for a while."""
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def clear(self) -> None:
+        """Discard the statistics that haven't been written out yet."""
+        with self._lock:
+            self._objects = {}
+            self._tables = {}
+            self._quals = defaultdict(OrderedDict)
+
+    def flush(self) -> None:
+        """Write out the accumulated statistics. This doesn't commit the transaction."""
+        with self._lock:
+            objects, self._objects = self._objects, {}
+            tables, self._tables = self._tables, {}
+            quals, self._quals = self._quals, defaultdict(OrderedDict)
+            self.last_flush = time.monotonic()
+
+        # Upsert rows in a consistent order to avoid deadlocks with other processes.
+        if objects:
+            self.engine.run_sql_batch(
+                SQL(
+                    "INSERT INTO {0}.object_access_stats "
+                    "(object_id, scan_count, bytes_read, rows_read, last_scanned) "
+                    "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (object_id) DO UPDATE SET "
+                    "scan_count = object_access_stats.scan_count + EXCLUDED.scan_count, "
+                    "bytes_read = object_access_stats.bytes_read + EXCLUDED.bytes_read, "
+                    "rows_read = object_access_stats.rows_read + EXCLUDED.rows_read, "
+                    "last_scanned = EXCLUDED.last_scanned"
+                ).format(Identifier(SPLITGRAPH_META_SCHEMA)),
+                [(object_id, *objects[object_id]) for object_id in sorted(objects)],
+            )
+        if tables:
+            # Prepend new qualifier shapes to the ones already recorded, keeping
+            # the most recent `max_quals` distinct shapes.
+            self.engine.run_sql_batch(
+                SQL(
+                    "INSERT INTO {0}.table_access_stats "
+                    "(namespace, repository, image_hash, table_name, query_count, fragments_total, "
+                    "fragments_scanned, rows_scanned, last_queried, last_quals) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                    "ON CONFLICT (namespace, repository, image_hash, table_name) DO UPDATE SET "
+                    "query_count = table_access_stats.query_count + EXCLUDED.query_count, "
+                    "fragments_total = table_access_stats.fragments_total "
+                    "+ EXCLUDED.fragments_total, "
+                    "fragments_scanned = table_access_stats.fragments_scanned "
+                    "+ EXCLUDED.fragments_scanned, "
+                    "rows_scanned = table_access_stats.rows_scanned + EXCLUDED.rows_scanned, "
+                    "last_queried = EXCLUDED.last_queried, "
+                    "last_quals = (SELECT COALESCE(jsonb_agg(q ORDER BY i), '[]') FROM "
+                    "(SELECT q, min(i) AS i FROM jsonb_array_elements("
+                    "EXCLUDED.last_quals || table_access_stats.last_quals) "
+                    "WITH ORDINALITY AS t(q, i) GROUP BY q ORDER BY i LIMIT %s) s)"
+                ).format(Identifier(SPLITGRAPH_META_SCHEMA)),
+                [
+                    (
+                        *key,
+                        *tables[key],
+                        json.dumps([json.loads(q) for q in reversed(quals.get(key, {}))]),
+                        self.max_quals,
+                    )
+                    for key in sorted(tables)
+                ],
+            )
+        if objects or tables:
+            logging.debug(
+                "Flushed access statistics for %d object(s) and %d table(s)",
+                len(objects),
+                len(tables),
+            )
+
+
+# Access statistics recorders in this process (engine name -> recorder)
+_RECORDERS: Dict[str, AccessStatsRecorder] = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+def get_access_stats_recorder(engine: "PsycopgEngine") -> Optional[AccessStatsRecorder]:
+    """
+    Get the access statistics recorder for an engine.
+
+    :return: Recorder or None if access statistics are disabled.
+    """
+    if get_singleton(CONFIG, "SG_ACCESS_STATS") != "true":
+        return None
+    key = engine.name or ""
+    with _RECORDERS_LOCK:
+        if key not in _RECORDERS:
+            _RECORDERS[key] = AccessStatsRecorder(engine)
+        return _RECORDERS[key]
+
+
+@atexit.register
+def _flush_all_recorders() -> None:
+    for recorder in list(_RECORDERS.values()):
+        try:
+            recorder.flush()
+            recorder.engine.commit()
+        except Exception:  # pragma: no cover
+            logging.exception("Error writing out access statistics on %s", recorder.engine.name)
+
+
+def get_object_access_stats(
+    engine: "PsycopgEngine", limit: Optional[int] = None
+) -> List[ObjectAccessStats]:
+    """
+    Get access statistics for objects, most used first.
+
+    :param engine: Engine
+    :param limit: Maximum number of objects to return.
+    """
+    query = SQL(
+        "SELECT object_id, scan_count, bytes_read, rows_read, last_scanned "
+        "FROM {}.object_access_stats ORDER BY scan_count DESC, bytes_read DESC, object_id"
+    ).format(Identifier(SPLITGRAPH_META_SCHEMA))
+    args: Tuple = ()
+    if limit is not None:
+        query += SQL(" LIMIT %s")
+        args = (limit,)
+    return [
+        ObjectAccessStats(*r)
+        for r in engine.run_sql(query, args, return_shape=ResultShape.MANY_MANY) or []
+    ]
+
+
+def get_table_access_stats(
+    engine: "PsycopgEngine", limit: Optional[int] = None
+) -> List[TableAccessStats]:
+    """
+    Get access statistics for tables, most queried first.
+
+    :param engine: Engine
+    :param limit: Maximum number of tables to return.
+    """
+    query = SQL(
+        "SELECT namespace, repository, image_hash, table_name, query_count, fragments_total, "
+        "fragments_scanned, rows_scanned, last_quals, last_queried "
+        "FROM {}.table_access_stats ORDER BY query_count DESC, "
+        "namespace, repository, image_hash, table_name"
+    ).format(Identifier(SPLITGRAPH_META_SCHEMA))
+    args: Tuple = ()
+    if limit is not None:
+        query += SQL(" LIMIT %s")
+        args = (limit,)
+    return [
+        TableAccessStats(*r)
+        for r in engine.run_sql(query, args, return_shape=ResultShape.MANY_MANY) or []
+    ]
+
+
+def reset_access_stats(engine: "PsycopgEngine") -> None:
+    """Delete all access statistics recorded on an engine."""
+    with _RECORDERS_LOCK:
+        recorder = _RECORDERS.get(engine.name or "")
+    if recorder:
+        recorder.clear()
+    engine.run_sql(
+        SQL("TRUNCATE {0}.object_access_stats, {0}.table_access_stats").format(
+            Identifier(SPLITGRAPH_META_SCHEMA)
+        )
+    )
@@ -4,18 +4,33 @@ Common internal functions used by Splitgraph commands.
 import logging
 import os
 import sys
+import threading
+from collections import OrderedDict
 from datetime import date, datetime, time
 from decimal import Decimal
 from functools import wraps
 from pkgutil import get_data
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING, cast, Set
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+    cast,
+    Set,
+)
 
-from psycopg2.sql import Identifier, SQL
+from psycopg2.sql import Identifier, SQL, Composed
 
 from splitgraph.config import SPLITGRAPH_META_SCHEMA, SPLITGRAPH_API_SCHEMA
 from splitgraph.core.migration import source_files_to_apply, set_installed_version
 from splitgraph.core.output import parse_dt, parse_date
 from splitgraph.core.sql import select
+from splitgraph.engine import ResultShape
 from splitgraph.exceptions import (
     EngineInitializationError,
     ImageNotFoundError,
@@ -26,6 +41,7 @@ if TYPE_CHECKING:
     from splitgraph.engine.postgres.engine import PsycopgEngine, PostgresEngine
     from splitgraph.core.image import Image
     from splitgraph.core.repository import Repository
+    from splitgraph.core.types import TableSchema
 
 META_TABLES = [
     "images",
@@ -36,6 +52,8 @@ META_TABLES = [
     "object_locations",
     "object_cache_status",
     "object_cache_occupancy",
+    "object_access_stats",
+    "table_access_stats",
     "info",
     "version",
 ]
@@ -177,6 +195,39 @@ def aggregate_changes(
     return result[0], result[1], result[2]
 
 
+def _missing_rows_query(schema_a: str, table_a: str, schema_b: str, table_b: str) -> Composed:
+    # Rows in table a that aren't in table b. We compare the text representations of
+    # the rows since not all types support equality.
+    return SQL(
+        "FROM {}.{} a WHERE NOT EXISTS "
+        "(SELECT 1 FROM {}.{} b WHERE ROW(a.*)::text = ROW(b.*)::text)"
+    ).format(Identifier(schema_a), Identifier(table_a), Identifier(schema_b), Identifier(table_b))
+
+
+def _diff_tables(
+    engine: "PostgresEngine",
+    schema_1: str,
+    table_1: str,
+    schema_2: str,
+    table_2: str,
+    aggregate: bool,
+) -> Union[Tuple[int, int, int], List[Tuple[bool, Tuple]]]:
+    removed = _missing_rows_query(schema_1, table_1, schema_2, table_2)
+    added = _missing_rows_query(schema_2, table_2, schema_1, table_1)
+
+    if aggregate:
+        return (
+            engine.run_sql(SQL("SELECT count(*) ") + added, return_shape=ResultShape.ONE_ONE),
+            engine.run_sql(SQL("SELECT count(*) ") + removed, return_shape=ResultShape.ONE_ONE),
+            0,
+        )
+
+    # Return format: list of [(False for deleted/True for inserted, full row)]
+    return [(False, r) for r in engine.run_sql_iter(SQL("SELECT a.* ") + removed)] + [
+        (True, r) for r in engine.run_sql_iter(SQL("SELECT a.* ") + added)
+    ]
+
+
 def slow_diff(
     repository: "Repository",
     table_name: str,
@@ -184,25 +235,56 @@ def slow_diff(
     image_2: Optional[str],
     aggregate: bool,
 ) -> Union[Tuple[int, int, int], List[Tuple[bool, Tuple]]]:
-    """Materialize both tables and manually diff them"""
+    """Materialize both tables and diff them on the engine"""
     with repository.materialized_table(table_name, image_1) as (mp_1, table_1):
         with repository.materialized_table(table_name, image_2) as (mp_2, table_2):
             # Check both tables out at the same time since then table_2 calculation can be based
             # on table_1's snapshot.
-            left = repository.object_engine.run_sql(
-                SQL("SELECT * FROM {}.{}").format(Identifier(mp_1), Identifier(table_1))
-            )
-            right = repository.object_engine.run_sql(
-                SQL("SELECT * FROM {}.{}").format(Identifier(mp_2), Identifier(table_2))
-            )
+            return _diff_tables(repository.object_engine, mp_1, table_1, mp_2, table_2, aggregate)
 
-    if aggregate:
-        return sum(1 for r in right if r not in left), sum(1 for r in left if r not in right), 0
 
-    # Return format: list of [(False for deleted/True for inserted, full row)]
-    return [(False, r) for r in left if r not in right] + [
-        (True, r) for r in right if r not in left
-    ]
+def fragment_diff(
+    repository: "Repository",
+    table_schema: "TableSchema",
+    objects_1: List[str],
+    objects_2: List[str],
+    aggregate: bool,
+) -> Union[Tuple[int, int, int], List[Tuple[bool, Tuple]]]:
+    """
+    Diff two versions of a table with the same schema by applying only the fragments that can
+    differ between them (see FragmentManager.get_fragment_diff) into two temporary tables and
+    diffing those on the engine.
+
+    :param repository: Repository
+    :param table_schema: Schema of the table
+    :param objects_1: Fragments of the first version to compare, in application order
+    :param objects_2: Fragments of the second version to compare, in application order
+    :param aggregate: Return the number of added, removed and updated rows instead of the rows.
+    """
+    from .fragment_manager import get_temporary_table_id
+
+    if not objects_1 and not objects_2:
+        return [] if not aggregate else (0, 0, 0)
+
+    engine = repository.object_engine
+    tmp_1, tmp_2 = get_temporary_table_id(), get_temporary_table_id()
+    with repository.objects.ensure_objects(
+        None, objects=list(dict.fromkeys(objects_1 + objects_2))
+    ):
+        for tmp_table, objects in ((tmp_1, objects_1), (tmp_2, objects_2)):
+            engine.create_table(None, tmp_table, schema_spec=table_schema, temporary=True)
+            if objects:
+                engine.apply_fragments(
+                    [(SPLITGRAPH_META_SCHEMA, o) for o in objects],
+                    "pg_temp",
+                    tmp_table,
+                    schema_spec=table_schema,
+                )
+        result = _diff_tables(engine, "pg_temp", tmp_1, "pg_temp", tmp_2, aggregate)
+        engine.run_sql(
+            SQL("DROP TABLE pg_temp.{}, pg_temp.{}").format(Identifier(tmp_1), Identifier(tmp_2))
+        )
+        return result
 
 
 def gather_sync_metadata(
@@ -438,6 +520,77 @@ class CallbackList(list):
             listener(*args, **kwargs)
 
 
+class LRUCache:
+    """
+    Thread-safe bounded least-recently-used cache.
+
+    :param maxsize: Maximum total size of the cache entries.
+    :param sizeof: Function returning the size of a value (by default, every entry has size 1,
+        making `maxsize` the maximum number of entries).
+    """
+
+    def __init__(self, maxsize: int, sizeof: Optional[Callable[[Any], int]] = None) -> None:
+        self.maxsize = maxsize
+        self.sizeof = sizeof or (lambda v: 1)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._entries
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """Get the values for all keys that are in the cache, marking them as recently used."""
+        result = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                self._entries.move_to_end(key)
+                result[key] = entry[0]
+        return result
+
+    def put(self, key: Any, value: Any) -> None:
+        """Add a value to the cache, evicting least recently used values if it's full."""
+        size = self.sizeof(value)
+        if size > self.maxsize:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.maxsize:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def invalidate(self, keys: Iterable[Any]) -> None:
+        """Remove keys from the cache."""
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self) -> None:
+        """Remove all keys from the cache and reset its statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _pop(self, key: Any) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
 def get_data_safe(package: str, resource: str) -> bytes:
     result = get_data(package, resource)
     if result is None:
@@ -0,0 +1,423 @@
+"""
+Eviction and admission policies for the object cache, as well as a simulator that replays
+recorded object access traces against them to compare their hit ratios offline.
+
+Eviction policies decide which objects (that aren't currently in use) get deleted from the
+cache when there's not enough space in it to download new objects. All policies implement the
+same interface, so that the same policy can be used by the `ObjectManager` and the simulator:
+
+  * `on_access` is called every time an object is requested
+  * `on_evict` is called when an object is deleted from the cache
+  * `select_victims` chooses objects to delete from a list of candidates
+
+In the object manager, policies also get the access count and the last usage time of every
+candidate from the cache status table, so that they can make decisions in a process that
+hasn't seen the previous accesses to the objects.
+"""
+import csv
+import itertools
+import math
+from collections import OrderedDict
+from datetime import datetime as dt
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type, TextIO
+
+
+class CacheEntry(NamedTuple):
+    """Object in the cache, as seen by the eviction policy."""
+
+    object_id: str
+    size: int
+    last_used: dt
+    access_count: int = 1
+
+
+class EvictionPolicy:
+    """
+    Base class for eviction policies. By default, evicts objects with the lowest
+    priority (as returned by `priority()`) first.
+    """
+
+    # Whether the policy needs to be told about object accesses (otherwise, it only uses
+    # the access counts and last usage times of the candidates).
+    stateful = False
+
+    def on_access(self, entry: CacheEntry) -> None:
+        """Record an access to an object (including objects that aren't in the cache yet)."""
+
+    def on_evict(self, entry: CacheEntry) -> None:
+        """Record an object being deleted from the cache."""
+
+    def priority(self, entry: CacheEntry, now: dt) -> float:
+        """Priority of keeping an object in the cache (lower is evicted earlier)."""
+        raise NotImplementedError()
+
+    def select_victims(
+        self, candidates: List[CacheEntry], required_space: int, now: dt
+    ) -> List[CacheEntry]:
+        """
+        Choose objects to delete from the cache.
+
+        :param candidates: Objects that can be deleted.
+        :param required_space: Space, in bytes, that has to be freed.
+        :param now: Current time
+        :return: List of objects to delete (the policy may not be able to free enough
+            space if there aren't enough candidates).
+        """
+        return _take_until(sorted(candidates, key=lambda c: self.priority(c, now)), required_space)
+
+
+class DecayPolicy(EvictionPolicy):
+    """
+    Default policy: minimizes P(object is requested again) * (cost of redownloading the object).
+
+    To approximate the probability, we use an exponential decay function (1 if last_used = now,
+    dropping down to 0 as time since the object's last usage time passes).
+    To approximate the cost, we use the object's size, floored to a constant (so if the object has
+    size <= floor, we'd use the floor value -- this is to simulate the latency of re-fetching the
+    object, as opposed to the bandwidth).
+    """
+
+    def __init__(self, decay: float = 0.002, floor: float = 1024 * 1024, **kwargs) -> None:
+        self.decay = decay
+        self.floor = floor
+
+    def priority(self, entry: CacheEntry, now: dt) -> float:
+        time_since_used = (now - entry.last_used).total_seconds()
+        time_factor = math.exp(-self.decay * time_since_used)
+        size_factor = entry.size if entry.size > self.floor else self.floor
+        return time_factor * size_factor
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evicts objects that were used least recently first."""
+
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def priority(self, entry: CacheEntry, now: dt) -> float:
+        return entry.last_used.timestamp()
+
+
+class LFUPolicy(EvictionPolicy):
+    """Evicts objects that were used the least number of times first (breaking ties with LRU)."""
+
+    stateful = True
+
+    def __init__(self, **kwargs) -> None:
+        self._counts: Dict[str, int] = {}
+
+    def on_access(self, entry: CacheEntry) -> None:
+        self._counts[entry.object_id] = self._counts.get(entry.object_id, 0) + 1
+
+    def on_evict(self, entry: CacheEntry) -> None:
+        self._counts.pop(entry.object_id, None)
+
+    def priority(self, entry: CacheEntry, now: dt) -> float:
+        count = self._counts.get(entry.object_id, entry.access_count)
+        # Counts dominate the priority and recency breaks ties.
+        return count * 1e10 + entry.last_used.timestamp()
+
+
+class GDSFPolicy(EvictionPolicy):
+    """
+    GreedyDual-Size-Frequency: the priority of an object is `L + frequency * cost / size`,
+    where `cost` is the cost of refetching the object (its size floored to a constant, like
+    in `DecayPolicy`) and `L` is an inflation value that's set to the priority of the last
+    evicted object, so that objects that haven't been used for a while eventually get evicted.
+    """
+
+    stateful = True
+
+    def __init__(self, floor: float = 1024 * 1024, **kwargs) -> None:
+        self.floor = floor
+        self.inflation = 0.0
+        self._priorities: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+
+    def _priority(self, size: int, count: int) -> float:
+        cost = size if size > self.floor else self.floor
+        return self.inflation + count * cost / max(size, 1)
+
+    def on_access(self, entry: CacheEntry) -> None:
+        count = self._counts.get(entry.object_id, 0) + 1
+        self._counts[entry.object_id] = count
+        self._priorities[entry.object_id] = self._priority(entry.size, count)
+
+    def on_evict(self, entry: CacheEntry) -> None:
+        self.inflation = max(self.inflation, self.priority(entry, dt.utcnow()))
+        self._priorities.pop(entry.object_id, None)
+        self._counts.pop(entry.object_id, None)
+
+    def priority(self, entry: CacheEntry, now: dt) -> float:
+        if entry.object_id in self._priorities:
+            return self._priorities[entry.object_id]
+        return self._priority(entry.size, entry.access_count)
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache: keeps track of objects that have been used once (T1) and
+    objects that have been used more than once (T2), as well as of objects recently evicted
+    from both (B1 and B2). The target size of T1 adapts depending on whether recently evicted
+    objects that get requested again were from T1 or T2.
+
+    Objects that the policy hasn't seen being accessed (for example, if the cache was populated
+    by a different process) are assigned to T1 or T2 based on their access counts.
+    """
+
+    stateful = True
+
+    def __init__(self, cache_size: int, **kwargs) -> None:
+        self.cache_size = cache_size
+        self.target = 0.0
+        self._t1: "OrderedDict[str, int]" = OrderedDict()
+        self._t2: "OrderedDict[str, int]" = OrderedDict()
+        self._b1: "OrderedDict[str, int]" = OrderedDict()
+        self._b2: "OrderedDict[str, int]" = OrderedDict()
+
+    def on_access(self, entry: CacheEntry) -> None:
+        object_id = entry.object_id
+        if object_id in self._t1:
+            del self._t1[object_id]
+            self._t2[object_id] = entry.size
+        elif object_id in self._t2:
+            self._t2.move_to_end(object_id)
+        elif object_id in self._b1:
+            # The object was evicted from T1 too early: grow T1.
+            delta = max(1.0, sum(self._b2.values()) / max(sum(self._b1.values()), 1))
+            self.target = min(self.cache_size, self.target + delta * entry.size)
+            del self._b1[object_id]
+            self._t2[object_id] = entry.size
+        elif object_id in self._b2:
+            # The object was evicted from T2 too early: shrink T1.
+            delta = max(1.0, sum(self._b1.values()) / max(sum(self._b2.values()), 1))
+            self.target = max(0.0, self.target - delta * entry.size)
+            del self._b2[object_id]
+            self._t2[object_id] = entry.size
+        else:
+            self._t1[object_id] = entry.size
+
+    def on_evict(self, entry: CacheEntry) -> None:
+        object_id = entry.object_id
+        if object_id in self._t2:
+            del self._t2[object_id]
+            self._b2[object_id] = entry.size
+            _trim(self._b2, self.cache_size)
+        else:
+            self._t1.pop(object_id, None)
+            self._b1[object_id] = entry.size
+            _trim(self._b1, self.cache_size)
+
+    def select_victims(
+        self, candidates: List[CacheEntry], required_space: int, now: dt
+    ) -> List[CacheEntry]:
+        positions = {o: i for i, o in enumerate(itertools.chain(self._t1, self._t2))}
+
+        def _recency(entry: CacheEntry) -> Tuple[int, float]:
+            # Objects the policy knows about are ordered by their position in their list,
+            # the rest by their last usage time (and go before known objects).
+            if entry.object_id in positions:
+                return 1, positions[entry.object_id]
+            return 0, entry.last_used.timestamp()
+
+        t1 = []
+        t2 = []
+        for entry in candidates:
+            if entry.object_id in self._t2 or (
+                entry.object_id not in self._t1 and entry.access_count > 1
+            ):
+                t2.append(entry)
+            else:
+                t1.append(entry)
+        t1.sort(key=_recency)
+        t2.sort(key=_recency)
+
+        t1_size = sum(self._t1.values()) + sum(e.size for e in t1 if e.object_id not in self._t1)
+        victims = []
+        freed = 0
+        while freed < required_space and (t1 or t2):
+            if t1 and (t1_size > self.target or not t2):
+                victim = t1.pop(0)
+                t1_size -= victim.size
+            else:
+                victim = t2.pop(0)
+            victims.append(victim)
+            freed += victim.size
+        return victims
+
+
+class SizeAdmissionPolicy:
+    """
+    Admission policy that doesn't keep objects larger than a given size in the cache after
+    they've been used unless they've been used at least `min_accesses` times. This stops
+    one-off scans of huge objects from flushing the cache.
+
+    Since rejected objects get deleted from the cache together with their access counts,
+    the policy remembers how many times it's seen them (up to `history_size` objects).
+    """
+
+    def __init__(self, max_size: float, min_accesses: int = 2, history_size: int = 10000) -> None:
+        self.max_size = max_size
+        self.min_accesses = min_accesses
+        self.history_size = history_size
+        self._history: "OrderedDict[str, int]" = OrderedDict()
+
+    def admit(self, entry: CacheEntry) -> bool:
+        """Return True if the object should be kept in the cache after it's been used."""
+        if entry.size <= self.max_size:
+            return True
+        access_count = self._history.pop(entry.object_id, 0) + entry.access_count
+        if access_count >= self.min_accesses:
+            return True
+        self._history[entry.object_id] = access_count
+        while len(self._history) > self.history_size:
+            self._history.popitem(last=False)
+        return False
+
+
+EVICTION_POLICIES: Dict[str, Type[EvictionPolicy]] = {
+    "decay": DecayPolicy,
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "gdsf": GDSFPolicy,
+    "arc": ARCPolicy,
+}
+
+
+def get_eviction_policy(name: str, cache_size: int, **kwargs) -> EvictionPolicy:
+    """
+    Instantiate an eviction policy.
+
+    :param name: Name of the policy (one of `EVICTION_POLICIES`)
+    :param cache_size: Size of the cache, in bytes.
+    :param kwargs: Extra parameters to pass to the policy.
+    """
+    try:
+        policy_class = EVICTION_POLICIES[name.lower()]
+    except KeyError:
+        raise ValueError(
+            "Unknown eviction policy %s! Supported policies: %s"
+            % (name, ", ".join(EVICTION_POLICIES))
+        )
+    return policy_class(cache_size=cache_size, **kwargs)  # type: ignore
+
+
+class SimulationResult(NamedTuple):
+    policy: str
+    hits: int
+    misses: int
+    bytes_hit: int
+    bytes_missed: int
+    evictions: int
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    @property
+    def byte_hit_ratio(self) -> float:
+        return self.bytes_hit / max(self.bytes_hit + self.bytes_missed, 1)
+
+
+# Format of access timestamps in object access traces (ISO 8601, always with microseconds)
+TRACE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def read_trace(stream: TextIO) -> Iterable[Tuple[dt, str, int]]:
+    """
+    Read an object access trace (as recorded by the object manager when `SG_OBJECT_ACCESS_TRACE`
+    is set): a CSV file with the access timestamp (see `TRACE_TIMESTAMP_FORMAT`), object ID and
+    object size.
+    """
+    for row in csv.reader(stream):
+        if row:
+            yield dt.strptime(row[0], TRACE_TIMESTAMP_FORMAT), row[1], int(row[2])
+
+
+def simulate(
+    trace: Iterable[Tuple[dt, str, int]],
+    cache_size: int,
+    policy: EvictionPolicy,
+    admission: Optional[SizeAdmissionPolicy] = None,
+    policy_name: Optional[str] = None,
+) -> SimulationResult:
+    """
+    Replay an object access trace against a cache with a given eviction policy.
+
+    Like in the object manager, eviction only happens when an object that's not in the cache
+    doesn't fit in it. Objects that are larger than the whole cache are counted as misses
+    and not cached.
+
+    :param trace: Iterable of (timestamp, object ID, object size)
+    :param cache_size: Size of the simulated cache, in bytes.
+    :param policy: Eviction policy
+    :param admission: Optional admission policy
+    :param policy_name: Name of the policy to put in the result.
+    :return: SimulationResult
+    """
+    cache: Dict[str, CacheEntry] = {}
+    occupancy = hits = misses = bytes_hit = bytes_missed = evictions = 0
+
+    for timestamp, object_id, size in trace:
+        # Like in the cache status table, access counts are only kept for cached objects.
+        access_count = cache[object_id].access_count + 1 if object_id in cache else 1
+        entry = CacheEntry(object_id, size, timestamp, access_count)
+        policy.on_access(entry)
+
+        if object_id in cache:
+            hits += 1
+            bytes_hit += size
+            cache[object_id] = entry
+        else:
+            misses += 1
+            bytes_missed += size
+            if size > cache_size:
+                policy.on_evict(entry)
+                continue
+            if occupancy + size > cache_size:
+                victims = policy.select_victims(
+                    list(cache.values()), occupancy + size - cache_size, timestamp
+                )
+                for victim in victims:
+                    del cache[victim.object_id]
+                    occupancy -= victim.size
+                    evictions += 1
+                    policy.on_evict(victim)
+                if occupancy + size > cache_size:
+                    # The policy didn't free enough space
+                    policy.on_evict(entry)
+                    continue
+            cache[object_id] = entry
+            occupancy += size
+
+        if admission and not admission.admit(entry):
+            del cache[object_id]
+            occupancy -= size
+            policy.on_evict(entry)
+
+    return SimulationResult(
+        policy=policy_name or type(policy).__name__,
+        hits=hits,
+        misses=misses,
+        bytes_hit=bytes_hit,
+        bytes_missed=bytes_missed,
+        evictions=evictions,
+    )
+
+
+def _take_until(entries: Iterable[CacheEntry], required_space: int) -> List[CacheEntry]:
+    result = []
+    freed = 0
+    for entry in entries:
+        if freed >= required_space:
+            break
+        result.append(entry)
+        freed += entry.size
+    return result
+
+
+def _trim(lst: "OrderedDict[str, int]", max_size: int) -> None:
+    total = sum(lst.values())
+    while total > max_size and lst:
+        _, size = lst.popitem(last=False)
+        total -= size
@@ -7,7 +7,7 @@ import splitgraph.config
 from splitgraph.core.output import pretty_size
 from splitgraph.core.object_manager import ObjectManager
 from splitgraph.core.repository import Repository, get_engine
-from splitgraph.core.table import QueryPlan
+from splitgraph.core.table import QueryPlan, QUERY_PLAN_CACHE
 
 try:
     from multicorn import ForeignDataWrapper, ANY
@@ -85,6 +85,8 @@ class QueryingForeignDataWrapper(ForeignDataWrapper):
         return [
             "Objects removed by filter: %d" % (len(all_objects) - len(filtered_objects)),
             "Scan through %d object(s) (%s)" % (len(filtered_objects), pretty_size(total_size)),
+            "Query plan cache: %d hit(s), %d miss(es), %d plan(s)"
+            % (QUERY_PLAN_CACHE.hits, QUERY_PLAN_CACHE.misses, len(QUERY_PLAN_CACHE)),
         ]
 
     def get_path_keys(self):
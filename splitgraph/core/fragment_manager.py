@@ -7,30 +7,57 @@ import itertools
 import json
 import logging
 import math
-import operator
 import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import reduce
 from hashlib import sha256
 from random import getrandbits
-from typing import Any, Dict, List, Optional, Set, Tuple, Union, TYPE_CHECKING, cast
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+    cast,
+)
 
 from psycopg2.errors import UniqueViolation
-from psycopg2.sql import SQL, Identifier
+from psycopg2.sql import SQL, Identifier, Composable
 from tqdm import tqdm
 
-from splitgraph.config import SPLITGRAPH_API_SCHEMA, SG_CMD_ASCII
-from splitgraph.core.indexing.bloom import generate_bloom_index, filter_bloom_index
+from splitgraph.config import CONFIG, SPLITGRAPH_API_SCHEMA, SG_CMD_ASCII, get_singleton
+from splitgraph.core.indexing.bloom import (
+    generate_bloom_index,
+    filter_bloom_index,
+    bloom_digest_sql,
+    make_bloom_filter,
+    split_bloom_digests,
+)
 from splitgraph.core.indexing.range import (
     generate_range_index,
     filter_range_index,
+    get_range_index_columns,
+    min_max_sql,
+    pk_order_sql,
+    finalize_range_index,
 )
 from splitgraph.core.metadata_manager import MetadataManager, Object
 from splitgraph.core.types import Changeset, TableSchema
 from splitgraph.engine import ResultShape
-from splitgraph.engine.postgres.engine import SG_UD_FLAG, add_ud_flag_column, get_change_key
+from splitgraph.engine.postgres.engine import (
+    SG_UD_FLAG,
+    add_ud_flag_column,
+    get_change_key,
+    chunk,
+)
 from splitgraph.exceptions import SplitGraphError
-from .common import adapt, SPLITGRAPH_META_SCHEMA
+from .common import adapt, LRUCache, SPLITGRAPH_META_SCHEMA
 from .sql import select
 
 if TYPE_CHECKING:
@@ -126,6 +153,10 @@ def get_chunk_groups(chunks: List[Tuple[str, Any, Any]],) -> List[List[Tuple[str
     return [[c[1:] for c in sorted(chunks)] for chunks in groups]
 
 
+# Number of row hashes to unpack at once when summing them up.
+_DIGEST_BATCH_SIZE = 10000
+
+
 class Digest:
     """
     Homomorphic hashing similar to LtHash (but limited to being backed by 256-bit hashes). The main property is that
@@ -161,6 +192,22 @@ class Digest:
         # Unpack the buffer as 16 signed big-endian shortints.
         return cls(struct.unpack(">16H", memory))
 
+    @classmethod
+    def from_memoryviews(cls, memories: Iterable[Union[bytes, memoryview]]) -> "Digest":
+        """
+        Create a Digest that is the sum of multiple 256-bit memoryviews/bytearrays.
+
+        This is equivalent to adding up `Digest.from_memoryview` for every item but doesn't
+        allocate an intermediate Digest per item: instead, batches of hashes are unpacked
+        at once and every one of the 16 components is summed up separately, only
+        wrapping around at the end.
+        """
+        sums = [0] * 16
+        for batch in chunk(memories, chunk_size=_DIGEST_BATCH_SIZE):
+            shorts = struct.unpack(">%dH" % (16 * len(batch)), b"".join(batch))
+            sums = [s + sum(shorts[i::16]) for i, s in enumerate(sums)]
+        return cls(tuple(s & 0xFFFF for s in sums))
+
     @classmethod
     def from_hex(cls, hex_string: str) -> "Digest":
         """Create a Digest from a 64-characters (256-bit) hexadecimal string"""
@@ -187,6 +234,44 @@ class Digest:
 ExtraIndexInfo = Dict[str, Union[List[str], Dict[str, Dict[str, Any]]]]
 
 
+def _parse_extra_indexes(
+    extra_indexes: Optional[ExtraIndexInfo],
+) -> Tuple[Optional[List[str]], Optional[Dict[str, Dict[str, Any]]]]:
+    """
+    Validate the extra index specification for a new object.
+
+    :param extra_indexes: Dictionary of {index_type: column: index_specific_kwargs}.
+    :return: Columns to run the range index on (None meaning all columns) and
+        a dictionary of {column: kwargs} for the bloom index (None if it's not required).
+    """
+    extra_indexes = extra_indexes or {}
+
+    # Default None, meaning run range index on all columns.
+    range_index_columns: Optional[List[str]]
+    try:
+        range_index_columns = list(extra_indexes["range"])
+    except KeyError:
+        range_index_columns = None
+
+    bloom_columns = None
+    for index_name, index_cols in extra_indexes.items():
+        if index_name == "range":
+            continue
+        if index_name != "bloom":
+            raise ValueError("Unsupported index type %s!" % index_name)
+        if isinstance(index_cols, list):
+            raise ValueError(
+                "Unexpected options for index 'bloom': "
+                "got list, expected dictionary {column: {probability/size: ...}}!"
+            )
+        bloom_columns = index_cols
+    return range_index_columns, bloom_columns
+
+
+# In-process cache of PK ranges of fragments, keyed on the object ID and the PK.
+_PK_RANGE_CACHE = LRUCache(maxsize=int(get_singleton(CONFIG, "SG_OBJECT_PK_CACHE_SIZE")))
+
+
 class FragmentManager(MetadataManager):
     """
     A storage engine for Splitgraph tables. Each table can be stored as one or more immutable fragments that can
@@ -207,6 +292,9 @@ class FragmentManager(MetadataManager):
         super().__init__(metadata_engine)
         self.object_engine = object_engine
 
+        # Whether the object engine has the LtHash aggregate installed (checked lazily).
+        self._has_lthash_sum: Optional[bool] = None
+
     def generate_object_index(
         self,
         object_id: str,
@@ -223,46 +311,59 @@ class FragmentManager(MetadataManager):
         :param extra_indexes: Dictionary of {index_type: column: index_specific_kwargs}.
         :return: Dict containing the object index.
         """
-        extra_indexes: ExtraIndexInfo = extra_indexes or {}
-
-        # Default None, meaning run range index on all columns.
-        range_index_columns: Optional[List[str]]
-        try:
-            range_index_columns = list(extra_indexes["range"])
-        except KeyError:
-            range_index_columns = None
+        range_index_columns, bloom_columns = _parse_extra_indexes(extra_indexes)
         range_index: Dict[str, Any] = generate_range_index(
             self.object_engine, object_id, table_schema, changeset, columns=range_index_columns
         )
         indexes = {"range": range_index}
 
-        # Process extra indexes
-        for index_name, index_cols in extra_indexes.items():
-            if index_name == "range":
-                continue
-            if index_name != "bloom":
-                raise ValueError("Unsupported index type %s!" % index_name)
-            if isinstance(index_cols, list):
-                raise ValueError(
-                    "Unexpected options for index 'bloom': "
-                    "got list, expected dictionary {column: {probability/size: ...}}!"
-                )
-
+        if bloom_columns is not None:
             index_dict = {}
-            for index_col, index_kwargs in index_cols.items():
+            for index_col, index_kwargs in bloom_columns.items():
                 logging.debug(
-                    "Running index %s on column %s with parameters %r",
-                    index_name,
-                    index_col,
-                    index_kwargs,
+                    "Running index bloom on column %s with parameters %r", index_col, index_kwargs,
                 )
                 index_dict[index_col] = generate_bloom_index(
                     self.object_engine, object_id, changeset, index_col, **index_kwargs
                 )
-            indexes[index_name] = index_dict
+            indexes["bloom"] = index_dict
 
         return indexes
 
+    def _make_object_meta(
+        self,
+        object_id: str,
+        namespace: str,
+        insertion_hash: str,
+        deletion_hash: str,
+        table_schema: TableSchema,
+        rows_inserted: int,
+        rows_deleted: int,
+        changeset: Optional[Changeset] = None,
+        extra_indexes: Optional[ExtraIndexInfo] = None,
+        object_index: Optional[Dict[str, Any]] = None,
+    ) -> Object:
+        """
+        Indexes a Splitgraph object and builds its metadata without registering it.
+        See `_register_object` for the parameters.
+        """
+        object_size = self.object_engine.get_object_size(object_id)
+        object_index = object_index or self.generate_object_index(
+            object_id, table_schema, changeset, extra_indexes
+        )
+        return Object(
+            object_id=object_id,
+            format="FRAG",
+            namespace=namespace,
+            size=object_size,
+            created=datetime.utcnow(),
+            insertion_hash=insertion_hash,
+            deletion_hash=deletion_hash,
+            object_index=object_index,
+            rows_inserted=rows_inserted,
+            rows_deleted=rows_deleted,
+        )
+
     def _register_object(
         self,
         object_id: str,
@@ -274,6 +375,7 @@ class FragmentManager(MetadataManager):
         rows_deleted: int,
         changeset: Optional[Changeset] = None,
         extra_indexes: Optional[ExtraIndexInfo] = None,
+        object_index: Optional[Dict[str, Any]] = None,
     ) -> None:
         """
         Registers a Splitgraph object in the object tree and indexes it
@@ -290,22 +392,22 @@ class FragmentManager(MetadataManager):
             are used to generate the min/max index for an object to know if it removes/updates some rows
             that might be pertinent to a query.
         :param extra_indexes: Dictionary of {index_type: column: index_specific_kwargs}.
+        :param object_index: Precomputed object index. If not specified, the object will be
+            scanned to generate it.
         """
-        object_size = self.object_engine.get_object_size(object_id)
-        object_index = self.generate_object_index(object_id, table_schema, changeset, extra_indexes)
         self.register_objects(
             [
-                Object(
-                    object_id=object_id,
-                    format="FRAG",
+                self._make_object_meta(
+                    object_id,
                     namespace=namespace,
-                    size=object_size,
-                    created=datetime.utcnow(),
                     insertion_hash=insertion_hash,
                     deletion_hash=deletion_hash,
-                    object_index=object_index,
+                    table_schema=table_schema,
                     rows_inserted=rows_inserted,
                     rows_deleted=rows_deleted,
+                    changeset=changeset,
+                    extra_indexes=extra_indexes,
+                    object_index=object_index,
                 )
             ]
         )
@@ -357,15 +459,49 @@ class FragmentManager(MetadataManager):
             + ") o"
         )
 
-        # By default (e.g. for changesets where nothing was deleted) we use a 0 hash (since adding it to any other
-        # hash has no effect).
-        digests = self.object_engine.run_sql(
-            query, [o for row in rows for o in row], return_shape=ResultShape.MANY_ONE
-        )
-        return (
-            reduce(operator.add, map(Digest.from_memoryview, digests), Digest.empty()),
-            len(digests),
-        )
+        return self._sum_row_hashes(SQL(query), [o for row in rows for o in row])
+
+    def _lthash_sum_available(self) -> bool:
+        # Engines initialized by older versions of sgr don't have the aggregate, in which
+        # case we fall back to summing row hashes up on the client.
+        if self._has_lthash_sum is None:
+            self._has_lthash_sum = (
+                self.object_engine.run_sql(
+                    "SELECT 1 FROM pg_proc p JOIN pg_namespace n ON p.pronamespace = n.oid "
+                    "WHERE n.nspname = %s AND p.proname = 'lthash_sum'",
+                    (SPLITGRAPH_API_SCHEMA,),
+                    return_shape=ResultShape.ONE_ONE,
+                )
+                is not None
+            )
+        return self._has_lthash_sum
+
+    def _sum_row_hashes(
+        self, hash_query: Composable, args: Optional[Sequence[Any]] = None
+    ) -> Tuple[Digest, int]:
+        """
+        Calculate the homomorphic hash of rows returned by a query.
+
+        :param hash_query: Query that returns a single column with the SHA-256 hash of every row.
+        :param args: Arguments to the query
+        :return: `Digest` object and the number of hashed rows.
+        """
+        if self._lthash_sum_available():
+            # Sum the hashes up on the engine so that we only get 32 bytes back
+            # instead of one hash per row.
+            total_hash, rows = self.object_engine.run_sql(
+                SQL("SELECT {}.lthash_sum(h), count(h) FROM (").format(
+                    Identifier(SPLITGRAPH_API_SCHEMA)
+                )
+                + hash_query
+                + SQL(") r(h)"),
+                args,
+                return_shape=ResultShape.ONE_MANY,
+            )
+            return Digest.from_memoryview(total_hash), rows
+
+        row_hashes = self.object_engine.run_sql(hash_query, args, return_shape=ResultShape.MANY_ONE)
+        return Digest.from_memoryviews(row_hashes), len(row_hashes)
 
     def _store_changesets(
         self,
@@ -503,11 +639,7 @@ class FragmentManager(MetadataManager):
             )
             + SQL(" WHERE o.{} = true").format(Identifier(SG_UD_FLAG))
         )
-        row_digests = self.object_engine.run_sql(digest_query, return_shape=ResultShape.MANY_ONE)
-        insertion_hash = reduce(
-            operator.add, (Digest.from_memoryview(r) for r in row_digests), Digest.empty()
-        )
-        return insertion_hash, len(row_digests)
+        return self._sum_row_hashes(digest_query)
 
     def record_table_as_patch(
         self,
@@ -538,67 +670,90 @@ class FragmentManager(MetadataManager):
         # this will help (for a query pk=5000 we don't need to fetch a 2000-row fragment) but maybe at that point
         # it's time to rewrite the table altogether?
 
-        # Accumulate the diff in-memory. This might become a bottleneck in the future.
-        changeset: Changeset = {}
-        _conflate_changes(
-            changeset,
-            cast(
-                List[Tuple[Tuple[str, ...], bool, Dict[str, Any], Dict[str, Any]]],
-                self.object_engine.get_pending_changes(schema, old_table.table_name),
-            ),
+        # Small changesets are conflated in memory. For large ones (e.g. an UPDATE that touched the
+        # whole table), conflate the audit log on the engine and store the changes in batches of
+        # PK-ordered rows, each batch becoming its own fragment(s), to keep memory usage bounded.
+        table_name = old_table.table_name
+        batch_size = int(get_singleton(CONFIG, "SG_COMMIT_CHANGESET_BATCH_SIZE"))
+        pending_changes = sum(
+            c
+            for _, c in cast(
+                List[Tuple[int, int]],
+                self.object_engine.get_pending_changes(schema, table_name, aggregate=True),
+            )
         )
-        self.object_engine.discard_pending_changes(schema, old_table.table_name)
-        current_objects = old_table.objects
+
+        changesets: Iterable[Changeset]
+        if pending_changes > batch_size:
+            logging.info(
+                "Table %s has %d pending changes, processing them in batches of %d",
+                table_name,
+                pending_changes,
+                batch_size,
+            )
+            changesets = self.object_engine.get_conflated_changes(schema, table_name, batch_size)
+        else:
+            changeset: Changeset = {}
+            _conflate_changes(
+                changeset,
+                cast(
+                    List[Tuple[Tuple[str, ...], bool, Dict[str, Any], Dict[str, Any]]],
+                    self.object_engine.get_pending_changes(schema, table_name),
+                ),
+            )
+            changesets = [changeset] if changeset else []
 
         new_schema_spec = new_schema_spec or old_table.table_schema
-        if changeset:
+        object_ids: List[str] = []
+        group_boundaries = None
+        table_pks = None
+        for changeset in changesets:
             if split_changeset:
-                logging.debug("Splitting changesets")
-                # Reorganize the current table's fragments into non-overlapping groups
-                # and split the changeset to make sure it doesn't span (and hence merge) them.
-                table_pks = self.object_engine.get_change_key(schema, old_table.table_name)
-                min_max = self.get_min_max_pks(current_objects, table_pks)
-
-                groups = get_chunk_groups(
-                    [(o, mm[0], mm[1]) for o, mm in zip(current_objects, min_max)]
-                )
-                group_boundaries = [
-                    (min(min_pk for _, min_pk, _ in group), max(max_pk for _, _, max_pk in group))
-                    for group in groups
-                ]
+                if group_boundaries is None:
+                    logging.debug("Splitting changesets")
+                    # Reorganize the current table's fragments into non-overlapping groups
+                    # and split the changeset to make sure it doesn't span (and hence merge) them.
+                    current_objects = old_table.objects
+                    table_pks = self.object_engine.get_change_key(schema, table_name)
+                    min_max = self.get_min_max_pks(current_objects, table_pks)
+
+                    groups = get_chunk_groups(
+                        [(o, mm[0], mm[1]) for o, mm in zip(current_objects, min_max)]
+                    )
+                    group_boundaries = [
+                        (
+                            min(min_pk for _, min_pk, _ in group),
+                            max(max_pk for _, _, max_pk in group),
+                        )
+                        for group in groups
+                    ]
 
-                matched, before, after = _split_changeset(changeset, group_boundaries, table_pks)
-                changesets = [before] + matched + [after]
+                matched, before, after = _split_changeset(
+                    changeset, group_boundaries, cast(List[Tuple[str, str]], table_pks)
+                )
+                sub_changesets = [before] + matched + [after]
             else:
-                changesets = [changeset]
+                sub_changesets = [changeset]
 
             # Store the changesets and find out their object IDs.
-            object_ids = self._store_changesets(
-                old_table,
-                changesets,
-                schema,
-                extra_indexes,
-                in_fragment_order=in_fragment_order,
-                overwrite=overwrite,
-            )
-            # Finally, link the table to the new set of objects.
-            self.register_tables(
-                old_table.repository,
-                [
-                    (
-                        image_hash,
-                        old_table.table_name,
-                        new_schema_spec,
-                        old_table.objects + object_ids,
-                    )
-                ],
-            )
-        else:
-            # Changes in the audit log cancelled each other out. Point the image to the same old objects.
-            self.register_tables(
-                old_table.repository,
-                [(image_hash, old_table.table_name, new_schema_spec, old_table.objects)],
+            object_ids.extend(
+                self._store_changesets(
+                    old_table,
+                    sub_changesets,
+                    schema,
+                    extra_indexes,
+                    in_fragment_order=in_fragment_order,
+                    overwrite=overwrite,
+                )
             )
+        self.object_engine.discard_pending_changes(schema, table_name)
+
+        # Finally, link the table to the new set of objects. If the changes in the audit log
+        # cancelled each other out, this points the image to the same old objects.
+        self.register_tables(
+            old_table.repository,
+            [(image_hash, table_name, new_schema_spec, old_table.objects + object_ids)],
+        )
 
     def get_min_max_pks(
         self, fragments: List[str], table_pks: List[Tuple[str, str]]
@@ -612,6 +767,66 @@ class FragmentManager(MetadataManager):
             If a fragment doesn't exist or doesn't have a corresponding index entry,
             a SplitGraphError is raised.
         """
+        # Objects are immutable, so we can cache their PK ranges and only go to the
+        # metadata engine for fragments that we haven't seen before.
+        pk_key = tuple(table_pks)
+        cached = _PK_RANGE_CACHE.get_many((f, pk_key) for f in fragments)
+        missing = [f for f in fragments if (f, pk_key) not in cached]
+        if missing:
+            for fragment, bounds in self._get_min_max_pks(missing, table_pks).items():
+                cached[(fragment, pk_key)] = bounds
+                _PK_RANGE_CACHE.put((fragment, pk_key), bounds)
+
+        # The bounds are stored as a single flat (min_1, ..., min_n, max_1, ..., max_n) tuple.
+        pk_len = len(table_pks)
+        min_max = []
+        for fragment in fragments:
+            bounds = cached[(fragment, pk_key)]
+            min_max.append((bounds[:pk_len], bounds[pk_len:]))
+        return min_max
+
+    def get_fragment_diff(
+        self, objects_1: List[str], objects_2: List[str], table_schema: TableSchema
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Find fragments of two versions of a table that can contain different rows.
+
+        Fragments of both versions are grouped by their PK ranges, so that any given row can only
+        be in fragments from one group. If both versions have the same fragments in a group (in the
+        same order), they have the same rows in that group's PK range and the group can be skipped.
+
+        :param objects_1: Fragments of the first version of the table, in application order.
+        :param objects_2: Fragments of the second version of the table, in application order.
+        :param table_schema: Schema of the table (must be the same in both versions).
+        :return: Fragments of both versions that have to be compared row by row, in application
+            order.
+        """
+        table_pks = [(c.name, c.pg_type) for c in table_schema if c.is_pk] or [
+            (c.name, c.pg_type) for c in table_schema
+        ]
+        all_objects = list(dict.fromkeys(objects_1 + objects_2))
+        groups = get_chunk_groups(
+            [
+                (object_id, min_max[0], min_max[1])
+                for object_id, min_max in zip(
+                    all_objects, self.get_min_max_pks(all_objects, table_pks)
+                )
+            ]
+        )
+
+        changed: Set[str] = set()
+        for group in groups:
+            group_objects = {object_id for object_id, _, _ in group}
+            if [o for o in objects_1 if o in group_objects] != [
+                o for o in objects_2 if o in group_objects
+            ]:
+                changed.update(group_objects)
+
+        return [o for o in objects_1 if o in changed], [o for o in objects_2 if o in changed]
+
+    def _get_min_max_pks(
+        self, fragments: List[str], table_pks: List[Tuple[str, str]]
+    ) -> Dict[str, Tuple]:
         # If the PK isn't composite, we can read the range for the corresponding column
         # from the index, otherwise, the indexer stored the min/max tuple under $pk.
         pk = table_pks[0][0] if len(table_pks) == 1 else "$pk"
@@ -636,7 +851,7 @@ class FragmentManager(MetadataManager):
         # Since the PK can't contain a NULL, if we do get one here, it's from the JSON query
         # (column doesn't exist in the index).
 
-        min_max = []
+        bounds = {}
         for fragment in fragments:
             if fragment not in result:
                 raise SplitGraphError("No metadata found for object %s!" % fragment)
@@ -645,19 +860,19 @@ class FragmentManager(MetadataManager):
                 raise SplitGraphError("No index found for object %s!" % fragment)
             if pk == "$pk":
                 # For composite PKs, we're given back a JSON array and need to load it.
-                min_pk = tuple(json.loads(min_pk))
-                max_pk = tuple(json.loads(max_pk))
+                min_pk = json.loads(min_pk)
+                max_pk = json.loads(max_pk)
             else:
                 # Single-column PKs still need to be returned as tuples.
                 min_pk = (min_pk,)
                 max_pk = (max_pk,)
 
             # Coerce the PKs to the actual Python types
-            min_pk = tuple(adapt(v, c[1]) for v, c in zip(min_pk, table_pks))
-            max_pk = tuple(adapt(v, c[1]) for v, c in zip(max_pk, table_pks))
-            min_max.append((min_pk, max_pk))
+            bounds[fragment] = tuple(
+                adapt(v, c[1]) for v, c in zip(itertools.chain(min_pk, max_pk), table_pks * 2)
+            )
 
-        return min_max
+        return bounds
 
     def calculate_content_hash(
         self,
@@ -691,14 +906,8 @@ class FragmentManager(MetadataManager):
             digest_query += SQL(" WHERE {} = %s").format(Identifier(chunk_id_col))
             args = [chunk_id]
 
-        row_digests = self.object_engine.run_sql(
-            digest_query, args, return_shape=ResultShape.MANY_ONE
-        )
-
-        return (
-            reduce(operator.add, (Digest.from_memoryview(r) for r in row_digests)).hex(),
-            len(row_digests),
-        )
+        content_hash, rows = self._sum_row_hashes(digest_query, args)
+        return content_hash.hex(), rows
 
     def create_base_fragment(
         self,
@@ -718,53 +927,26 @@ class FragmentManager(MetadataManager):
             )
 
         # Get schema (apart from the chunk ID column)
-        # Fragments can't be reused in tables with different schemas
-        # even if the contents match (e.g. '1' vs 1). Hence, include the table schema
-        # n the object ID as well.
         table_schema = table_schema or [
             c
             for c in self.object_engine.get_full_table_schema(source_schema, source_table)
             if c.name != chunk_id_col
         ]
 
-        schema_hash = self._calculate_schema_hash(table_schema)
-        # Get content hash for this chunk.
-        content_hash, rows_inserted = self.calculate_content_hash(
-            source_schema, source_table, table_schema, chunk_id_col=chunk_id_col, chunk_id=chunk_id
+        object_id, content_hash, rows_inserted, object_index = self._hash_base_fragment(
+            source_schema, source_table, table_schema, chunk_id_col, chunk_id, extra_indexes
         )
 
-        # Object IDs are also used to key tables in Postgres so they can't be more than 63 characters.
-        # In addition, table names can't start with a number (they can but every invocation has to
-        # be quoted) so we have to drop 2 characters from the 64-character hash and append an "o".
-        object_id = "o" + sha256((content_hash + schema_hash).encode("ascii")).hexdigest()[:-2]
-
         with self.object_engine.savepoint("object_rename"):
-            # Store the object adding the extra update/delete column (always True in this case
-            # since we don't overwrite any rows) and filtering on the chunk ID.
-
-            source_query = (
-                SQL("SELECT ")
-                + SQL(",").join(Identifier(c.name) for c in table_schema)
-                + SQL(",TRUE AS ")
-                + Identifier(SG_UD_FLAG)
-                + SQL("FROM {}.{}").format(Identifier(source_schema), Identifier(source_table))
-            )
-            source_query_args = []
-
-            if chunk_id_col:
-                source_query += SQL("WHERE {} = %s").format(Identifier(chunk_id_col))
-                source_query_args = [chunk_id]
-
-            if in_fragment_order:
-                source_query += SQL(" ") + self._get_order_by_clause(
-                    in_fragment_order, table_schema
-                )
-            self.object_engine.store_object(
-                object_id=object_id,
-                source_query=source_query,
-                schema_spec=add_ud_flag_column(table_schema),
-                source_query_args=source_query_args,
-                overwrite=overwrite,
+            self._store_base_fragment(
+                object_id,
+                source_schema,
+                source_table,
+                table_schema,
+                chunk_id_col,
+                chunk_id,
+                in_fragment_order,
+                overwrite,
             )
         with self.metadata_engine.savepoint("object_register"):
             try:
@@ -777,6 +959,7 @@ class FragmentManager(MetadataManager):
                     extra_indexes=extra_indexes,
                     rows_inserted=rows_inserted,
                     rows_deleted=0,
+                    object_index=object_index,
                 )
             except UniqueViolation:
                 # Someone registered this object (perhaps a concurrent pull) already.
@@ -789,6 +972,175 @@ class FragmentManager(MetadataManager):
 
         return object_id
 
+    def _hash_base_fragment(
+        self,
+        source_schema: str,
+        source_table: str,
+        table_schema: TableSchema,
+        chunk_id_col: Optional[str] = None,
+        chunk_id: Optional[int] = None,
+        extra_indexes: Optional[ExtraIndexInfo] = None,
+    ) -> Tuple[str, str, int, Optional[Dict[str, Any]]]:
+        """
+        Calculate the ID of a base fragment that would be created from a table (or a chunk of it).
+
+        :return: Tuple of (object ID, content hash, number of rows, object index). The object
+            index is None if it couldn't be calculated from the source table and the object
+            has to be scanned to get it.
+        """
+        # Fragments can't be reused in tables with different schemas
+        # even if the contents match (e.g. '1' vs 1). Hence, include the table schema
+        # n the object ID as well.
+        schema_hash = self._calculate_schema_hash(table_schema)
+        # Get content hash for this chunk (and index it in the same pass if we can).
+        object_index: Optional[Dict[str, Any]] = None
+        if self._lthash_sum_available():
+            content_hash, rows_inserted, object_index = self._calculate_base_fragment_stats(
+                source_schema, source_table, table_schema, chunk_id_col, chunk_id, extra_indexes
+            )
+        else:
+            content_hash, rows_inserted = self.calculate_content_hash(
+                source_schema,
+                source_table,
+                table_schema,
+                chunk_id_col=chunk_id_col,
+                chunk_id=chunk_id,
+            )
+
+        # Object IDs are also used to key tables in Postgres so they can't be more than 63 characters.
+        # In addition, table names can't start with a number (they can but every invocation has to
+        # be quoted) so we have to drop 2 characters from the 64-character hash and append an "o".
+        object_id = "o" + sha256((content_hash + schema_hash).encode("ascii")).hexdigest()[:-2]
+        return object_id, content_hash, rows_inserted, object_index
+
+    def _calculate_base_fragment_stats(
+        self,
+        source_schema: str,
+        source_table: str,
+        table_schema: TableSchema,
+        chunk_id_col: Optional[str] = None,
+        chunk_id: Optional[int] = None,
+        extra_indexes: Optional[ExtraIndexInfo] = None,
+    ) -> Tuple[str, int, Dict[str, Any]]:
+        """
+        Calculate the content hash, the number of rows and the object index of a new base
+        fragment in one query against its source table, instead of hashing the source and then
+        scanning the new object for the range index and for every bloom-indexed column.
+
+        For single-column primary keys, this is a single aggregate scan of the source. Composite
+        primary keys can't be aggregated with MIN/MAX (and row values don't keep the collations
+        that the PK ordering uses), so their bounds come from two extra sorted subqueries in the
+        same statement: in that case, the source is read three times.
+
+        Requires the LtHash aggregate to be installed on the object engine.
+
+        :return: Tuple of (content hash, number of rows, object index)
+        """
+        range_index_columns, bloom_columns = _parse_extra_indexes(extra_indexes)
+        columns_to_index, object_pk, column_types = get_range_index_columns(
+            table_schema, range_index_columns
+        )
+        bloom_columns = bloom_columns or {}
+
+        source = SQL(" FROM {}.{} o").format(Identifier(source_schema), Identifier(source_table))
+        args: List[Any] = []
+        if chunk_id_col:
+            source += SQL(" WHERE {} = %s").format(Identifier(chunk_id_col))
+            args = [chunk_id]
+
+        query = (
+            SQL("SELECT {}.lthash_sum(digest((").format(Identifier(SPLITGRAPH_API_SCHEMA))
+            + SQL(",").join(Identifier(c.name) for c in table_schema)
+            + SQL(")::text, 'sha256'::text)), count(*)")
+        )
+        if columns_to_index:
+            query += SQL(",") + min_max_sql(columns_to_index, column_types)
+        for column in bloom_columns:
+            query += SQL(",") + bloom_digest_sql(column)
+        query += source
+
+        # Composite PKs can't be aggregated with MIN/MAX, so get them by sorting the
+        # source in two more subqueries (this reads the source two more times).
+        composite_pk = len(object_pk) > 1
+        if composite_pk:
+            pk_types = [column_types[c] for c in object_pk]
+            pk_sql = pk_order_sql(object_pk, pk_types)
+            query = (
+                SQL("SELECT * FROM (")
+                + query
+                + SQL(") s, (SELECT ")
+                + pk_sql
+                + source
+                + SQL(" ORDER BY ")
+                + pk_sql
+                + SQL(" LIMIT 1) pk_min, (SELECT ")
+                + pk_sql
+                + source
+                + SQL(" ORDER BY ")
+                + pk_order_sql(object_pk, pk_types, desc=True)
+                + SQL(" LIMIT 1) pk_max")
+            )
+            args = args * 3
+
+        result = self.object_engine.run_sql(query, args, return_shape=ResultShape.ONE_MANY)
+        content_hash = Digest.from_memoryview(result[0]).hex()
+        rows = result[1]
+        result = result[2:]
+
+        index: Dict[str, Any] = {}
+        for column in columns_to_index:
+            index[column] = (result[0], result[1])
+            result = result[2:]
+        bloom_index = {}
+        for column, bloom_kwargs in bloom_columns.items():
+            bloom_index[column] = make_bloom_filter(split_bloom_digests(result[0]), **bloom_kwargs)
+            result = result[1:]
+        if composite_pk:
+            index["$pk"] = (tuple(result[: len(object_pk)]), tuple(result[len(object_pk) :]))
+
+        object_index: Dict[str, Any] = {
+            "range": finalize_range_index(index, columns_to_index, column_types)
+        }
+        if bloom_columns:
+            object_index["bloom"] = bloom_index
+        return content_hash, rows, object_index
+
+    def _store_base_fragment(
+        self,
+        object_id: str,
+        source_schema: str,
+        source_table: str,
+        table_schema: TableSchema,
+        chunk_id_col: Optional[str] = None,
+        chunk_id: Optional[int] = None,
+        in_fragment_order: Optional[List[str]] = None,
+        overwrite: bool = False,
+    ) -> None:
+        # Store the object adding the extra update/delete column (always True in this case
+        # since we don't overwrite any rows) and filtering on the chunk ID.
+        source_query = (
+            SQL("SELECT ")
+            + SQL(",").join(Identifier(c.name) for c in table_schema)
+            + SQL(",TRUE AS ")
+            + Identifier(SG_UD_FLAG)
+            + SQL("FROM {}.{}").format(Identifier(source_schema), Identifier(source_table))
+        )
+        source_query_args = []
+
+        if chunk_id_col:
+            source_query += SQL("WHERE {} = %s").format(Identifier(chunk_id_col))
+            source_query_args = [chunk_id]
+
+        if in_fragment_order:
+            source_query += SQL(" ") + self._get_order_by_clause(in_fragment_order, table_schema)
+        self.object_engine.store_object(
+            object_id=object_id,
+            source_query=source_query,
+            schema_spec=add_ud_flag_column(table_schema),
+            source_query_args=source_query_args,
+            overwrite=overwrite,
+        )
+
     @staticmethod
     def _get_order_by_clause(in_fragment_order, table_schema):
         column_names = [s.name for s in table_schema]
@@ -816,6 +1168,7 @@ class FragmentManager(MetadataManager):
         extra_indexes: Optional[ExtraIndexInfo] = None,
         in_fragment_order: Optional[List[str]] = None,
         overwrite: bool = False,
+        workers: int = 1,
     ) -> List[str]:
         """
         Copies the full table verbatim into one or more new base fragments and registers them.
@@ -829,6 +1182,8 @@ class FragmentManager(MetadataManager):
         :param extra_indexes: Dictionary of {index_type: column: index_specific_kwargs}.
         :param in_fragment_order: Key to sort data inside each chunk by.
         :param overwrite: Overwrite physical objects that already exist.
+        :param workers: Number of parallel connections to use to create chunks. If greater
+            than 1, the source table has to be visible to other connections (committed).
         """
         source_schema = source_schema or repository.to_schema()
         source_table = source_table or table_name
@@ -851,6 +1206,7 @@ class FragmentManager(MetadataManager):
                 extra_indexes,
                 in_fragment_order=in_fragment_order,
                 overwrite=overwrite,
+                workers=workers,
             )
 
         elif table_size:
@@ -882,6 +1238,7 @@ class FragmentManager(MetadataManager):
         table_schema: Optional[TableSchema] = None,
         in_fragment_order: Optional[List[str]] = None,
         overwrite: bool = False,
+        workers: int = 1,
     ) -> List[str]:
         table_pk = [p[0] for p in self.object_engine.get_change_key(source_schema, source_table)]
         table_schema = table_schema or self.object_engine.get_full_table_schema(
@@ -929,6 +1286,24 @@ class FragmentManager(MetadataManager):
         log_progress = _log_commit_progress(table_size, no_chunks)
         log_func = logging.info if log_progress else logging.debug
 
+        # Leave one connection in the pool for the main thread.
+        workers = min(workers, no_chunks, int(get_singleton(CONFIG, "SG_ENGINE_POOL")) - 1)
+        if workers > 1:
+            return self._chunk_table_parallel(
+                repository.namespace,
+                source_schema,
+                source_table,
+                pk_sql,
+                chunk_size,
+                no_chunks,
+                workers,
+                table_schema,
+                extra_indexes,
+                in_fragment_order,
+                overwrite,
+                log_progress,
+            )
+
         log_func("Computing table partitions")
         tmp_table_query = (
             SQL("CREATE TEMPORARY TABLE {} AS SELECT *, (ROW_NUMBER() OVER (ORDER BY ").format(
@@ -976,6 +1351,133 @@ class FragmentManager(MetadataManager):
         self.object_engine.delete_table("pg_temp", temp_table)
         return object_ids
 
+    def _chunk_table_parallel(
+        self,
+        namespace: str,
+        source_schema: str,
+        source_table: str,
+        pk_sql: Composable,
+        chunk_size: int,
+        no_chunks: int,
+        workers: int,
+        table_schema: TableSchema,
+        extra_indexes: Optional[ExtraIndexInfo] = None,
+        in_fragment_order: Optional[List[str]] = None,
+        overwrite: bool = False,
+        log_progress: bool = False,
+    ) -> List[str]:
+        """
+        Parallel version of the chunking loop in `_chunk_table`.
+
+        Since other connections can't see temporary tables, the partitioned table is stored
+        as an unlogged table in splitgraph_meta instead. Every chunk is hashed, stored
+        and indexed by a worker thread using its own connection from the engine's pool and
+        committed straight away. The new objects are registered in one batch at the end.
+
+        Note that the workers can only see committed data in the source table.
+        """
+        engine = self.object_engine
+        staging_table = get_temporary_table_id()
+        chunk_id_col = "sg_tmp_partition_id"
+        log_func = logging.info if log_progress else logging.debug
+
+        # Chunks with the same contents (only possible in tables without a PK) map to the
+        # same object, so make sure only one worker stores it.
+        claimed_objects: Set[str] = set()
+        claimed_lock = threading.Lock()
+
+        def _in_transaction(func, *args):
+            # Connections are keyed by thread, so this runs in the worker's own transaction.
+            try:
+                result = func(*args)
+                engine.connection.commit()
+                return result
+            except Exception:
+                engine.connection.rollback()
+                raise
+
+        def _create_staging_table():
+            engine.run_sql(
+                SQL(
+                    "CREATE UNLOGGED TABLE {}.{} AS SELECT *, (ROW_NUMBER() OVER (ORDER BY "
+                ).format(Identifier(SPLITGRAPH_META_SCHEMA), Identifier(staging_table))
+                + pk_sql
+                + SQL(") - 1) / %s {} FROM {}.{}").format(
+                    Identifier(chunk_id_col), Identifier(source_schema), Identifier(source_table)
+                ),
+                (chunk_size,),
+            )
+            engine.run_sql(
+                SQL("CREATE INDEX ON {}.{}({})").format(
+                    Identifier(SPLITGRAPH_META_SCHEMA),
+                    Identifier(staging_table),
+                    Identifier(chunk_id_col),
+                )
+            )
+
+        def _store_chunk(chunk_id: int) -> Tuple[str, Optional[Object]]:
+            object_id, content_hash, rows_inserted, object_index = self._hash_base_fragment(
+                SPLITGRAPH_META_SCHEMA,
+                staging_table,
+                table_schema,
+                chunk_id_col,
+                chunk_id,
+                extra_indexes,
+            )
+            with claimed_lock:
+                if object_id in claimed_objects:
+                    return object_id, None
+                claimed_objects.add(object_id)
+
+            self._store_base_fragment(
+                object_id,
+                SPLITGRAPH_META_SCHEMA,
+                staging_table,
+                table_schema,
+                chunk_id_col,
+                chunk_id,
+                in_fragment_order,
+                overwrite,
+            )
+            return (
+                object_id,
+                self._make_object_meta(
+                    object_id,
+                    namespace=namespace,
+                    insertion_hash=content_hash,
+                    deletion_hash="0" * 64,
+                    table_schema=table_schema,
+                    extra_indexes=extra_indexes,
+                    rows_inserted=rows_inserted,
+                    rows_deleted=0,
+                    object_index=object_index,
+                ),
+            )
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as tpe:
+                log_func("Computing table partitions")
+                tpe.submit(_in_transaction, _create_staging_table).result()
+                try:
+                    log_func("Storing and indexing the table using %d workers", workers)
+                    pbar = tqdm(
+                        tpe.map(lambda c: _in_transaction(_store_chunk, c), range(no_chunks)),
+                        unit="objs",
+                        total=no_chunks,
+                        ascii=SG_CMD_ASCII,
+                        disable=not log_progress,
+                    )
+                    results = list(pbar)
+                finally:
+                    tpe.submit(
+                        _in_transaction, engine.delete_table, SPLITGRAPH_META_SCHEMA, staging_table
+                    ).result()
+        finally:
+            engine.close_others()
+
+        self.register_objects([o for _, o in results if o])
+        return [object_id for object_id, _ in results]
+
     def filter_fragments(self, object_ids: List[str], table: "Table", quals: Any) -> List[str]:
         """
         Performs fuzzy filtering on the given object IDs using the index and a set of qualifiers, discarding
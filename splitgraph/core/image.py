@@ -1,6 +1,7 @@
 """Image representation and provenance"""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime
 from random import getrandbits
@@ -35,6 +36,7 @@ from .table import Table
 from .types import TableColumn, ProvenanceLine
 
 if TYPE_CHECKING:
+    from .object_manager import ObjectReleaseCallback
     from .repository import Repository
 
 IMAGE_COLS = ["image_hash", "parent_id", "created", "comment", "provenance_data"]
@@ -123,7 +125,9 @@ class Image(NamedTuple):
         )
 
     @manage_audit
-    def checkout(self, force: bool = False, layered: bool = False) -> None:
+    def checkout(
+        self, force: bool = False, layered: bool = False, workers: Optional[int] = None
+    ) -> None:
         """
         Checks the image out, changing the current HEAD pointer. Raises an error
         if there are pending changes to its checkout.
@@ -131,6 +135,14 @@ class Image(NamedTuple):
         :param force: Discards all pending changes to the schema.
         :param layered: If True, uses layered querying to check out the image (doesn't materialize tables
             inside of it).
+        :param workers: Number of tables to materialize at the same time, using a separate engine
+            connection for each one. The default value is governed by the SG_CHECKOUT_WORKERS
+            configuration parameter.
+
+        If the currently checked out image has no pending changes and a table's fragments in this
+        image are the same as in the current image with some fragments added at the end, the table
+        is updated in place by applying only the new fragments instead of being rematerialized.
+        This can be disabled with the SG_CHECKOUT_INCREMENTAL configuration parameter.
         """
         target_schema = self.repository.to_schema()
         if len(target_schema) > POSTGRES_MAX_IDENTIFIER:
@@ -144,7 +156,8 @@ class Image(NamedTuple):
                 POSTGRES_MAX_IDENTIFIER,
             )
 
-        if self.repository.has_pending_changes():
+        clean = not self.repository.has_pending_changes()
+        if not clean:
             if not force:
                 raise SplitGraphError(
                     "{0} has pending changes! Pass force=True or do sgr checkout -f {0}:HEAD".format(
@@ -154,18 +167,163 @@ class Image(NamedTuple):
             logging.warning("%s has pending changes, discarding...", target_schema)
             self.object_engine.discard_pending_changes(target_schema)
 
-        # Drop all current tables in staging
+        workers = min(
+            workers or int(get_singleton(CONFIG, "SG_CHECKOUT_WORKERS")),
+            int(get_singleton(CONFIG, "SG_ENGINE_POOL")) - 1,
+        )
+        tables = self.get_tables()
+        deltas: Dict[str, List[str]] = {}
+        if (
+            not layered
+            and clean
+            # Without audit triggers, we can't tell if the checked out tables have been changed.
+            and self.engine == self.object_engine
+            and get_singleton(CONFIG, "SG_CHECKOUT_INCREMENTAL") == "true"
+        ):
+            deltas = self._get_table_deltas(target_schema, tables)
+        full_tables = [t for t in tables if t not in deltas]
+
+        if not layered and workers > 1 and len(full_tables) > 1:
+            self._parallel_checkout(target_schema, full_tables, workers, keep=list(deltas))
+            self._apply_table_deltas(target_schema, deltas)
+            set_head(self.repository, self.image_hash)
+            return
+
+        # Drop all current tables in staging (apart from the ones we can update in place)
         self.object_engine.create_schema(target_schema)
         for table in self.object_engine.get_all_tables(target_schema):
-            self.object_engine.delete_table(target_schema, table)
+            if table not in deltas:
+                self.object_engine.delete_table(target_schema, table)
 
         if layered:
             self._lq_checkout()
         else:
-            for table in self.get_tables():
+            self._apply_table_deltas(target_schema, deltas)
+            for table in full_tables:
                 self.get_table(table).materialize(table)
         set_head(self.repository, self.image_hash)
 
+    def _get_table_deltas(self, target_schema: str, tables: List[str]) -> Dict[str, List[str]]:
+        """
+        Find tables that can be checked out by applying fragments to the currently checked out
+        tables: the tables have to be unchanged since they were checked out and their fragments
+        in this image have to be the same as in the current image with new fragments added at
+        the end (e.g. if this image only appends patches to the current one).
+
+        :return: Dictionary of table name -> list of fragments to apply to it.
+        """
+        current = self.repository.head
+        if current is None or current.image_hash == self.image_hash:
+            return {}
+
+        current_tables = current.get_tables()
+        deltas: Dict[str, List[str]] = {}
+        for table_name in tables:
+            if table_name not in current_tables:
+                continue
+            if self.object_engine.get_table_type(target_schema, table_name) != "BASE TABLE":
+                continue
+            current_table = current.get_table(table_name)
+            table = self.get_table(table_name)
+            if (
+                table.table_schema != current_table.table_schema
+                or self.object_engine.get_full_table_schema(target_schema, table_name)
+                != current_table.table_schema
+            ):
+                continue
+            current_objects = current_table.objects
+            if table.objects[: len(current_objects)] != current_objects:
+                continue
+            deltas[table_name] = table.objects[len(current_objects) :]
+        return deltas
+
+    def _apply_table_deltas(self, target_schema: str, deltas: Dict[str, List[str]]) -> None:
+        """Apply new fragments to the currently checked out tables in place."""
+        changed = [t for t, objects in deltas.items() if objects]
+        if not changed:
+            return
+
+        # Stop tracking the tables so that the new rows aren't recorded as pending changes.
+        # They get tracked again once the checkout finishes.
+        self.object_engine.untrack_tables([(target_schema, t) for t in changed])
+        object_manager = self.repository.objects
+        for table_name in changed:
+            logging.debug("Applying %d new fragment(s) to %s", len(deltas[table_name]), table_name)
+            table = self.get_table(table_name)
+            with object_manager.ensure_objects(table, objects=deltas[table_name]) as objects:
+                self.object_engine.apply_fragments(
+                    [(SPLITGRAPH_META_SCHEMA, o) for o in cast(List[str], objects)],
+                    target_schema,
+                    table_name,
+                )
+
+    def _parallel_checkout(
+        self, target_schema: str, tables: List[str], workers: int, keep: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Materialize multiple tables at the same time. Every table is materialized into a staging
+        table in the target schema on a separate connection. Once all of them are done, they replace
+        the previously checked out tables in one transaction.
+
+        :param keep: Currently checked out tables that shouldn't be deleted.
+        """
+        object_engine = self.object_engine
+        object_manager = self.repository.objects
+
+        # Create the schema first so that other connections can see it.
+        object_engine.create_schema(target_schema)
+        object_engine.commit()
+
+        # Download all objects required by the image in one go (tables share
+        # objects, so this also avoids downloading them multiple times).
+        all_tables = [self.get_table(t) for t in tables]
+        all_objects = list({o: None for t in all_tables for o in t.objects})
+        staging_tables = {t: "sg_tmp_checkout_%d" % i for i, t in enumerate(tables)}
+
+        def _materialize(table: Table) -> None:
+            # Connections are keyed by thread, so this runs in the worker's own transaction.
+            try:
+                table.materialize(staging_tables[table.table_name], target_schema)
+                object_engine.connection.commit()
+            except Exception:
+                object_engine.connection.rollback()
+                raise
+
+        logging.info(
+            "Materializing %d tables using %d workers", len(tables), min(workers, len(tables))
+        )
+        try:
+            with object_manager.ensure_objects(
+                None, objects=all_objects, defer_release=True
+            ) as eo_result:
+                _, release_callback = cast(Tuple[List[str], "ObjectReleaseCallback"], eo_result)
+                try:
+                    with ThreadPoolExecutor(max_workers=workers) as tpe:
+                        list(tpe.map(_materialize, all_tables))
+                finally:
+                    object_engine.close_others()
+                    if self.engine != object_engine:
+                        self.engine.close_others()
+                    release_callback()
+        except Exception:
+            object_engine.rollback()
+            for staging_table in staging_tables.values():
+                object_engine.delete_table(target_schema, staging_table)
+            object_engine.commit()
+            raise
+
+        # Swap the new tables in.
+        staging = set(staging_tables.values())
+        for table in object_engine.get_all_tables(target_schema):
+            if table not in staging and table not in (keep or []):
+                object_engine.delete_table(target_schema, table)
+        for table, staging_table in staging_tables.items():
+            object_engine.run_sql(
+                SQL("ALTER TABLE {}.{} RENAME TO {}").format(
+                    Identifier(target_schema), Identifier(staging_table), Identifier(table)
+                )
+            )
+
     def _lq_checkout(
         self, target_schema: Optional[str] = None, wrapper: Optional[str] = FDW_CLASS
     ) -> None:
@@ -7,7 +7,7 @@ from hashlib import sha256
 from math import ceil, log, exp
 from typing import Any, Dict, List, Optional, Tuple, Union, cast, TYPE_CHECKING
 
-from psycopg2.sql import SQL, Identifier
+from psycopg2.sql import SQL, Identifier, Composable
 
 from splitgraph.config import SPLITGRAPH_META_SCHEMA
 from splitgraph.core.output import pretty_size
@@ -58,8 +58,7 @@ def generate_bloom_index(
     :return: Dictionary to be inserted into the index.
     """
 
-    if not (probability is None) ^ (size is None):
-        raise ValueError("One of probability or size must be specified, but not both!")
+    _check_bloom_params(probability, size)
 
     # We need k hash functions to generate a signature for every item, which we can construct
     # by taking a linear combination of two hash functions. The first hash function is a simple sha of the
@@ -100,6 +99,44 @@ def generate_bloom_index(
                 # to keep in mind.
                 digests.append(_hash_value(old_row[column]))
 
+    return make_bloom_filter(digests, probability, size)
+
+
+def _check_bloom_params(probability: Optional[float], size: Optional[int]) -> None:
+    if not (probability is None) ^ (size is None):
+        raise ValueError("One of probability or size must be specified, but not both!")
+
+
+def bloom_digest_sql(column: str) -> Composable:
+    """
+    Generate an aggregate that collects all distinct value hashes in a column that are used to
+    build a bloom filter, so that it can be computed in the same query as other fragment statistics.
+    Use `split_bloom_digests` to turn the result into input for `make_bloom_filter`.
+    """
+    return SQL(
+        "array_agg(DISTINCT digest(coalesce({0}::text, 'NULL'), 'sha256') "
+        "|| digest(coalesce({0}::text, 'NULL') || 'salt', 'sha256'))"
+    ).format(Identifier(column))
+
+
+def split_bloom_digests(digests: List[bytes]) -> List[Tuple[bytes, bytes]]:
+    """Split the result of `bloom_digest_sql` into pairs of hashes."""
+    return [(bytes(d[:32]), bytes(d[32:])) for d in digests]
+
+
+def make_bloom_filter(
+    digests: List[Tuple[bytes, bytes]],
+    probability: Optional[float] = None,
+    size: Optional[int] = None,
+) -> Tuple[int, str]:
+    """
+    Build a bloom filter out of value hashes. See `generate_bloom_index` for the parameters.
+
+    :param digests: List of (hash, salted hash) for every value in the set.
+    :return: Dictionary to be inserted into the index.
+    """
+    _check_bloom_params(probability, size)
+
     # Count the number of distinct items and determine the size (if needed) and optimal number
     # of hash functions.
     distinct_items = list(set(digests))
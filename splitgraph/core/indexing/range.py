@@ -172,9 +172,7 @@ def extract_min_max_pks(
     # so we'll be fetching/scanning through them when it might not be necessary.
 
     min_max = []
-    pk_sql = SQL(",").join(
-        Identifier(p) + SQL(_inject_collation("", t)) for p, t in zip(table_pks, table_pk_types)
-    )
+    pk_sql = pk_order_sql(table_pks, table_pk_types)
     for fragment in fragments:
         query = (
             SQL("SELECT ")
@@ -187,12 +185,7 @@ def extract_min_max_pks(
             query + pk_sql + SQL(" LIMIT 1"), return_shape=ResultShape.ONE_MANY
         )
         frag_max = engine.run_sql(
-            query
-            + SQL(",").join(
-                Identifier(p) + SQL(_inject_collation("", t) + " DESC")
-                for p, t in zip(table_pks, table_pk_types)
-            )
-            + SQL(" LIMIT 1"),
+            query + pk_order_sql(table_pks, table_pk_types, desc=True) + SQL(" LIMIT 1"),
             return_shape=ResultShape.ONE_MANY,
         )
 
@@ -200,6 +193,14 @@ def extract_min_max_pks(
     return min_max
 
 
+def pk_order_sql(table_pks: List[str], table_pk_types: List[str], desc: bool = False) -> Composable:
+    """Generate a list of PK columns to ORDER BY that compares strings the same way Python does."""
+    return SQL(",").join(
+        Identifier(p) + SQL(_inject_collation("", t) + (" DESC" if desc else ""))
+        for p, t in zip(table_pks, table_pk_types)
+    )
+
+
 def generate_range_index(
     object_engine: "PsycopgEngine",
     object_id: str,
@@ -217,6 +218,37 @@ def generate_range_index(
     :param columns: Columns to run the index on (default all)
     :return: Dictionary of {column: [min, max]}
     """
+    columns_to_index, object_pk, column_types = get_range_index_columns(table_schema, columns)
+
+    logging.debug("Running range index on columns %s", columns_to_index)
+    query = SQL("SELECT ") + min_max_sql(columns_to_index, column_types)
+    query += SQL(" FROM {}.{}").format(Identifier(SPLITGRAPH_META_SCHEMA), Identifier(object_id))
+    result = object_engine.run_sql(query, return_shape=ResultShape.ONE_MANY)
+    index = {
+        col: (cmin, cmax) for col, cmin, cmax in zip(columns_to_index, result[0::2], result[1::2])
+    }
+    # Also explicitly store the ranges of composite PKs (since they won't be included
+    # in the columns list) to be used for faster chunking/querying.
+    if len(object_pk) > 1:
+        # Add the PK to the same index dict but prefix it with a dollar sign so that
+        # it explicitly doesn't clash with any other columns.
+        index["$pk"] = extract_min_max_pks(
+            object_engine, [object_id], object_pk, [column_types[c] for c in object_pk]
+        )[0]
+    return finalize_range_index(index, columns_to_index, column_types, changeset)
+
+
+def get_range_index_columns(
+    table_schema: "TableSchema", columns: Optional[List[str]] = None
+) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """
+    Figure out which columns of a table can be range indexed.
+
+    :param table_schema: Schema of the table
+    :param columns: Columns to run the index on (default all)
+    :return: Tuple of (list of columns to index, columns forming the object's PK,
+        dictionary of {column: type})
+    """
     columns = columns or [c.name for c in table_schema]
 
     object_pk = [c.name for c in table_schema if c.is_pk]
@@ -228,30 +260,37 @@ def generate_range_index(
         for c in table_schema
         if _strip_type_mod(c.pg_type) in PG_INDEXABLE_TYPES and (c.is_pk or c.name in columns)
     ]
+    return columns_to_index, object_pk, column_types
 
-    logging.debug("Running range index on columns %s", columns_to_index)
-    query = SQL("SELECT ") + SQL(",").join(
+
+def min_max_sql(columns: List[str], column_types: Dict[str, str]) -> Composable:
+    """Generate a list of MIN/MAX aggregates for given columns to be used in a SELECT clause."""
+    return SQL(",").join(
         SQL(
             _inject_collation("MIN({0}", column_types[c])
             + "), "
             + _inject_collation("MAX({0}", column_types[c])
             + ")"
         ).format(Identifier(c))
-        for c in columns_to_index
+        for c in columns
     )
-    query += SQL(" FROM {}.{}").format(Identifier(SPLITGRAPH_META_SCHEMA), Identifier(object_id))
-    result = object_engine.run_sql(query, return_shape=ResultShape.ONE_MANY)
-    index = {
-        col: (cmin, cmax) for col, cmin, cmax in zip(columns_to_index, result[0::2], result[1::2])
-    }
-    # Also explicitly store the ranges of composite PKs (since they won't be included
-    # in the columns list) to be used for faster chunking/querying.
-    if len(object_pk) > 1:
-        # Add the PK to the same index dict but prefix it with a dollar sign so that
-        # it explicitly doesn't clash with any other columns.
-        index["$pk"] = extract_min_max_pks(
-            object_engine, [object_id], object_pk, [column_types[c] for c in object_pk]
-        )[0]
+
+
+def finalize_range_index(
+    index: Dict[str, Tuple[Any, Any]],
+    columns_to_index: List[str],
+    column_types: Dict[str, str],
+    changeset: Optional[Changeset] = None,
+) -> Dict[str, Tuple[T, T]]:
+    """
+    Turn the raw minimum/maximum values of every column in an object into a range index.
+
+    :param index: Dictionary of {column: (min, max)}
+    :param columns_to_index: Columns that are being indexed
+    :param column_types: Dictionary of {column: type}
+    :param changeset: Changeset (old values will be included in the index)
+    :return: Dictionary of {column: [min, max]}
+    """
     if changeset:
         # Expand the index ranges to include the old row values in this chunk.
         # Why is this necessary? Say we have a table of (key (PK), value) and a
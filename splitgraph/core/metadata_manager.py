@@ -2,16 +2,18 @@
 Classes related to managing table/image/object metadata tables.
 """
 import itertools
+import json
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING, NamedTuple, cast, Sequence
 
 from psycopg2.extras import Json
 from psycopg2.sql import SQL, Identifier
 
-from splitgraph.config import SPLITGRAPH_API_SCHEMA, SPLITGRAPH_META_SCHEMA
+from splitgraph.config import SPLITGRAPH_API_SCHEMA, SPLITGRAPH_META_SCHEMA, CONFIG, get_singleton
 from splitgraph.core.types import TableSchema
 from splitgraph.engine import ResultShape
 from splitgraph.engine.postgres.engine import API_MAX_VARIADIC_ARGS, chunk
+from .common import LRUCache
 from .sql import select
 
 if TYPE_CHECKING:
@@ -47,6 +49,20 @@ class Object(NamedTuple):
     rows_deleted: int
 
 
+def _object_meta_size(obj: Object) -> int:
+    # Rough estimate of the memory an object's metadata takes up (dominated by the index).
+    return 512 + len(json.dumps(obj.object_index, default=str))
+
+
+# In-process cache of object metadata, keyed on the metadata engine name and the object ID.
+# Objects are immutable and get overwritten only through register_objects, which
+# invalidates their cache entries.
+OBJECT_META_CACHE = LRUCache(
+    maxsize=int(get_singleton(CONFIG, "SG_OBJECT_META_CACHE_SIZE")) * 1024 * 1024,
+    sizeof=_object_meta_size,
+)
+
+
 class MetadataManager:
     """
     A data access layer for the metadata tables in the splitgraph_meta schema that concerns itself
@@ -74,6 +90,7 @@ class MetadataManager:
             for o in objects
         ]
 
+        OBJECT_META_CACHE.invalidate((self.metadata_engine.name, o.object_id) for o in objects)
         self.metadata_engine.run_sql_batch(
             SQL(
                 "SELECT {}.add_object(" + ",".join(itertools.repeat("%s", len(OBJECT_COLS))) + ")"
@@ -184,7 +201,10 @@ class MetadataManager:
 
     def get_object_meta(self, objects: List[str]) -> Dict[str, Object]:
         """
-        Get metadata for multiple Splitgraph objects from the tree
+        Get metadata for multiple Splitgraph objects from the tree.
+
+        Since objects are immutable, their metadata is cached in memory and only objects
+        that haven't been seen before are fetched from the metadata engine.
 
         :param objects: List of objects to get metadata for.
         :return: Dictionary of object_id -> Object
@@ -192,18 +212,27 @@ class MetadataManager:
         if not objects:
             return {}
 
-        metadata = self.metadata_engine.run_chunked_sql(
-            select(
-                "get_object_meta",
-                ",".join(OBJECT_COLS),
-                schema=SPLITGRAPH_API_SCHEMA,
-                table_args="(%s)",
-            ),
-            (list(objects),),
-            chunk_position=0,
-        )
-        result = [Object(*m) for m in metadata]
-        return {o.object_id: o for o in result}
+        engine_name = self.metadata_engine.name
+        cached = OBJECT_META_CACHE.get_many((engine_name, o) for o in objects)
+        result = {object_id: obj for (_, object_id), obj in cached.items()}
+
+        missing = list({o for o in objects if o not in result})
+        if missing:
+            metadata = self.metadata_engine.run_chunked_sql(
+                select(
+                    "get_object_meta",
+                    ",".join(OBJECT_COLS),
+                    schema=SPLITGRAPH_API_SCHEMA,
+                    table_args="(%s)",
+                ),
+                (missing,),
+                chunk_position=0,
+            )
+            for m in metadata:
+                obj = Object(*m)
+                OBJECT_META_CACHE.put((engine_name, obj.object_id), obj)
+                result[obj.object_id] = obj
+        return result
 
     def get_objects_for_repository(
         self, repository: "Repository", image_hash: Optional[str] = None
@@ -231,6 +260,7 @@ class MetadataManager:
 
         :param object_ids: Object IDs to delete
         """
+        OBJECT_META_CACHE.invalidate((self.metadata_engine.name, o) for o in object_ids)
         for table_name in ["object_locations", "objects"]:
             self.metadata_engine.run_chunked_sql(
                 SQL("DELETE FROM {}.{} WHERE object_id = ANY(%s)").format(
@@ -1,12 +1,15 @@
 """Functions related to creating, deleting and keeping track of physical Splitgraph objects."""
+import atexit
 import itertools
 import logging
-import math
+import threading
+import time
 from collections import defaultdict
 from contextlib import contextmanager
 from datetime import datetime as dt
 from typing import (
     Any,
+    Callable,
     Dict,
     Iterator,
     List,
@@ -32,7 +35,15 @@ from splitgraph.exceptions import (
     IncompleteObjectDownloadError,
 )
 from splitgraph.hooks.external_objects import get_external_object_handler
+from .access_stats import get_access_stats_recorder
 from .common import META_TABLES, Tracer, CallbackList
+from .eviction import (
+    CacheEntry,
+    EvictionPolicy,
+    SizeAdmissionPolicy,
+    TRACE_TIMESTAMP_FORMAT,
+    get_eviction_policy,
+)
 from .output import pretty_size, pluralise, truncate_list
 from .sql import select, insert
 
@@ -41,6 +52,61 @@ if TYPE_CHECKING:
     from splitgraph.engine.postgres.engine import PsycopgEngine, PostgresEngine
 
 
+# Key of the advisory lock taken out by object managers that need to download objects into the cache
+_CACHE_LOCK_KEY = "splitgraph_meta.object_cache_status"
+
+
+class _ObjectLease:
+    """Claim on a cached object held by this process on behalf of its users."""
+
+    def __init__(self, expiry: float) -> None:
+        self.users = 1
+        self.expiry = expiry
+
+
+# Objects leased by this process (object engine name -> object ID -> lease)
+_LEASES: DefaultDict[str, Dict[str, _ObjectLease]] = defaultdict(dict)
+_LEASE_ENGINES: Dict[str, "PostgresEngine"] = {}
+_LEASES_LOCK = threading.Lock()
+
+# Eviction policies used by this process (object engine name, policy name -> policy). Some
+# policies keep track of object accesses, so they're shared between all object managers.
+_EVICTION_POLICIES: Dict[Tuple[str, str], EvictionPolicy] = {}
+_ADMISSION_POLICIES: Dict[Tuple[str, float], SizeAdmissionPolicy] = {}
+_EVICTION_POLICIES_LOCK = threading.Lock()
+
+
+@atexit.register
+def _flush_all_leases() -> None:
+    for engine in list(_LEASE_ENGINES.values()):
+        try:
+            ObjectManager(engine).flush_leases(force=True)
+            engine.commit()
+        except Exception:  # pragma: no cover
+            logging.exception("Error releasing object leases on engine %s", engine.name)
+
+
+class ObjectReleaseCallback(CallbackList):
+    """
+    Callback returned by `ObjectManager.ensure_objects` that releases the claimed objects
+    when called. Objects that the caller is done with can be released before the rest of
+    them using `release_objects`, letting the cache evict them earlier.
+    """
+
+    def __init__(self, release: Callable[[List[str]], None], callbacks: List[Callable]) -> None:
+        super().__init__(callbacks)
+        self._release = release
+
+    def release_objects(self, objects: List[str]) -> None:
+        """
+        Release some of the claimed objects. They won't be released again when the
+        callback is called.
+
+        :param objects: List of objects to release
+        """
+        self._release(objects)
+
+
 class ObjectManager(FragmentManager):
     """Brings the multiple manager classes together and manages the object cache (downloading and uploading
     objects as required in order to fulfill certain queries)"""
@@ -56,6 +122,9 @@ class ObjectManager(FragmentManager):
         """
         super().__init__(object_engine, metadata_engine)
 
+        # Key for the object engine's state that's shared between object managers in this process
+        self._engine_key: str = self.object_engine.name or ""
+
         # Cache size in bytes
         self.cache_size = int(get_singleton(CONFIG, "SG_OBJECT_CACHE_SIZE")) * 1024 * 1024
 
@@ -69,12 +138,46 @@ class ObjectManager(FragmentManager):
         # downloading them).
         self.eviction_floor = float(get_singleton(CONFIG, "SG_EVICTION_FLOOR")) * 1024 * 1024
 
+        # Time, in seconds, that this process keeps its claims on cached objects for after they've
+        # been released, so that queries reusing the same objects don't have to claim them again.
+        self.lease_time = float(get_singleton(CONFIG, "SG_OBJECT_LEASE_TIME"))
+
         # Fraction of the cache size to free when eviction is run (the greater value of this amount and the
         # amount needed to download required objects is actually freed). Eviction is an expensive operation
         # (it pauses concurrent downloads) so increasing this makes eviction happen less often at the cost
         # of more possible cache misses.
         self.eviction_min_fraction = float(get_singleton(CONFIG, "SG_EVICTION_MIN_FRACTION"))
 
+        # Policy used to choose which objects to evict (see splitgraph.core.eviction)
+        self.eviction_policy_name = get_singleton(CONFIG, "SG_EVICTION_POLICY")
+
+        # Objects larger than this that have only been used once are evicted as soon as
+        # they're not used anymore, instead of pushing other objects out of the cache.
+        admission_fraction = float(get_singleton(CONFIG, "SG_EVICTION_ADMISSION_MAX_FRACTION"))
+        self.admission_policy: Optional[SizeAdmissionPolicy] = None
+        if admission_fraction < 1:
+            key = (self._engine_key, admission_fraction * self.cache_size)
+            with _EVICTION_POLICIES_LOCK:
+                if key not in _ADMISSION_POLICIES:
+                    _ADMISSION_POLICIES[key] = SizeAdmissionPolicy(key[1])
+                self.admission_policy = _ADMISSION_POLICIES[key]
+
+        # File to record object accesses into
+        self.access_trace = get_singleton(CONFIG, "SG_OBJECT_ACCESS_TRACE")
+
+    @property
+    def eviction_policy(self) -> EvictionPolicy:
+        key = (self._engine_key, self.eviction_policy_name)
+        with _EVICTION_POLICIES_LOCK:
+            if key not in _EVICTION_POLICIES:
+                _EVICTION_POLICIES[key] = get_eviction_policy(
+                    self.eviction_policy_name,
+                    cache_size=self.cache_size,
+                    decay=self.eviction_decay_constant,
+                    floor=self.eviction_floor,
+                )
+            return _EVICTION_POLICIES[key]
+
     def get_downloaded_objects(self, limit_to: Optional[List[str]] = None) -> List[str]:
         """
         Gets a list of objects currently in the Splitgraph cache (i.e. not only existing externally.)
@@ -146,7 +249,7 @@ class ObjectManager(FragmentManager):
         defer_release: bool = False,
         tracer: Optional[Tracer] = None,
         upstream_manager: Optional["ObjectManager"] = None,
-    ) -> Iterator[Union[List[str], Tuple[List[str], CallbackList]]]:
+    ) -> Iterator[Union[List[str], Tuple[List[str], ObjectReleaseCallback]]]:
         """
         Resolves the objects needed to materialize a given table and makes sure they are in the local
         splitgraph_meta schema.
@@ -191,74 +294,60 @@ class ObjectManager(FragmentManager):
             required_objects = self.filter_fragments(table.objects, table, quals)
             tracer.log("filter_objects")
 
+        self._record_accesses(required_objects)
+
         # Increase the refcount on all of the objects we're giving back to the caller so that others don't GC them.
         logging.debug("Claiming %s", pluralise("object", len(required_objects)))
 
-        self._claim_objects(required_objects)
-        tracer.log("claim_objects")
+        # Objects that this process already holds a lease on are known to be in the cache
+        # and don't need to be claimed again.
+        leased = self._acquire_leases(required_objects) if self.lease_time else []
+        to_claim = [o for o in required_objects if o not in leased]
 
         try:
-            to_fetch = self._prepare_fetch_list(required_objects)
-        except SplitGraphError:
-            self.object_engine.rollback()
-            raise
-        tracer.log("prepare_fetch_list")
-
-        # Perform the actual download. If the table has no upstream but still has external locations, we download
-        # just the external objects.
-        if to_fetch:
-            object_locations = self.get_external_object_locations(to_fetch)
-
-            # If all objects are externally hosted, there's no need to try and get the table's
-            # upstream (there's a corner case where the metadata engine is different from the object
-            # engine and the repo actually has no upstream)
-            if (
-                self.metadata_engine == self.object_engine
-                and table is not None
-                and upstream_manager is None
-            ):
-                upstream_manager = (
-                    table.repository.upstream.objects if table.repository.upstream else None
-                )
-
-            partial_failure: Optional[BaseException] = None
-            try:
-                successful = self.download_objects(
-                    upstream_manager, objects_to_fetch=to_fetch, object_locations=object_locations
-                )
-                difference = []
-            except IncompleteObjectDownloadError as e:
-                successful = e.successful_objects
-                difference = list(set(to_fetch).difference(successful))
-                if difference:
-                    if e.reason:
-                        partial_failure = e.reason
-                    else:
-                        partial_failure = self._generate_download_error(table, difference)
-            except Exception as e:
-                successful = self.get_downloaded_objects(to_fetch)
-                difference = list(set(to_fetch).difference(successful))
-                partial_failure = self._generate_download_error(table, difference, cause=e)
-
-            # No matter what, claim the space required by the newly downloaded objects.
-            if successful:
-                self._increase_cache_occupancy(successful)
-
-            if partial_failure:
-                # Instead of deleting all objects in this batch, discard the cache data
-                # on the objects that failed, decrease the refcount on the objects that
-                # succeeded and mark them as ready.
-                self._delete_cache_entries(difference)
-                self._set_ready_flags(successful, is_ready=True)
-                self._release_objects(successful)
+            if self.lease_time:
+                self.flush_leases()
+            self._claim_objects(to_claim)
+            tracer.log("claim_objects")
+
+            while True:
+                try:
+                    to_fetch, in_flight = self._prepare_fetch_list(to_claim)
+                except SplitGraphError:
+                    self.object_engine.rollback()
+                    raise
+                tracer.log("prepare_fetch_list")
+
+                if to_fetch:
+                    self._fetch_objects(to_fetch, table, upstream_manager)
+                tracer.log("fetch_objects")
+
+                if not in_flight:
+                    break
+
+                # Other object managers are downloading some of the objects we need. Commit our
+                # own downloads so that we're not holding locks that they might be waiting on
+                # and wait for them to finish instead of downloading the objects again.
                 self.object_engine.commit()
+                lost = self._wait_for_downloads(in_flight)
+                tracer.log("wait_for_downloads")
+
+                # If another manager failed to download some objects, it discarded their cache
+                # entries (including our claims on them): reclaim them and try again ourselves.
+                self._claim_objects(lost)
+        except BaseException:
+            self._return_leases(leased)
+            raise
 
-                raise partial_failure
-
-            self._set_ready_flags(to_fetch, is_ready=True)
-        tracer.log("fetch_objects")
+        if self.lease_time:
+            # Hold on to the claims that we made as leases. If another thread leased some
+            # of the same objects in the meantime, drop our extra claims on them.
+            self._release_objects(self._add_leases(to_claim))
         logging.debug("Object manager finished.")
 
+        self._record_access_stats(required_objects, table if objects is None else None, quals)
+        tracer.log("record_access_stats")
+
         release_callback = self._make_release_callback(required_objects, table, tracer)
         try:
             # Release the lock and yield to the caller.
@@ -273,6 +362,56 @@ class ObjectManager(FragmentManager):
             if not defer_release:
                 release_callback()
 
+    def _record_accesses(self, objects: List[str]) -> None:
+        """Notify the eviction policy about object accesses and write them out to the access trace."""
+        policy = self.eviction_policy
+        if not objects or not (policy.stateful or self.access_trace):
+            return
+        now = dt.utcnow()
+        object_meta = self.get_object_meta(objects)
+        entries = [
+            CacheEntry(o, object_meta[o].size if o in object_meta else 0, now) for o in objects
+        ]
+        if policy.stateful:
+            with _EVICTION_POLICIES_LOCK:
+                for entry in entries:
+                    policy.on_access(entry)
+        if self.access_trace:
+            with open(self.access_trace, "a") as f:
+                for entry in entries:
+                    f.write(
+                        "%s,%s,%d\n"
+                        % (now.strftime(TRACE_TIMESTAMP_FORMAT), entry.object_id, entry.size)
+                    )
+
+    def _record_access_stats(
+        self, objects: List[str], table: Optional["Table"], quals: Optional[Quals]
+    ) -> None:
+        """
+        Record objects being used in the access statistics, if they're enabled.
+
+        :param objects: Objects being used
+        :param table: If the objects were chosen by filtering the table's objects, the table
+            to record the query against.
+        :param quals: Qualifiers used to filter the table's objects.
+        """
+        recorder = get_access_stats_recorder(self.object_engine)
+        if not recorder:
+            return
+        object_meta = self.get_object_meta(objects)
+        recorder.record_objects(
+            [(o, object_meta[o].size, object_meta[o].rows_inserted) for o in object_meta]
+        )
+        if table:
+            recorder.record_table_query(
+                table,
+                quals,
+                fragments_total=len(table.objects),
+                fragments_scanned=len(objects),
+                rows_scanned=sum(o.rows_inserted - o.rows_deleted for o in object_meta.values()),
+            )
+        recorder.flush_if_needed()
+
     def _generate_download_error(self, table, difference, cause=None):
         if table:
             error = "Not all objects required for %s:%s:%s have been fetched. Missing %s (%s)" % (
@@ -293,10 +432,232 @@ class ObjectManager(FragmentManager):
             partial_failure.__cause__ = cause
         return partial_failure
 
+    def _fetch_objects(
+        self,
+        to_fetch: List[str],
+        table: Optional["Table"],
+        upstream_manager: Optional["ObjectManager"],
+    ) -> None:
+        """
+        Download objects that have been claimed by `_prepare_fetch_list` and mark them as ready.
+        On failure, discards the cache entries for the objects that couldn't be downloaded.
+        """
+        # Perform the actual download. If the table has no upstream but still has external locations, we download
+        # just the external objects.
+        object_locations = self.get_external_object_locations(to_fetch)
+
+        # If all objects are externally hosted, there's no need to try and get the table's
+        # upstream (there's a corner case where the metadata engine is different from the object
+        # engine and the repo actually has no upstream)
+        if (
+            self.metadata_engine == self.object_engine
+            and table is not None
+            and upstream_manager is None
+        ):
+            upstream_manager = (
+                table.repository.upstream.objects if table.repository.upstream else None
+            )
+
+        partial_failure: Optional[BaseException] = None
+        try:
+            successful = self.download_objects(
+                upstream_manager, objects_to_fetch=to_fetch, object_locations=object_locations
+            )
+            difference = []
+        except IncompleteObjectDownloadError as e:
+            successful = e.successful_objects
+            difference = list(set(to_fetch).difference(successful))
+            if difference:
+                if e.reason:
+                    partial_failure = e.reason
+                else:
+                    partial_failure = self._generate_download_error(table, difference)
+        except Exception as e:
+            successful = self.get_downloaded_objects(to_fetch)
+            difference = list(set(to_fetch).difference(successful))
+            partial_failure = self._generate_download_error(table, difference, cause=e)
+
+        # No matter what, claim the space required by the newly downloaded objects.
+        if successful:
+            self._increase_cache_occupancy(successful)
+
+        if partial_failure:
+            # Instead of deleting all objects in this batch, discard the cache data
+            # on the objects that failed, decrease the refcount on the objects that
+            # succeeded and mark them as ready.
+            self._delete_cache_entries(difference)
+            self._set_ready_flags(successful, is_ready=True)
+            self._release_objects(successful)
+            self.object_engine.commit()
+
+            raise partial_failure
+
+        self._set_ready_flags(to_fetch, is_ready=True)
+
+    def _wait_for_downloads(self, objects: List[str]) -> List[str]:
+        """
+        Wait until other object managers have finished downloading objects.
+
+        :param objects: List of objects being downloaded by other managers.
+        :return: List of objects whose cache entries have been discarded because
+            their download failed.
+        """
+        logging.info(
+            "Waiting for %s to be downloaded by other processes", pluralise("object", len(objects))
+        )
+        # Managers downloading objects hold a lock on their cache entries until they're done,
+        # so this blocks until they commit or roll back. KEY SHARE doesn't conflict with
+        # refcount updates, so we don't block other managers claiming these objects.
+        present = self.object_engine.run_sql(
+            select(
+                "object_cache_status",
+                "object_id",
+                "object_id IN ("
+                + ",".join(itertools.repeat("%s", len(objects)))
+                + ") FOR KEY SHARE",
+            ),
+            objects,
+            return_shape=ResultShape.MANY_ONE,
+        )
+        return sorted(o for o in objects if o not in present)
+
+    def _get_unready_objects(self, objects: List[str], suffix: str = "") -> List[str]:
+        return cast(
+            List[str],
+            self.object_engine.run_sql(
+                select(
+                    "object_cache_status",
+                    "object_id",
+                    "ready = 'f' AND object_id IN ("
+                    + ",".join(itertools.repeat("%s", len(objects)))
+                    + ")"
+                    + suffix,
+                ),
+                objects,
+                return_shape=ResultShape.MANY_ONE,
+            ),
+        )
+
+    def _acquire_leases(self, objects: List[str]) -> List[str]:
+        """Start using the objects that this process holds a lease on."""
+        with _LEASES_LOCK:
+            leases = _LEASES[self._engine_key]
+            acquired = [o for o in objects if o in leases]
+            for object_id in acquired:
+                leases[object_id].users += 1
+        return acquired
+
+    def _add_leases(self, objects: List[str]) -> List[str]:
+        """
+        Turn claims on objects into leases.
+
+        :return: List of objects that this process already had a lease on (and
+            whose claims are hence redundant).
+        """
+        expiry = time.monotonic() + self.lease_time
+        redundant = []
+        with _LEASES_LOCK:
+            _LEASE_ENGINES[self._engine_key] = self.object_engine
+            leases = _LEASES[self._engine_key]
+            for object_id in objects:
+                if object_id in leases:
+                    leases[object_id].users += 1
+                    redundant.append(object_id)
+                else:
+                    leases[object_id] = _ObjectLease(expiry)
+        return redundant
+
+    def _return_leases(self, objects: List[str]) -> None:
+        """Stop using leased objects. The claims on them are kept until the leases expire."""
+        with _LEASES_LOCK:
+            leases = _LEASES[self._engine_key]
+            for object_id in objects:
+                if object_id in leases and leases[object_id].users:
+                    leases[object_id].users -= 1
+
+    def _release_claims(self, objects: List[str]) -> None:
+        if self.lease_time:
+            self._return_leases(objects)
+            self.flush_leases()
+        else:
+            self._release_objects(objects)
+            self._apply_admission_policy(objects)
+
+    def flush_leases(self, force: bool = False) -> None:
+        """
+        Release the claims on objects that this process holds leases on and that
+        aren't being used anymore. This doesn't commit the transaction.
+
+        :param force: Release all unused leases, including ones that haven't expired yet.
+        """
+        now = time.monotonic()
+        with _LEASES_LOCK:
+            leases = _LEASES[self._engine_key]
+            to_release = sorted(
+                o
+                for o, lease in leases.items()
+                if not lease.users and (force or lease.expiry <= now)
+            )
+            for object_id in to_release:
+                del leases[object_id]
+        if to_release:
+            logging.debug("Releasing %s", pluralise("object lease", len(to_release)))
+            self._release_objects(to_release)
+            self._apply_admission_policy(to_release)
+
+    def _apply_admission_policy(self, objects: List[str]) -> None:
+        """Evict released objects that the admission policy doesn't want to keep in the cache."""
+        if not self.admission_policy or not objects:
+            return
+        released = self.object_engine.run_sql(
+            select(
+                "object_cache_status",
+                "object_id,last_used,access_count",
+                "refcount = 0 AND ready AND object_id IN ("
+                + ",".join(itertools.repeat("%s", len(objects)))
+                + ") FOR UPDATE SKIP LOCKED",
+            ),
+            objects,
+            return_shape=ResultShape.MANY_MANY,
+        )
+        if not released:
+            return
+        object_meta = self.get_object_meta([r[0] for r in released])
+        rejected = [
+            CacheEntry(object_id, object_meta[object_id].size, last_used, access_count)
+            for object_id, last_used, access_count in released
+            if object_id in object_meta
+        ]
+        policy = self.eviction_policy
+        with _EVICTION_POLICIES_LOCK:
+            rejected = [e for e in rejected if not self.admission_policy.admit(e)]
+            if not rejected:
+                return
+            logging.debug(
+                "Evicting %s not admitted to the cache", pluralise("object", len(rejected))
+            )
+            for entry in rejected:
+                policy.on_evict(entry)
+        to_delete = [e.object_id for e in rejected]
+        self._delete_cache_entries(to_delete)
+        self._decrease_cache_occupancy(sum(e.size for e in rejected))
+        self.delete_objects(to_delete)
+
     def _make_release_callback(
         self, required_objects: List[str], table: Optional["Table"], tracer: Tracer
-    ) -> CallbackList:
+    ) -> ObjectReleaseCallback:
         called = False
+        remaining = set(required_objects)
+
+        def _release_early(objects: List[str]) -> None:
+            to_release = [o for o in objects if o in remaining]
+            if called or not to_release:
+                return
+            remaining.difference_update(to_release)
+            self.object_engine.run_sql("SET LOCAL synchronous_commit TO off")
+            self._release_claims(to_release)
+            logging.debug("Releasing %s early", pluralise("object", len(to_release)))
+            self.object_engine.commit()
 
         def _f(**kwargs):
             nonlocal called
@@ -309,9 +670,10 @@ class ObjectManager(FragmentManager):
             # garbage collected).
             tracer.log("caller")
             self.object_engine.run_sql("SET LOCAL synchronous_commit TO off")
-            self._release_objects(required_objects)
+            to_release = [o for o in required_objects if o in remaining]
+            self._release_claims(to_release)
             tracer.log("release_objects")
-            logging.debug("Releasing %s", pluralise("object", len(required_objects)))
+            logging.debug("Releasing %s", pluralise("object", len(to_release)))
             if table:
                 logging.debug(
                     "Timing stats for %s/%s/%s/%s: \n%s",
@@ -325,7 +687,7 @@ class ObjectManager(FragmentManager):
             # Release the metadata tables as well
             self.metadata_engine.commit()
 
-        return CallbackList([_f])
+        return ObjectReleaseCallback(_release_early, [_f])
 
     def make_objects_external(
         self, objects: List[str], handler: str, handler_params: Dict[Any, Any]
@@ -409,68 +771,67 @@ class ObjectManager(FragmentManager):
         if excess > 0:
             self.run_eviction(keep_objects=[], required_space=excess)
 
-    def _prepare_fetch_list(self, required_objects: List[str]) -> List[str]:
+    def _prepare_fetch_list(self, required_objects: List[str]) -> Tuple[List[str], List[str]]:
         """
-        Calculates the missing objects and ensures there's enough space in the cache
-        to download them.
+        Calculates the missing objects, ensures there's enough space in the cache
+        to download them and claims the downloads that no other object manager is working on.
 
         :param required_objects: Iterable of object IDs that are required to be on the engine.
-        :return: Set of objects to fetch
+        :return: List of objects to fetch and list of objects that are being fetched by other
+            object managers.
         """
-        to_fetch: List[str] = self.object_engine.run_sql(
-            select("object_cache_status", "object_id", "ready = 'f'"),
-            return_shape=ResultShape.MANY_ONE,
+        if not required_objects:
+            return [], []
+        to_fetch = self._get_unready_objects(required_objects)
+        if not to_fetch:
+            return [], []
+
+        # Make our claims visible to other managers (so that they can't evict the objects
+        # we need) and release the row locks on them.
+        self.object_engine.commit()
+
+        # Serialize cache space accounting and eviction between managers that need to download
+        # objects. This used to be a lock on the whole object_cache_status table, which also
+        # blocked managers whose objects were all in the cache.
+        self.object_engine.run_sql(
+            SQL("SELECT pg_advisory_xact_lock(hashtext(%s))"), (_CACHE_LOCK_KEY,)
         )
-        if to_fetch:
-            # If we need to download anything, take out an exclusive lock on the cache since we might
-            # need to run eviction and don't want multiple managers trying to download the same things.
-            # This used to be more granular (allow multiple managers downloading objects) but was resulting
-            # in fun concurrency bugs and deadlocks that I don't have the willpower to investigate further
-            # right now (e.g. two managers trying to download the same objects at the same time after one of them
-            # runs cache eviction and releases some locks -- or two managers trying to free the same amount
-            # of space in the cache for the same set of objects).
-
-            # Since we already hold a row-level lock on some objects in the cache, we have to release it first and
-            # lock the full table then -- but this means someone else might start downloading the objects that
-            # we claimed. So, once we acquire the lock, we recalculate the fetch list again to see what
-            # we're supposed to be fetching.
-            self.object_engine.commit()
-            self.object_engine.lock_table(SPLITGRAPH_META_SCHEMA, "object_cache_status")
-            to_fetch = self.object_engine.run_sql(
-                select("object_cache_status", "object_id", "ready = 'f'"),
-                return_shape=ResultShape.MANY_ONE,
-            )
-            # If someone else downloaded all the objects we need, there's no point in holding the lock.
-            # This is tricky to test with a single process.
-            if not to_fetch:  # pragma: no cover
-                self.object_engine.commit()
-                return to_fetch
-            required_space = sum(o.size for o in self.get_object_meta(list(to_fetch)).values())
-            current_occupied = self.get_cache_occupancy()
-            logging.info(
-                "Need to download %s (%s), cache occupancy: %s/%s",
-                pluralise("object", len(required_objects)),
-                pretty_size(required_space),
-                pretty_size(current_occupied),
-                pretty_size(self.cache_size),
-            )
-            # If the total cache size isn't large enough, there's nothing we can do without cooperating with the
-            # caller and seeing if they can use the objects one-by-one.
-            if required_space > self.cache_size:
-                raise ObjectCacheError(
-                    "Not enough space in the cache to download the required objects!"
-                )
-            if required_space > self.cache_size - current_occupied:
-                to_free = required_space + current_occupied - self.cache_size
-                logging.info("Need to free %s", pretty_size(to_free))
-                self.run_eviction(required_objects, to_free)
+        to_fetch = self._get_unready_objects(required_objects)
+        # If someone else downloaded all the objects we need, there's no point in holding the lock.
+        # This is tricky to test with a single process.
+        if not to_fetch:  # pragma: no cover
             self.object_engine.commit()
-            # Finally, after we're done with eviction, relock the objects that we're supposed to be downloading.
-            to_fetch = self.object_engine.run_sql(
-                select("object_cache_status", "object_id", "ready = 'f' FOR UPDATE"),
-                return_shape=ResultShape.MANY_ONE,
+            return [], []
+        required_space = sum(o.size for o in self.get_object_meta(list(to_fetch)).values())
+        current_occupied = self.get_cache_occupancy()
+        logging.info(
+            "Need to download %s (%s), cache occupancy: %s/%s",
+            pluralise("object", len(to_fetch)),
+            pretty_size(required_space),
+            pretty_size(current_occupied),
+            pretty_size(self.cache_size),
+        )
+        # If the total cache size isn't large enough, there's nothing we can do without cooperating with the
+        # caller and seeing if they can use the objects one-by-one.
+        if required_space > self.cache_size:
+            raise ObjectCacheError(
+                "Not enough space in the cache to download the required objects!"
             )
-        return to_fetch
+        if required_space > self.cache_size - current_occupied:
+            to_free = required_space + current_occupied - self.cache_size
+            logging.info("Need to free %s", pretty_size(to_free))
+            # Make objects that this process has leased but isn't using evictable.
+            self.flush_leases(force=True)
+            self.run_eviction(required_objects, to_free)
+        self.object_engine.commit()
+
+        # Finally, after we're done with eviction, lock the objects that we're going to be downloading.
+        # Objects that are already locked are being downloaded by another manager: we'll wait for
+        # those instead of downloading them twice.
+        missing = self._get_unready_objects(required_objects)
+        to_fetch = self._get_unready_objects(required_objects, suffix=" FOR UPDATE SKIP LOCKED")
+        in_flight = [o for o in missing if o not in to_fetch]
+        return to_fetch, in_flight
 
     def _claim_objects(self, objects: List[str]) -> None:
         """Increases refcounts and bumps the last used timestamp to now for cached objects.
@@ -487,7 +848,7 @@ class ObjectManager(FragmentManager):
         claimed = self.object_engine.run_sql(
             SQL(
                 "UPDATE {}.object_cache_status SET refcount = refcount + 1, "
-                "last_used = %s WHERE object_id IN ("
+                "access_count = access_count + 1, last_used = %s WHERE object_id IN ("
             ).format(Identifier(SPLITGRAPH_META_SCHEMA))
             + SQL(",".join(itertools.repeat("%s", len(objects))))
             + SQL(") RETURNING object_id"),
@@ -508,11 +869,15 @@ class ObjectManager(FragmentManager):
         # we try to insert them, we'll be blocked until the other engine finishes its download and commits
         # the transaction -- then get an integrity error. So here, we do an update on conflict (again).
         self.object_engine.run_sql_batch(
-            insert("object_cache_status", ("object_id", "ready", "refcount", "last_used"))
+            insert(
+                "object_cache_status",
+                ("object_id", "ready", "refcount", "last_used", "access_count"),
+            )
             + SQL(
-                "ON CONFLICT (object_id) DO UPDATE SET refcount = EXCLUDED.refcount + 1, last_used = %s"
+                "ON CONFLICT (object_id) DO UPDATE SET refcount = EXCLUDED.refcount + 1, "
+                "access_count = object_cache_status.access_count + 1, last_used = %s"
             ),
-            [(object_id, False, 1, now, now) for object_id in remaining],
+            [(object_id, False, 1, now, 1, now) for object_id in remaining],
         )
 
     def _set_ready_flags(self, objects: List[str], is_ready: bool = True) -> None:
@@ -575,7 +940,12 @@ class ObjectManager(FragmentManager):
         candidates = [
             o
             for o in self.object_engine.run_sql(
-                select("object_cache_status", "object_id,last_used", "refcount=0"),
+                # Lock the candidates so that other managers can't claim them until we're done.
+                select(
+                    "object_cache_status",
+                    "object_id,last_used,access_count",
+                    "refcount=0 FOR UPDATE SKIP LOCKED",
+                ),
                 return_shape=ResultShape.MANY_MANY,
             )
             if o[0] not in keep_objects
@@ -623,19 +993,6 @@ class ObjectManager(FragmentManager):
                 "Eviction done. Cache occupancy: %s", pretty_size(self.get_cache_occupancy())
             )
 
-    def _eviction_score(self, now, object_size, last_used):
-        # We want to evict objects in order to minimize
-        # P(object is requested again) * (cost of redownloading the object).
-        # To approximate the probability, we use an exponential decay function (1 if last_used = now, dropping down
-        # to 0 as time since the object's last usage time passes).
-        # To approximate the cost, we use the object's size, floored to a constant (so if the object has
-        # size <= floor, we'd use the floor value -- this is to simulate the latency of re-fetching the object,
-        # as opposed to the bandwidth)
-        time_since_used = (now - last_used).total_seconds()
-        time_factor = math.exp(-self.eviction_decay_constant * time_since_used)
-        size_factor = object_size if object_size > self.eviction_floor else self.eviction_floor
-        return time_factor * size_factor
-
     def _prepare_eviction_candidates(
         self, candidates, object_sizes, orphaned_object_sizes, orphaned_objects, required_space
     ):
@@ -650,19 +1007,22 @@ class ObjectManager(FragmentManager):
         last_useds = [o[1] for o in candidates if o[0] in orphaned_objects]
         freed_space = sum(orphaned_object_sizes.values())
 
-        # Sort candidates by deletion priority (lowest is smallest expected retrieval cost -- more likely to delete)
-        candidates = sorted(
-            [o for o in candidates if o[0] not in orphaned_objects],
-            key=lambda o: self._eviction_score(now, object_sizes[o[0]], o[1]),
-        )
-
-        # Keep adding deletion candidates until we've freed enough space.
-        for object_id, last_used in candidates:
-            if freed_space >= required_space:
-                break
-            last_useds.append(last_used)
-            to_delete.append(object_id)
-            freed_space += object_sizes[object_id]
+        # Let the eviction policy choose the rest of the objects to delete until we've freed enough space.
+        entries = [
+            CacheEntry(object_id, object_sizes[object_id], last_used, access_count)
+            for object_id, last_used, access_count in candidates
+            if object_id not in orphaned_objects
+        ]
+        policy = self.eviction_policy
+        with _EVICTION_POLICIES_LOCK:
+            victims = policy.select_victims(entries, required_space - freed_space, now)
+            for victim in victims:
+                policy.on_evict(victim)
+
+        for victim in victims:
+            last_useds.append(victim.last_used)
+            to_delete.append(victim.object_id)
+            freed_space += victim.size
         logging.info(
             "Will delete %s last used between %s and %s, total size %s: %s",
             pluralise("object", len(to_delete)),
@@ -676,6 +1036,11 @@ class ObjectManager(FragmentManager):
     def _delete_cache_entries(self, to_delete: List[str]) -> None:
         if not to_delete:
             return
+        # Claims on the objects go away with their cache entries.
+        with _LEASES_LOCK:
+            leases = _LEASES[self._engine_key]
+            for object_id in to_delete:
+                leases.pop(object_id, None)
         self.object_engine.run_sql(
             SQL(
                 "DELETE FROM {}.{} WHERE object_id IN ("
@@ -804,6 +1169,10 @@ class ObjectManager(FragmentManager):
             if c not in META_TABLES
         }
         tables_in_meta.update(self.get_downloaded_objects())
+        # Also delete files left over from failed downloads of objects that we no longer need
+        # (the ones for objects that are still registered are kept so that the download can
+        # be resumed).
+        tables_in_meta.update(self.object_engine.run_api_call("list_partial_downloads"))
 
         to_delete = [
             t for t in tables_in_meta if t not in registered_objects or t in deleted_objects
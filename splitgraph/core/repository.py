@@ -30,6 +30,7 @@ from splitgraph.core.types import TableSchema
 from splitgraph.engine.postgres.engine import PostgresEngine
 from splitgraph.exceptions import (
     CheckoutError,
+    SplitGraphError,
     TableNotFoundError,
     IncompleteObjectUploadError,
     RepositoryNotFoundError,
@@ -40,6 +41,7 @@ from .common import (
     manage_audit,
     aggregate_changes,
     slow_diff,
+    fragment_diff,
     gather_sync_metadata,
     set_tags_batch,
 )
@@ -401,6 +403,7 @@ class Repository:
         extra_indexes: Optional[Dict[str, ExtraIndexInfo]] = None,
         in_fragment_order: Optional[Dict[str, List[str]]] = None,
         overwrite: bool = False,
+        workers: Optional[int] = None,
     ) -> Image:
         """
         Commits all pending changes to a given repository, creating a new image.
@@ -423,6 +426,8 @@ class Repository:
         :param in_fragment_order: Dictionary of {table: list of columns}. If specified, will
         sort the data inside each chunk by this/these key(s) for each table.
         :param overwrite: If an object already exists, will force recreate it.
+        :param workers: Number of parallel connections to use when splitting new tables
+            into chunks. The default value is governed by the SG_COMMIT_WORKERS configuration parameter.
 
         :return: The newly created Image object.
         """
@@ -447,6 +452,7 @@ class Repository:
             extra_indexes=extra_indexes,
             in_fragment_order=in_fragment_order,
             overwrite=overwrite,
+            workers=workers,
         )
 
         set_head(self, image_hash)
@@ -465,6 +471,7 @@ class Repository:
         extra_indexes: Optional[Dict[str, ExtraIndexInfo]] = None,
         in_fragment_order: Optional[Dict[str, List[str]]] = None,
         overwrite: bool = False,
+        workers: Optional[int] = None,
     ) -> None:
         """
         Reads the recorded pending changes to all tables in a given checked-out image,
@@ -479,6 +486,7 @@ class Repository:
         extra_indexes: Dict[str, ExtraIndexInfo] = extra_indexes or {}
         in_fragment_order: Dict[str, List[str]] = in_fragment_order or {}
         chunk_size = chunk_size or int(get_singleton(CONFIG, "SG_COMMIT_CHUNK_SIZE"))
+        workers = workers or int(get_singleton(CONFIG, "SG_COMMIT_WORKERS"))
 
         changed_tables = self.object_engine.get_changed_tables(schema)
         tracked_tables = self.object_engine.get_tracked_tables()
@@ -517,6 +525,7 @@ class Repository:
                     extra_indexes=extra_indexes.get(table),
                     in_fragment_order=in_fragment_order.get(table),
                     overwrite=overwrite,
+                    workers=workers,
                 )
                 continue
 
@@ -1009,7 +1018,8 @@ class Repository:
     ) -> Union[bool, Tuple[int, int, int], List[Tuple[bool, Tuple]], None]:
         """
         Compares the state of a table in different images by materializing both tables into a temporary space
-        and comparing them row-to-row.
+        and comparing them row-to-row. When comparing two images, only fragments that can be different
+        between the two versions of the table are materialized.
 
         :param table_name: Name of the table.
         :param image_1: First image hash / object. If None, uses the state of the current staging area.
@@ -1059,13 +1069,40 @@ class Repository:
 
         # If the table is the same in the two images, short circuit as well.
         if image_2 is not None:
-            if set(image_1.get_table(table_name).objects) == set(
-                image_2.get_table(table_name).objects
+            table_1 = image_1.get_table(table_name)
+            table_2 = image_2.get_table(table_name)
+            if set(table_1.objects) == set(table_2.objects):
+                return [] if not aggregate else (0, 0, 0)
+
+            # Tables with the same rows have the same content hash, even if they consist
+            # of different objects: this can be checked without reading any data.
+            if (
+                table_1.table_schema == table_2.table_schema
+                and table_1.content_hash() == table_2.content_hash()
             ):
                 return [] if not aggregate else (0, 0, 0)
 
+            # Only compare fragments that can be different between the two tables.
+            if table_1.table_schema == table_2.table_schema:
+                try:
+                    objects_1, objects_2 = self.objects.get_fragment_diff(
+                        table_1.objects, table_2.objects, table_1.table_schema
+                    )
+                except (SplitGraphError, TypeError):
+                    logging.exception("Couldn't compare fragments of %s", table_name)
+                else:
+                    logging.info(
+                        "Comparing %d/%d and %d/%d fragment(s)",
+                        len(objects_1),
+                        len(table_1.objects),
+                        len(objects_2),
+                        len(table_2.objects),
+                    )
+                    return fragment_diff(
+                        self, table_1.table_schema, objects_1, objects_2, aggregate
+                    )
+
         # Materialize both tables and compare them side-by-side.
-        # TODO we can aggregate chunks in a similar way that LQ does it.
         return slow_diff(self, table_name, _hash(image_1), _hash(image_2), aggregate)
 
 
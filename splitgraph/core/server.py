@@ -6,10 +6,10 @@ to avoid a redundant connection to the engine.
 """
 
 import os.path
-from typing import List, Tuple
+from typing import List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
-from splitgraph.config import CONFIG
+from splitgraph.config import CONFIG, get_singleton
 
 SG_ENGINE_OBJECT_PATH = str(CONFIG["SG_ENGINE_OBJECT_PATH"])
 
@@ -17,6 +17,9 @@ SG_ENGINE_OBJECT_PATH = str(CONFIG["SG_ENGINE_OBJECT_PATH"])
 # We have to download them separately.
 ObjectUrls = Tuple[str, str, str]
 
+# Files kept next to an object file while it's being downloaded in parts (see _download_file).
+_PARTIAL_DOWNLOAD_SUFFIXES = (".partial", ".parts")
+
 
 def verify(url: str):
     # If there's a file called /rootCA.pem in the engine, use it as the CA for
@@ -38,25 +41,150 @@ def _remove(path: str):
 
 def upload_object(object_id: str, urls: ObjectUrls):
     import requests
+    from concurrent.futures import ThreadPoolExecutor
 
     object_path = os.path.join(SG_ENGINE_OBJECT_PATH, object_id)
 
-    for suffix, url in zip(("", ".footer", ".schema"), urls):
+    def _upload(suffix_url):
+        suffix, url = suffix_url
         with open(object_path + suffix, "rb") as f:
             response = requests.put(url, data=f, verify=verify(url))
             response.raise_for_status()
 
+    # Presigned PUT URLs can't be used for multipart uploads, so the best we can do is
+    # upload the three files at the same time.
+    with ThreadPoolExecutor(max_workers=3) as tpe:
+        list(tpe.map(_upload, zip(("", ".footer", ".schema"), urls)))
 
-def download_object(object_id: str, urls: ObjectUrls):
+
+def _get_total_size(response) -> Optional[int]:
+    # Parse the Content-Range header of a ranged GET (bytes 0-1023/12345) to get the file size.
+    # The size can also be unknown (bytes 0-1023/*), in which case this returns None.
+    content_range = response.headers.get("Content-Range", "")
+    total_size = content_range.split("/")[-1]
+    return int(total_size) if total_size.isdigit() else None
+
+
+def _download_range(url: str, path: str, start: int, end: int):
+    import requests
+
+    with requests.get(
+        url, headers={"Range": "bytes=%d-%d" % (start, end)}, stream=True, verify=verify(url)
+    ) as response:
+        response.raise_for_status()
+        # Make sure we got the range we asked for: otherwise (e.g. if a proxy replied with
+        # the whole file or the connection got cut short), the part would be recorded as done
+        # with the wrong data or zero-filled holes in it.
+        if response.status_code != 206:
+            raise IOError(
+                "Expected a partial response for bytes %d-%d, got HTTP %d"
+                % (start, end, response.status_code)
+            )
+        expected = end - start + 1
+        written = 0
+        with open(path, "r+b") as f:
+            f.seek(start)
+            for block in response.iter_content(chunk_size=1024 * 1024):
+                # Don't overwrite the next part if the server sends more than we asked for.
+                block = block[: expected - written]
+                f.write(block)
+                written += len(block)
+    if written != expected:
+        raise IOError("Expected %d bytes for bytes %d-%d, got %d" % (expected, start, end, written))
+
+
+def _download_file(url: str, path: str):
+    """
+    Download a file using parallel ranged GETs. Parts that have been downloaded are recorded
+    in a progress file next to the partially downloaded file, so if the download fails, the next
+    attempt to download the same file only fetches the missing parts.
+    """
     import shutil
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
     import requests
 
+    part_size = int(get_singleton(CONFIG, "SG_OBJECT_TRANSFER_PART_SIZE")) * 1024 * 1024
+    partial_path = path + ".partial"
+    progress_path = path + ".parts"
+
+    # Fetch the first part: this also tells us the size of the whole file.
+    with requests.get(
+        url, headers={"Range": "bytes=0-%d" % (part_size - 1)}, stream=True, verify=verify(url)
+    ) as response:
+        if response.status_code == 416:
+            # Range requests for empty files fail.
+            open(path, "wb").close()
+            return
+        response.raise_for_status()
+        total_size = _get_total_size(response)
+        if response.status_code != 206 or (total_size is not None and total_size <= part_size):
+            # The server doesn't support ranged requests or the file is small
+            # enough: download it in one go.
+            with open(path, "wb") as f:
+                shutil.copyfileobj(response.raw, f)
+            return
+        if total_size is None:
+            # We don't know how large the file is, so we can't split it into parts:
+            # download it without a range instead.
+            with requests.get(url, stream=True, verify=verify(url)) as full_response:
+                full_response.raise_for_status()
+                with open(path, "wb") as f:
+                    shutil.copyfileobj(full_response.raw, f)
+            return
+        first_part = response.content
+        if len(first_part) != part_size:
+            raise IOError(
+                "Expected %d bytes for bytes 0-%d, got %d"
+                % (part_size, part_size - 1, len(first_part))
+            )
+
+    parts = [
+        (start, min(start + part_size, total_size) - 1) for start in range(0, total_size, part_size)
+    ]
+
+    # Load the parts we've already downloaded if the previous download of the same file failed.
+    done: Set[int] = set()
+    if os.path.exists(partial_path) and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            lines = f.read().splitlines()
+        if lines and lines[0] == str(total_size):
+            done = {int(line) for line in lines[1:] if line}
+    if not done:
+        with open(partial_path, "wb") as f:
+            f.truncate(total_size)
+        with open(progress_path, "w") as f:
+            f.write("%d\n" % total_size)
+
+    lock = threading.Lock()
+
+    def _mark_done(start: int):
+        with lock, open(progress_path, "a") as f:
+            f.write("%d\n" % start)
+
+    if 0 not in done:
+        with open(partial_path, "r+b") as f:
+            f.write(first_part)
+        _mark_done(0)
+        done.add(0)
+
+    def _download_part(part: Tuple[int, int]):
+        _download_range(url, partial_path, part[0], part[1])
+        _mark_done(part[0])
+
+    with ThreadPoolExecutor(
+        max_workers=int(get_singleton(CONFIG, "SG_OBJECT_TRANSFER_THREADS"))
+    ) as tpe:
+        list(tpe.map(_download_part, [p for p in parts if p[0] not in done]))
+
+    os.rename(partial_path, path)
+    _remove(progress_path)
+
+
+def download_object(object_id: str, urls: ObjectUrls):
     object_path = os.path.join(SG_ENGINE_OBJECT_PATH, object_id)
     for suffix, url in zip(("", ".footer", ".schema"), urls):
-        with requests.get(url, stream=True, verify=verify(url)) as response:
-            response.raise_for_status()
-            with open(object_path + suffix, "wb") as f:
-                shutil.copyfileobj(response.raw, f)
+        _download_file(url, object_path + suffix)
 
 
 def set_object_schema(object_id: str, schema: str):
@@ -71,9 +199,11 @@ def get_object_schema(object_id: str) -> str:
 
 def delete_object_files(object_id: str):
     object_path = os.path.join(SG_ENGINE_OBJECT_PATH, object_id)
-    _remove(object_path)
-    _remove(object_path + ".footer")
-    _remove(object_path + ".schema")
+    for suffix in ("", ".footer", ".schema"):
+        _remove(object_path + suffix)
+        # Also remove the leftovers of a failed download of the object.
+        for download_suffix in _PARTIAL_DOWNLOAD_SUFFIXES:
+            _remove(object_path + suffix + download_suffix)
 
 
 def get_object_size(object_id: str) -> int:
@@ -94,11 +224,25 @@ def list_objects() -> List[str]:
     # Make sure to only return objects that have been fully downloaded.
     objects = defaultdict(list)
     for f in files:
+        if f.endswith(_PARTIAL_DOWNLOAD_SUFFIXES):
+            continue
         objects[f.replace(".schema", "").replace(".footer", "")].append(f)
 
     return [f for f, fs in objects.items() if len(fs) == 3]
 
 
+def list_partial_downloads() -> List[str]:
+    # Objects that have files left over from a failed download.
+    files = os.listdir(SG_ENGINE_OBJECT_PATH)
+    return sorted(
+        {
+            f.rsplit(".", 1)[0].replace(".schema", "").replace(".footer", "")
+            for f in files
+            if f.endswith(_PARTIAL_DOWNLOAD_SUFFIXES)
+        }
+    )
+
+
 def object_exists(object_id: str) -> bool:
     # Check if the physical object file exists in storage.
     # Make sure to check for all 3 files to guard against partially failed writes.
@@ -1,7 +1,9 @@
 """Table metadata-related classes."""
+import copy
 import itertools
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from contextlib import contextmanager
 from math import ceil
 from typing import (
@@ -20,11 +22,19 @@ from typing import (
 from psycopg2.sql import SQL, Identifier, Composable
 from tqdm import tqdm
 
-from splitgraph.config import SPLITGRAPH_META_SCHEMA, SPLITGRAPH_API_SCHEMA, SG_CMD_ASCII
-from splitgraph.core.common import Tracer
+from splitgraph.config import (
+    SPLITGRAPH_META_SCHEMA,
+    SPLITGRAPH_API_SCHEMA,
+    SG_CMD_ASCII,
+    CONFIG,
+    get_singleton,
+)
+from splitgraph.core.access_stats import get_access_stats_recorder
+from splitgraph.core.common import Tracer, LRUCache, CallbackList
 from splitgraph.core.fragment_manager import (
     get_temporary_table_id,
     get_chunk_groups,
+    Digest,
     ExtraIndexInfo,
 )
 from splitgraph.core.indexing.range import quals_to_sql
@@ -32,10 +42,12 @@ from splitgraph.core.output import pluralise, truncate_list
 from splitgraph.core.sql import select
 from splitgraph.core.types import TableSchema, Quals
 from splitgraph.engine import ResultShape
-from splitgraph.exceptions import ObjectIndexingError
+from splitgraph.engine.postgres.engine import PG_INDEXABLE_TYPES, chunk
+from splitgraph.exceptions import ObjectIndexingError, SplitGraphError
 
 if TYPE_CHECKING:
     from splitgraph.core.image import Image
+    from splitgraph.core.object_manager import ObjectManager, ObjectReleaseCallback
     from splitgraph.core.repository import Repository
     from splitgraph.engine.postgres.engine import PostgresEngine
 
@@ -45,6 +57,75 @@ if TYPE_CHECKING:
 _PROGRESS_EVERY = 5 * 1024 * 1024
 
 
+def _scan_parallel(
+    engine: "PostgresEngine", queries: Iterator[bytes], workers: int, ordered: bool = True
+) -> Iterator[List[Tuple]]:
+    """
+    Run queries on multiple engine connections at the same time, keeping at most `workers`
+    of them in flight.
+
+    Unlike `run_sql_iter`, each query's results are fetched in full by its worker (since the
+    connection it runs on belongs to the worker's thread), so up to `workers` fragments' worth
+    of rows can be held in memory at a time.
+
+    :param engine: Engine
+    :param queries: Queries to run
+    :param workers: Number of queries to run at the same time
+    :param ordered: If True, yield results in the order of queries, otherwise yield them
+        as they become available.
+    :return: Iterator of query results
+    """
+    pending: List[Future] = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as tpe:
+            try:
+                while True:
+                    for query in itertools.islice(queries, workers - len(pending)):
+                        pending.append(tpe.submit(engine.run_sql, query))
+                    if not pending:
+                        return
+                    if ordered:
+                        done = [pending.pop(0)]
+                    else:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        done = [f for f in pending if f in finished]
+                        pending = [f for f in pending if f not in finished]
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+    finally:
+        engine.close_others()
+
+
+def _group_fragments(
+    object_manager: "ObjectManager", table_schema: TableSchema, objects: List[str]
+) -> Tuple[List[List[str]], List[str]]:
+    """
+    Split fragments into groups that don't overlap each other (using their min-max PKs)
+    and so can be applied independently of each other.
+
+    :return: Tuple of (list of groups with more than one fragment, list of fragments that
+        don't overlap any other fragments). Groups preserve the original order of fragments.
+    """
+    table_pk = [(t[1], t[2]) for t in table_schema if t[3]]
+    if not table_pk:
+        table_pk = [(t[1], t[2]) for t in table_schema]
+    object_pks = object_manager.get_min_max_pks(objects, table_pk)
+    object_groups = get_chunk_groups(
+        [(object_id, min_max[0], min_max[1]) for object_id, min_max in zip(objects, object_pks)]
+    )
+    singletons: List[str] = []
+    non_singletons: List[List[str]] = []
+    for group in object_groups:
+        if len(group) == 1:
+            singletons.append(group[0][0])
+        else:
+            non_singletons.append([object_id for object_id, _, _ in group])
+    return non_singletons, singletons
+
+
 def _generate_select_query(
     engine: "PostgresEngine",
     table: bytes,
@@ -162,16 +243,12 @@ class QueryPlan:
 
         # Special fast case: single-chunk groups can all be batched together
         # and queried directly without having to copy them to a staging table.
-        # We also grab all fragments from multiple-fragment groups and batch them together
-        # for future application.
-        #
-        # Technically, we could do multiple batches of application for these groups
-        # (apply first batch to the staging table, extract the result, clean the table,
-        # apply next batch etc): in the middle of it we could also talk back to the object
-        # manager and release the objects that we don't need so that they can be garbage
-        # collected. The tradeoff is that we perform more calls to apply_fragments (hence
-        # more roundtrips).
-        self.non_singletons, self.singletons = self._extract_singleton_fragments()
+        # Multiple-fragment groups are merged one group at a time (merge the group, extract
+        # the result, move on to the next group): in the middle of it we also talk back to the
+        # object manager and release the objects that we don't need so that they can be garbage
+        # collected. The tradeoff is that we perform more roundtrips to the engine.
+        self.non_singleton_groups, self.singletons = self._extract_singleton_fragments()
+        self.non_singletons = [o for group in self.non_singleton_groups for o in group]
 
         logging.info(
             "Fragment grouping: %d singletons, %d non-singletons",
@@ -192,33 +269,52 @@ class QueryPlan:
             self.singleton_queries = []
         self.tracer.log("generate_singleton_queries")
 
-    def _extract_singleton_fragments(self) -> Tuple[List[str], List[str]]:
-        # Get fragment boundaries (min-max PKs of every fragment).
-        table_pk = [(t[1], t[2]) for t in self.table.table_schema if t[3]]
-        if not table_pk:
-            table_pk = [(t[1], t[2]) for t in self.table.table_schema]
-        object_pks = self.object_manager.get_min_max_pks(self.filtered_objects, table_pk)
-        # Group fragments into non-overlapping groups: those can be applied independently of each other.
-        object_groups = get_chunk_groups(
-            [
-                (object_id, min_max[0], min_max[1])
-                for object_id, min_max in zip(self.filtered_objects, object_pks)
-            ]
+    def _extract_singleton_fragments(self) -> Tuple[List[List[str]], List[str]]:
+        return _group_fragments(self.object_manager, self.table.table_schema, self.filtered_objects)
+
+    def _get_merge_quals(self) -> Tuple[Optional[Composable], Optional[Tuple]]:
+        # Qualifiers can only be used to filter fragments before merging them if they
+        # only reference the columns that rows are matched on: otherwise, we could miss
+        # a later version of a row that doesn't match the qualifiers anymore.
+        key_columns = [c.name for c in self.table.table_schema if c.is_pk] or [
+            c.name for c in self.table.table_schema if c.pg_type in PG_INDEXABLE_TYPES
+        ]
+        if self.quals and all(q[0] in key_columns for clause in self.quals for q in clause):
+            return self.sql_quals, self.sql_qual_vals
+        return None, None
+
+    def get_merge_query(self, group: List[str]) -> bytes:
+        """
+        Generate a query that merges a group of overlapping fragments on read, without
+        applying them to a staging table.
+
+        :param group: List of fragments in the group, in order of application.
+        :return: Subquery (bytes) that can be used in place of a table name.
+        """
+        quals, qual_vals = self._get_merge_quals()
+        return self.object_manager.object_engine.get_fragment_merge_query(
+            [(SPLITGRAPH_META_SCHEMA, o) for o in group],
+            self.table.table_schema,
+            extra_quals=quals,
+            extra_qual_args=qual_vals,
         )
-        singletons: List[str] = []
-        non_singletons: List[str] = []
-        for group in object_groups:
-            if len(group) == 1:
-                singletons.append(group[0][0])
-            else:
-                non_singletons.extend(object_id for object_id, _, _ in group)
-        return non_singletons, singletons
 
 
-QueryPlanCacheKey = Tuple[Optional[Tuple[Tuple[Tuple[str, str, Any]]]], Tuple[str]]
+QueryPlanCacheKey = Tuple[
+    Optional[str],
+    Optional[str],
+    str,
+    str,
+    str,
+    str,
+    Optional[Tuple[Tuple[Tuple[str, str, Any]]]],
+    Tuple[str],
+]
 
 
-def _get_plan_cache_key(quals: Optional[Quals], columns: Sequence[str]) -> QueryPlanCacheKey:
+def _get_plan_cache_key(
+    table: "Table", quals: Optional[Quals], columns: Sequence[str]
+) -> QueryPlanCacheKey:
     quals = (
         cast(
             Tuple[Tuple[Tuple[str, str, Any]]],
@@ -228,7 +324,23 @@ def _get_plan_cache_key(quals: Optional[Quals], columns: Sequence[str]) -> Query
         else None
     )
     columns = cast(Tuple[str], tuple(columns))
-    return quals, columns
+    repository = table.repository
+    return (
+        repository.engine.name,
+        repository.object_engine.name,
+        repository.namespace,
+        repository.repository,
+        table.image.image_hash,
+        table.table_name,
+        quals,
+        columns,
+    )
+
+
+# In-process cache of query plans shared between all Table instances (e.g. ones
+# that the LQ FDW creates for every foreign scan). Plans only depend on the table's objects
+# and their metadata, which are immutable for a given image.
+QUERY_PLAN_CACHE = LRUCache(maxsize=int(get_singleton(CONFIG, "SG_QUERY_PLAN_CACHE_SIZE")))
 
 
 def merge_index_data(current_index: Dict[str, Any], new_index: Dict[str, Any]):
@@ -262,8 +374,6 @@ class Table:
         # List of fragments this table is composed of
         self.objects = objects
 
-        self._query_plans: Dict[Tuple[Optional[Quals], Tuple[str]], QueryPlan] = {}
-
     def __repr__(self) -> str:
         return "Table %s in %s" % (self.table_name, str(self.image))
 
@@ -279,10 +389,15 @@ class Table:
         :param use_cache: If True, will fetch the plan from the cache for the same qualifiers and columns.
         :return: QueryPlan
         """
-        key = _get_plan_cache_key(quals, columns)
-
-        if use_cache and key in self._query_plans:
-            plan = self._query_plans[key]
+        key = _get_plan_cache_key(self, quals, columns)
+
+        cached = QUERY_PLAN_CACHE.get_many([key]) if use_cache else {}
+        if cached:
+            # The cached plan might have been made by a different instance of this table:
+            # copy it and point it to this one.
+            plan = cast(QueryPlan, copy.copy(cached[key]))
+            plan.table = self
+            plan.object_manager = self.repository.objects
             # Reset the tracer in the plan: if this instance
             # persisted, the resolve/filter times in it will be
             # way in the past.
@@ -294,7 +409,7 @@ class Table:
             return plan
 
         plan = QueryPlan(self, quals, columns)
-        self._query_plans[key] = plan
+        QUERY_PLAN_CACHE.put(key, plan)
         return plan
 
     def materialize(
@@ -321,6 +436,24 @@ class Table:
             with object_manager.ensure_objects(
                 table=self, objects=self.objects
             ) as required_objects:
+                required_objects = cast(List[str], required_objects)
+                progress_every: Optional[int] = None
+                if required_objects:
+                    table_size = self.get_size()
+                    if table_size > _PROGRESS_EVERY:
+                        progress_every = int(
+                            ceil(len(required_objects) * _PROGRESS_EVERY / float(table_size))
+                        )
+
+                if (
+                    required_objects
+                    and get_singleton(CONFIG, "SG_MATERIALIZE_BULK_LOAD") == "true"
+                    and self._materialize_bulk(
+                        required_objects, destination_schema, destination, progress_every
+                    )
+                ):
+                    return
+
                 engine.create_table(
                     schema=destination_schema,
                     table=destination,
@@ -330,19 +463,8 @@ class Table:
                 )
                 if required_objects:
                     logging.debug("Applying %s...", pluralise("fragment", len(required_objects)))
-
-                    table_size = self.get_size()
-
-                    progress_every: Optional[int]
-                    if table_size > _PROGRESS_EVERY:
-                        progress_every = int(
-                            ceil(len(required_objects) * _PROGRESS_EVERY / float(table_size))
-                        )
-                    else:
-                        progress_every = None
-
                     engine.apply_fragments(
-                        [(SPLITGRAPH_META_SCHEMA, d) for d in cast(List[str], required_objects)],
+                        [(SPLITGRAPH_META_SCHEMA, d) for d in required_objects],
                         destination_schema,
                         destination,
                         progress_every=progress_every,
@@ -354,6 +476,88 @@ class Table:
 
             engine.run_sql(query, args)
 
+    def _materialize_bulk(
+        self,
+        objects: List[str],
+        destination_schema: str,
+        destination: str,
+        progress_every: Optional[int] = None,
+    ) -> bool:
+        """
+        Materialize the table by loading fragments that don't overlap any other fragments
+        directly into a table without a primary key and only applying overlapping fragments
+        to one another (in a temporary staging table, one group at a time). The primary key
+        is added once all rows have been loaded.
+
+        :return: False if the fragments' boundaries couldn't be determined (in which case
+            the table has to be materialized by applying fragments one by one).
+        """
+        engine = self.repository.object_engine
+        try:
+            groups, singletons = _group_fragments(
+                self.repository.objects, self.table_schema, objects
+            )
+        except (SplitGraphError, TypeError):
+            logging.exception("Couldn't group fragments of %s, applying them one by one", self)
+            return False
+
+        logging.debug(
+            "Loading %s, merging %s",
+            pluralise("fragment", len(singletons)),
+            pluralise("fragment group", len(groups)),
+        )
+        engine.create_table(
+            schema=destination_schema,
+            table=destination,
+            schema_spec=[c._replace(is_pk=False) for c in self.table_schema],
+            include_comments=True,
+            unlogged=True,
+        )
+        engine.load_fragments(
+            [(SPLITGRAPH_META_SCHEMA, o) for o in singletons],
+            destination_schema,
+            destination,
+            schema_spec=self.table_schema,
+            progress_every=progress_every,
+        )
+
+        if groups:
+            staging_table = "sg_tmp_" + destination
+            engine.create_table(
+                schema=None, table=staging_table, schema_spec=self.table_schema, temporary=True
+            )
+            columns = SQL(",").join(Identifier(c.name) for c in self.table_schema)
+            for group in groups:
+                engine.apply_fragments(
+                    [(SPLITGRAPH_META_SCHEMA, o) for o in group],
+                    "pg_temp",
+                    staging_table,
+                    schema_spec=self.table_schema,
+                )
+                engine.run_sql(
+                    SQL("INSERT INTO {}.{} (").format(
+                        Identifier(destination_schema), Identifier(destination)
+                    )
+                    + columns
+                    + SQL(") SELECT ")
+                    + columns
+                    + SQL(" FROM pg_temp.{0}; TRUNCATE pg_temp.{0}").format(
+                        Identifier(staging_table)
+                    )
+                )
+            engine.run_sql(SQL("DROP TABLE pg_temp.{}").format(Identifier(staging_table)))
+
+        pk_cols = [c.name for c in self.table_schema if c.is_pk]
+        if pk_cols:
+            engine.run_sql(
+                SQL("ALTER TABLE {}.{} ADD PRIMARY KEY (").format(
+                    Identifier(destination_schema), Identifier(destination)
+                )
+                + SQL(",").join(Identifier(c) for c in pk_cols)
+                + SQL(")")
+            )
+        return True
+
     def query_indirect(
         self, columns: List[str], quals: Optional[Quals]
     ) -> Tuple[Iterator[bytes], Callable, QueryPlan]:
@@ -364,8 +568,11 @@ class Table:
         done consuming the results.
 
         In particular, the query generator will prefer returning direct queries to
-        Splitgraph objects and only when those are exhausted will it start materializing
-        delta-compressed fragments.
+        Splitgraph objects and only when those are exhausted will it start merging
+        delta-compressed fragments (either on read or, if `SG_LQ_MERGE_ON_READ` is
+        disabled or the table has no primary key, by materializing them into a staging table). Groups of overlapping
+        fragments are processed one at a time and their objects are released as soon as
+        they're not needed, so that they can be evicted from the cache.
 
         This is an advanced method: you probably want to call table.query().
 
@@ -382,112 +589,182 @@ class Table:
             len(required_objects),
             truncate_list(required_objects),
         )
+
+        stats_recorder = get_access_stats_recorder(self.repository.objects.object_engine)
+        if stats_recorder:
+            stats_recorder.record_table_query(
+                self,
+                quals,
+                fragments_total=len(plan.required_objects),
+                fragments_scanned=len(required_objects),
+                rows_scanned=plan.estimated_rows,
+            )
         if not required_objects:
             return cast(Iterator[bytes], []), cast(Callable, _empty_callback), plan
 
         object_manager = self.repository.objects
-        if not plan.non_singletons:
+        engine = self.repository.object_engine
+        # Merging on read picks the latest version of every row by its PK. Tables without a PK
+        # can have duplicate rows or rows that only differ in non-indexable columns, so they
+        # have to be materialized in a staging table with apply_fragments instead.
+        merge_on_read = get_singleton(CONFIG, "SG_LQ_MERGE_ON_READ") == "true" and any(
+            c.is_pk for c in self.table_schema
+        )
+        batch_size = int(get_singleton(CONFIG, "SG_LQ_DOWNLOAD_BATCH_SIZE"))
+        release_callback = CallbackList()
+        staging_table: Optional[str] = None
+
+        def _claim(objects: List[str]) -> "ObjectReleaseCallback":
             with object_manager.ensure_objects(
-                self, objects=required_objects, defer_release=True, tracer=plan.tracer
+                self, objects=objects, defer_release=True, tracer=plan.tracer
             ) as eo_result:
-                _, release_callback = cast(Tuple, eo_result)
-                return iter(plan.singleton_queries), cast(Callable, release_callback), plan
-
-        def _generate_nonsingleton_query():
-            # If we have fragments that need applying to a staging area, we don't want to
-            # do it immediately: the caller might be satisfied with the data they got from
-            # the queries to singleton fragments. So here we have a callback that, when called,
-            # actually materializes the chunks into a temporary table and then changes
-            # the table's release callback to also delete that temporary table.
+                _, object_release_callback = cast(
+                    Tuple[List[str], "ObjectReleaseCallback"], eo_result
+                )
+            # Make sure the objects get released if the caller doesn't consume all queries.
+            release_callback.append(object_release_callback)
+            return object_release_callback
+
+        def _f(from_fdw=False):
+            # This is very horrible but the way we share responsibilities between ourselves
+            # and Multicorn leaves us no other choice. In LQ, this is supposed to be called
+            # during EndForeignScan (at which point we are done with this staging table).
+            # However, EndForeignScan doesn't actually release locks on tables that Multicorn
+            # was reading (that are acquired outside of our control if the foreign scan happened in a
+            # transaction). In that case we can't delete this table until the transaction actually finishes
+            # -- which can't happen until we've deleted this table.
+
+            # Other options are: generating the materialization query and running it on
+            # Multicorn side (issues with Portals not being able to perform DDL and us having
+            # to rework our interface), adding a DROP table to the end of the query (then
+            # it doesn't return results, Portals still can't do DDL and the query is no longer
+            # idempotent).
+
+            # Instead, we pretend that we've successfully cleaned up but actually spawn
+            # a thread whose single job will be running DROP table and waiting until it actually
+            # returns.
+
+            if from_fdw:
+                thread = threading.Thread(
+                    target=_delete_temporary_table,
+                    args=(engine, SPLITGRAPH_META_SCHEMA, staging_table),
+                )
+                thread.start()
+            else:
+                engine.delete_table(SPLITGRAPH_META_SCHEMA, staging_table)
+
+        def _generate_singleton_queries():
+            # Claim (and download) objects in plan order a batch at a time, so that the caller
+            # can start querying the first fragments before the rest have been downloaded
+            # (and doesn't download them at all if it's satisfied with the first results).
+            for batch in chunk(list(zip(plan.singletons, plan.singleton_queries)), batch_size):
+                _claim([object_id for object_id, _ in batch])
+                yield from (query for _, query in batch)
+
+        def _generate_nonsingleton_queries(claimed: Optional["ObjectReleaseCallback"]):
+            # If we have fragments that need merging, we don't want to do it immediately:
+            # the caller might be satisfied with the data they got from the queries to
+            # singleton fragments. So here we have a generator that, when called, goes through
+            # groups of overlapping fragments one by one and releases the objects in each
+            # group as soon as it's done with them, so that the cache can evict them.
 
             # There's a slight issue: we can't use temporary tables if we're returning
             # pointers to tables since the caller might be in a different session.
-            staging_table = self._create_staging_table()
-            engine = self.repository.object_engine
-
-            def _f(from_fdw=False):
-                # This is very horrible but the way we share responsibilities between ourselves
-                # and Multicorn leaves us no other choice. In LQ, this is supposed to be called
-                # during EndForeignScan (at which point we are done with this staging table).
-                # However, EndForeignScan doesn't actually release locks on tables that Multicorn
-                # was reading (that are acquired outside of our control if the foreign scan happened in a
-                # transaction). In that case we can't delete this table until the transaction actually finishes
-                # -- which can't happen until we've deleted this table.
-
-                # Other options are: generating the materialization query and running it on
-                # Multicorn side (issues with Portals not being able to perform DDL and us having
-                # to rework our interface), adding a DROP table to the end of the query (then
-                # it doesn't return results, Portals still can't do DDL and the query is no longer
-                # idempotent).
-
-                # Instead, we pretend that we've successfully cleaned up but actually spawn
-                # a thread whose single job will be running DROP table and waiting until it actually
-                # returns.
-
-                if from_fdw:
-                    thread = threading.Thread(
-                        target=_delete_temporary_table,
-                        args=(engine, SPLITGRAPH_META_SCHEMA, staging_table),
-                    )
-                    thread.start()
+            nonlocal staging_table
+
+            for group in plan.non_singleton_groups:
+                group_release_callback = claimed or _claim(group)
+                if merge_on_read:
+                    # Resolve the group with a single SELECT instead of materializing it.
+                    # The caller asks for the next query only after consuming this one.
+                    yield plan.get_merge_query(group)
+                    group_release_callback.release_objects(group)
+                    continue
+
+                # Apply the fragments in the group (just the parts that match the qualifiers)
+                # to the staging area, reusing it between groups.
+                if staging_table is None:
+                    staging_table = self._create_staging_table()
+                    # Change the release callback to also delete the staging table.
+                    release_callback.append(_f)
                 else:
-                    engine.delete_table(SPLITGRAPH_META_SCHEMA, staging_table)
-
-            nonlocal release_callback
-            release_callback.append(_f)
-
-            # Apply the fragments (just the parts that match the qualifiers) to the staging area
-            if quals:
-                engine.apply_fragments(
-                    [(SPLITGRAPH_META_SCHEMA, o) for o in plan.non_singletons],
-                    SPLITGRAPH_META_SCHEMA,
-                    staging_table,
-                    extra_quals=plan.sql_quals,
-                    extra_qual_args=plan.sql_qual_vals,
-                    schema_spec=self.table_schema,
-                )
-            else:
+                    # Use DELETE instead of TRUNCATE: Multicorn can still be holding
+                    # a read lock on the table from scanning the previous group.
+                    engine.run_sql(
+                        SQL("DELETE FROM {}.{}").format(
+                            Identifier(SPLITGRAPH_META_SCHEMA), Identifier(staging_table)
+                        )
+                    )
                 engine.apply_fragments(
-                    [(SPLITGRAPH_META_SCHEMA, o) for o in plan.non_singletons],
+                    [(SPLITGRAPH_META_SCHEMA, o) for o in group],
                     SPLITGRAPH_META_SCHEMA,
                     staging_table,
+                    extra_quals=plan.sql_quals if quals else None,
+                    extra_qual_args=plan.sql_qual_vals if quals else None,
                     schema_spec=self.table_schema,
                 )
-            engine.commit()
-            table_name = _generate_table_names(engine, SPLITGRAPH_META_SCHEMA, [staging_table])[0]
-            yield table_name
-
-        with object_manager.ensure_objects(
-            self, objects=required_objects, defer_release=True, tracer=plan.tracer
-        ) as eo_result:
-            _, release_callback = cast(Tuple, eo_result)
-            return (
-                itertools.chain(plan.singleton_queries, _generate_nonsingleton_query()),
-                cast(Callable, release_callback),
-                plan,
+                engine.commit()
+
+                # The group is now in the staging table, so its objects aren't needed anymore.
+                group_release_callback.release_objects(group)
+                yield _generate_table_names(engine, SPLITGRAPH_META_SCHEMA, [staging_table])[0]
+
+        if batch_size:
+            queries = itertools.chain(
+                _generate_singleton_queries(), _generate_nonsingleton_queries(None)
+            )
+        else:
+            queries = itertools.chain(
+                plan.singleton_queries, _generate_nonsingleton_queries(_claim(required_objects))
             )
+        return queries, cast(Callable, release_callback), plan
 
     @contextmanager
-    def query_lazy(self, columns: List[str], quals: Quals) -> Iterator[Iterator[Dict[str, Any]]]:
+    def query_lazy(
+        self, columns: List[str], quals: Quals, workers: Optional[int] = None, ordered: bool = True,
+    ) -> Iterator[Iterator[Dict[str, Any]]]:
         """
         Run a read-only query against this table without materializing it.
 
         :param columns: List of columns from this table to fetch
         :param quals: List of qualifiers in conjunctive normal form. See the documentation for
             FragmentManager.filter_fragments for the actual format.
+        :param workers: Number of engine connections to use to query fragments that don't
+            overlap with other fragments in parallel (default `SG_QUERY_WORKERS`). Parallel
+            scans buffer the results of each fragment instead of streaming them.
+        :param ordered: If querying in parallel, return the results in the order of fragments
+            instead of in the order in which the fragment queries finish.
         :return: Generator of dictionaries of results.
         """
 
         table_gen, release_callback, plan = self.query_indirect(columns, quals)
         engine = self.repository.object_engine
+        workers = min(
+            workers or int(get_singleton(CONFIG, "SG_QUERY_WORKERS")),
+            int(get_singleton(CONFIG, "SG_ENGINE_POOL")) - 1,
+        )
+
+        def _select_query(table: bytes) -> bytes:
+            return _generate_select_query(
+                engine, table, plan.columns, plan.sql_quals, plan.sql_qual_vals
+            )
 
         def _generate_results():
+            if workers > 1 and len(plan.singleton_queries) > 1:
+                # Singleton fragments are independent from each other, so we can scan them
+                # at the same time. The rest of the tables (staging areas with the other fragments
+                # applied) is queried sequentially.
+                # Get all singleton queries before starting: producing them can download
+                # objects, which isn't safe to do while other connections are running queries.
+                singletons = list(itertools.islice(table_gen, len(plan.singleton_queries)))
+                for result in _scan_parallel(
+                    engine, (_select_query(t) for t in singletons), workers, ordered
+                ):
+                    for row in result:
+                        yield {c: v for c, v in zip(columns, row)}
+
             for table in table_gen:
-                result = engine.run_sql(
-                    _generate_select_query(
-                        engine, table, plan.columns, plan.sql_quals, plan.sql_qual_vals
-                    )
-                )
+                result = engine.run_sql_iter(_select_query(table))
                 for row in result:
                     yield {c: v for c, v in zip(columns, row)}
 
@@ -496,7 +773,7 @@ class Table:
         finally:
             release_callback()
 
-    def query(self, columns: List[str], quals: Quals):
+    def query(self, columns: List[str], quals: Quals, workers: Optional[int] = None):
         """
         Run a read-only query against this table without materializing it.
 
@@ -506,9 +783,10 @@ class Table:
         :param columns: List of columns from this table to fetch
         :param quals: List of qualifiers in conjunctive normal form. See the documentation for
             FragmentManager.filter_fragments for the actual format.
+        :param workers: Number of engine connections to use to query fragments in parallel.
         :return: List of dictionaries of results
         """
-        with self.query_lazy(columns, quals) as result:
+        with self.query_lazy(columns, quals, workers=workers) as result:
             return list(result)
 
     def get_size(self) -> int:
@@ -561,6 +839,26 @@ class Table:
             or 0,
         )
 
+    def content_hash(self) -> str:
+        """
+        Get the homomorphic hash of this table's contents without reading any data.
+
+        This is the sum of the insertion hashes of all of the table's objects minus the sum of
+        their deletion hashes, so tables with the same rows have the same content hash even if
+        they consist of different objects. It's the same as the hash that
+        `FragmentManager.calculate_content_hash` calculates from the materialized table.
+
+        :return: A 64-character (256-bit) hexadecimal string.
+        """
+        object_meta = self.repository.objects.get_object_meta(self.objects)
+        content_hash = Digest.empty()
+        for object_id in self.objects:
+            meta = object_meta[object_id]
+            content_hash += Digest.from_hex(meta.insertion_hash) - Digest.from_hex(
+                meta.deletion_hash
+            )
+        return content_hash.hex()
+
     def reindex(self, extra_indexes: ExtraIndexInfo, raise_on_patch_objects=True) -> List[str]:
         """
         Run extra indexes on all objects in this table and update their metadata.
@@ -595,14 +893,19 @@ class Table:
         # Download the objects to reindex them
         with object_manager.ensure_objects(self, objects=list(valid_objects)):
             for object_id in tqdm(valid_objects, unit="objs", ascii=SG_CMD_ASCII):
-                current_index = valid_objects[object_id].object_index
+                # The object metadata is shared with the in-memory object cache, so merge the
+                # new index into a copy of the old one: otherwise, if registering the objects
+                # fails, we'd be left with a cached index that the engine doesn't have.
+                current_index = copy.deepcopy(valid_objects[object_id].object_index)
 
                 index_struct = object_manager.generate_object_index(
                     object_id, self.table_schema, changeset=None, extra_indexes=extra_indexes
                 )
 
-                # Update the index in-place and overwrite it
                 merge_index_data(current_index, index_struct)
+                valid_objects[object_id] = valid_objects[object_id]._replace(
+                    object_index=current_index
+                )
 
         object_manager.register_objects(list(valid_objects.values()))
         return list(valid_objects)
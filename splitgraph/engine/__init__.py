@@ -108,6 +108,16 @@ class SQLEngine(ABC):
         tuples when possible."""
         raise NotImplementedError()
 
+    def run_sql_iter(self, statement, arguments=None, batch_size=None, named=False):
+        """Run a query and return an iterator over its results. Engines that support it
+        stream the results instead of loading all of them into memory.
+
+        :param statement: Query to run
+        :param arguments: Query arguments
+        :param batch_size: Number of rows to fetch from the engine at a time
+        :param named: If True, return named tuples."""
+        return iter(self.run_sql(statement, arguments, named=named) or [])
+
     def commit(self):
         """Commit the engine's backing connection"""
 
@@ -478,6 +488,19 @@ class ChangeEngine(SQLEngine, ABC):
         """
         raise NotImplementedError()
 
+    def get_conflated_changes(self, schema, table, batch_size):
+        """
+        Conflate pending changes for a given tracked table on the engine and return them in batches,
+        ordered by the change key, without loading the whole change log into memory.
+
+        :param schema: Schema the table belongs to
+        :param table: Table to return changes for
+        :param batch_size: Maximum number of changed rows in every batch
+        :return: Iterator of changesets (dictionaries of
+            `{pk: (upserted, old row (if updated or deleted), new row (if upserted))}`)
+        """
+        raise NotImplementedError()
+
     def get_changed_tables(self, schema):
         """
         List tracked tables that have pending changes
@@ -10,6 +10,7 @@ from contextlib import contextmanager
 from io import BytesIO
 from io import TextIOWrapper
 from pathlib import PurePosixPath
+from random import getrandbits
 from threading import get_ident
 from typing import (
     Any,
@@ -31,13 +32,19 @@ from packaging.version import Version
 from psycopg2 import DatabaseError
 from psycopg2.errors import InvalidSchemaName, UndefinedTable
 from psycopg2.extras import execute_batch, Json
-from psycopg2.pool import ThreadedConnectionPool, AbstractConnectionPool
-from psycopg2.sql import Composed, SQL
+from psycopg2.pool import ThreadedConnectionPool, AbstractConnectionPool, PoolError
+from psycopg2.sql import Composed, SQL, Literal
 from psycopg2.sql import Identifier
 from tqdm import tqdm
 
 from splitgraph.__version__ import __version__
-from splitgraph.config import SPLITGRAPH_META_SCHEMA, CONFIG, SPLITGRAPH_API_SCHEMA, SG_CMD_ASCII
+from splitgraph.config import (
+    SPLITGRAPH_META_SCHEMA,
+    CONFIG,
+    SPLITGRAPH_API_SCHEMA,
+    SG_CMD_ASCII,
+    get_singleton,
+)
 from splitgraph.core import server
 from splitgraph.core.common import ensure_metadata_schema, META_TABLES, get_data_safe
 from splitgraph.core.sql import select
@@ -166,7 +173,7 @@ def _paginate_by_size(cur, query, argslist, max_size=API_MAX_QUERY_LENGTH):
 T = TypeVar("T")
 
 
-def chunk(sequence: Sequence[T], chunk_size: int = API_MAX_VARIADIC_ARGS) -> Iterator[List[T]]:
+def chunk(sequence: Iterable[T], chunk_size: int = API_MAX_VARIADIC_ARGS) -> Iterator[List[T]]:
     curr_chunk: List[T] = []
     i = 0
     for curr in sequence:
@@ -191,6 +198,112 @@ def get_conn_str(conn_params: Dict[str, str]) -> str:
     return f"postgresql://{username}:{password}@{server}:{port}/{dbname}"
 
 
+# Ping connections that have been idle for longer than this (in seconds) before reusing them.
+_HEALTH_CHECK_AFTER = 30
+
+
+class KeepAliveConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe connection pool that keeps connections open when they're put back into it
+    instead of closing them, so that the next transaction doesn't have to reconnect
+    to the engine (which also preserves the session state, like imported plpython modules).
+
+    Connections that have been idle for longer than `idle_timeout` seconds or that have
+    been open for longer than `max_age` seconds get closed instead of being reused.
+    Connections that have been idle for a while get pinged before being reused.
+
+    The number of connections opened and reused is kept in `connects` and `reuses`.
+    """
+
+    def __init__(
+        self, minconn: int, maxconn: int, *args, idle_timeout=300, max_age=3600, **kwargs
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.connects = 0
+        self.reuses = 0
+        # id(connection) -> time the connection was opened/last put back into the pool
+        self._opened: Dict[int, float] = {}
+        self._released: Dict[int, float] = {}
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        self.connects += 1
+        self._opened[id(conn)] = time.time()
+        return conn
+
+    def _close(self, conn) -> None:
+        self._opened.pop(id(conn), None)
+        self._released.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn) -> bool:
+        now = time.time()
+        if (
+            conn.closed
+            or now - self._opened.get(id(conn), now) > self.max_age
+            or now - self._released.get(id(conn), now) > self.idle_timeout
+        ):
+            return False
+        if now - self._released.get(id(conn), now) > _HEALTH_CHECK_AFTER:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _getconn(self, key=None):
+        if key is None:
+            key = self._getkey()
+        while key not in self._used and self._pool:
+            conn = self._pool.pop()
+            if self._is_healthy(conn):
+                self._released.pop(id(conn), None)
+                self._used[key] = conn
+                self._rused[id(conn)] = key
+                self.reuses += 1
+                return conn
+            self._close(conn)
+        return super()._getconn(key)
+
+    def _putconn(self, conn, key=None, close=False):
+        if (
+            close
+            or self.closed
+            or conn.closed
+            or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+            # Don't keep more idle connections around than the pool can hand out.
+            or len(self._pool) >= self.maxconn
+        ):
+            self._opened.pop(id(conn), None)
+            self._released.pop(id(conn), None)
+            return super()._putconn(conn, key, close=True)
+
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise PoolError("trying to put unkeyed connection")
+
+        # Keep the connection, making sure it's not in a transaction anymore.
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        self._released[id(conn)] = time.time()
+        self._pool.append(conn)
+        del self._used[key]
+        del self._rused[id(conn)]
+
+    def _closeall(self):
+        super()._closeall()
+        self._opened.clear()
+        self._released.clear()
+
+
 class PsycopgEngine(SQLEngine):
     """Postgres SQL engine backed by a Psycopg connection."""
 
@@ -238,15 +351,41 @@ class PsycopgEngine(SQLEngine):
                 conn_params["SG_ENGINE_DB_NAME"],
             )
 
-            self._pool = ThreadedConnectionPool(
+            pool_kwargs: Dict[str, Any] = {}
+            pool_class = ThreadedConnectionPool
+            # By default, connections get closed when they're put back into the pool (at the end of
+            # every transaction). In keepalive mode, they're kept open and reused instead.
+            if conn_params.get("SG_ENGINE_KEEPALIVE", CONFIG["SG_ENGINE_KEEPALIVE"]) == "true":
+                pool_class = KeepAliveConnectionPool
+                pool_kwargs = {
+                    "idle_timeout": int(
+                        cast(
+                            str,
+                            conn_params.get(
+                                "SG_ENGINE_IDLE_TIMEOUT", CONFIG["SG_ENGINE_IDLE_TIMEOUT"]
+                            ),
+                        )
+                    ),
+                    "max_age": int(
+                        cast(
+                            str,
+                            conn_params.get(
+                                "SG_ENGINE_MAX_CONN_AGE", CONFIG["SG_ENGINE_MAX_CONN_AGE"]
+                            ),
+                        )
+                    ),
+                }
+
+            self._pool = pool_class(
                 minconn=0,
-                maxconn=conn_params.get("SG_ENGINE_POOL", CONFIG["SG_ENGINE_POOL"]),
+                maxconn=int(cast(str, conn_params.get("SG_ENGINE_POOL", CONFIG["SG_ENGINE_POOL"]))),
                 host=server,
                 port=int(cast(int, port)) if port is not None else None,
                 user=username,
                 password=password,
                 dbname=dbname,
                 application_name="sgr " + __version__,
+                **pool_kwargs,
             )
         else:
             self._pool = pool
@@ -485,29 +624,7 @@ class PsycopgEngine(SQLEngine):
                         logging.info("%s says: %s", self.name, notice)
                     del connection.notices[:]
             except Exception as e:
-                # Rollback the transaction (to a savepoint if we're inside the savepoint() context manager)
-                self.rollback()
-                # Go through some more common errors (like the engine not being initialized) and raise
-                # more specific Splitgraph exceptions.
-                if isinstance(e, UndefinedTable):
-                    # This is not a neat way to do this but other methods involve placing wrappers around
-                    # anything that sends queries to splitgraph_meta or audit schemas.
-                    if _AUDIT_SCHEMA + "." in str(e):
-                        raise EngineInitializationError(
-                            "Audit triggers not found on the engine. Has the engine been initialized?"
-                        ) from e
-                    for meta_table in META_TABLES:
-                        if "splitgraph_meta.%s" % meta_table in str(e):
-                            raise EngineInitializationError(
-                                "splitgraph_meta not found on the engine. Has the engine been initialized?"
-                            ) from e
-                    if "splitgraph_meta" in str(e):
-                        raise ObjectNotFoundError(e)
-                elif isinstance(e, InvalidSchemaName):
-                    if "splitgraph_api" in str(e):
-                        raise EngineInitializationError(
-                            "splitgraph_api not found on the engine. Has the engine been initialized?"
-                        ) from e
+                self._handle_error(e)
                 raise
 
             if cur.description is None:
@@ -522,6 +639,66 @@ class PsycopgEngine(SQLEngine):
                 return [c[0] for c in cur.fetchall()]
             return cur.fetchall()
 
+    def run_sql_iter(
+        self,
+        statement: Union[bytes, Composed, str, SQL],
+        arguments: Optional[Sequence[Any]] = None,
+        batch_size: Optional[int] = None,
+        named: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Run a query and stream its results using a server-side cursor, so that at most
+        `batch_size` rows are held in memory at a time. The statement must be a single
+        query that returns results (e.g. SELECT).
+
+        :param statement: Query to run
+        :param arguments: Query arguments
+        :param batch_size: Number of rows to fetch from the engine in one go (default
+            `SG_ENGINE_FETCH_SIZE`).
+        :param named: If True, yield named tuples.
+        :return: Iterator of result rows.
+        """
+        cursor_kwargs = {"cursor_factory": psycopg2.extras.NamedTupleCursor} if named else {}
+        connection = self.connection
+
+        # Named cursors can only be used outside of a transaction if they're declared
+        # WITH HOLD (in which case the engine materializes the result on its side).
+        with connection.cursor(
+            name="sg_cursor_%032x" % getrandbits(128), withhold=self.autocommit, **cursor_kwargs
+        ) as cur:
+            cur.itersize = batch_size or int(get_singleton(CONFIG, "SG_ENGINE_FETCH_SIZE"))
+            try:
+                cur.execute(statement, _convert_vals(arguments) if arguments else None)
+                yield from cur
+            except Exception as e:
+                self._handle_error(e)
+                raise
+
+    def _handle_error(self, e: Exception) -> None:
+        # Rollback the transaction (to a savepoint if we're inside the savepoint() context manager)
+        self.rollback()
+        # Go through some more common errors (like the engine not being initialized) and raise
+        # more specific Splitgraph exceptions.
+        if isinstance(e, UndefinedTable):
+            # This is not a neat way to do this but other methods involve placing wrappers around
+            # anything that sends queries to splitgraph_meta or audit schemas.
+            if _AUDIT_SCHEMA + "." in str(e):
+                raise EngineInitializationError(
+                    "Audit triggers not found on the engine. Has the engine been initialized?"
+                ) from e
+            for meta_table in META_TABLES:
+                if "splitgraph_meta.%s" % meta_table in str(e):
+                    raise EngineInitializationError(
+                        "splitgraph_meta not found on the engine. Has the engine been initialized?"
+                    ) from e
+            if "splitgraph_meta" in str(e):
+                raise ObjectNotFoundError(e)
+        elif isinstance(e, InvalidSchemaName):
+            if "splitgraph_api" in str(e):
+                raise EngineInitializationError(
+                    "splitgraph_api not found on the engine. Has the engine been initialized?"
+                ) from e
+
     def get_primary_keys(self, schema: str, table: str) -> List[Tuple[str, str]]:
         """Inspects the Postgres information_schema to get the primary keys for a given table."""
         return cast(
@@ -856,6 +1033,72 @@ class AuditTriggerChangeEngine(PsycopgEngine, ChangeEngine):
             result.extend(_convert_audit_change(action, row_data, changed_fields, ri_cols))
         return result
 
+    def get_conflated_changes(
+        self, schema: str, table: str, batch_size: int
+    ) -> Iterator[Dict[Tuple, Tuple[bool, Dict[str, Any], Dict[str, Any]]]]:
+        """
+        Conflate pending changes for a given tracked table on the engine and return them in batches,
+        ordered by the change key, without loading the whole change log into memory.
+
+        This is the SQL equivalent of running `_convert_audit_change` on every audit log entry and
+        conflating the results: for every changed row, we take the old value from its
+        earliest change and the new value from its latest change, dropping rows that have been
+        changed multiple times and ended up with the same value as the old one.
+
+        :param schema: Schema the table belongs to
+        :param table: Table to return changes for
+        :param batch_size: Maximum number of changed rows in every batch
+        :return: Iterator of changesets (dictionaries of
+            `{pk: (upserted, old row (if updated or deleted), new row (if upserted))}`)
+        """
+        ri_cols, _ = zip(*self.get_change_key(schema, table))
+        ri_array = SQL("{}::text[]").format(Literal(list(ri_cols)))
+
+        def _pk(*sources: str) -> Composed:
+            return SQL("jsonb_build_array({})").format(
+                SQL(",").join(
+                    SQL("coalesce({})").format(
+                        SQL(",").join(SQL(s + " -> {}").format(Literal(c)) for s in sources)
+                    )
+                    for c in ri_cols
+                )
+            )
+
+        # Mirrors _convert_audit_change: an update that changes the row's PK is turned
+        # into a delete of the old PK (ord 0) and an insert of the new PK (ord 1).
+        query = SQL(
+            "SELECT pk, upserted, old_row, new_row FROM ("
+            "SELECT DISTINCT ON (c.pk) c.pk, c.upserted, first_value(c.old_row) "
+            "OVER (PARTITION BY c.pk ORDER BY a.event_id, c.ord) AS old_row, "
+            "c.new_row, count(*) OVER (PARTITION BY c.pk) AS changes FROM {0}.{1} a, "
+            "LATERAL (SELECT coalesce(a.changed_fields, '{{}}') ?| {2} AS pk_changed, "
+            "a.row_data || (coalesce(a.changed_fields, '{{}}') - {2}) AS new_row) u, "
+            "LATERAL (SELECT 0 AS ord, {3} AS pk, a.action <> 'D' AND NOT u.pk_changed AS upserted, "
+            "CASE WHEN a.action = 'I' THEN '{{}}'::jsonb ELSE a.row_data END AS old_row, "
+            "CASE WHEN a.action = 'D' THEN '{{}}'::jsonb "
+            "WHEN a.action = 'I' THEN a.row_data ELSE u.new_row END AS new_row "
+            "WHERE a.action <> 'U' OR coalesce(a.changed_fields, '{{}}') <> '{{}}' "
+            "UNION ALL SELECT 1, {4}, TRUE, '{{}}'::jsonb, u.new_row "
+            "WHERE a.action = 'U' AND u.pk_changed) c "
+            "WHERE a.schema_name = %s AND a.table_name = %s AND a.action IN ('I', 'U', 'D') "
+            "ORDER BY c.pk, a.event_id DESC, c.ord DESC) conflated "
+            "WHERE changes = 1 OR old_row <> new_row ORDER BY pk"
+        ).format(
+            Identifier(_AUDIT_SCHEMA),
+            Identifier("logged_actions"),
+            ri_array,
+            _pk("a.row_data"),
+            _pk("a.changed_fields", "a.row_data"),
+        )
+
+        # Stream the changes so that we only hold one batch of them at a time.
+        for rows in chunk(
+            self.run_sql_iter(query, (schema, table), batch_size=batch_size), batch_size
+        ):
+            yield {
+                tuple(pk): (upserted, old_row, new_row) for pk, upserted, old_row, new_row in rows
+            }
+
     def get_changed_tables(self, schema: str) -> List[str]:
         """Get list of tables that have changed content"""
         return cast(
@@ -1056,84 +1299,78 @@ class PostgresEngine(AuditTriggerChangeEngine, ObjectEngine):
             schema, table, schema_spec=add_ud_flag_column(schema_spec), temporary=temporary,
         )
 
+        if not inserted and not deleted:
+            return
+
+        # Stream the changed PKs into a temporary key table with COPY instead of inlining
+        # them into the query as VALUES (which for large changesets produces huge queries
+        # that take a long time to parse). The keys are stored as text and cast on
+        # insert/join, since the audit trigger gives us strings for values of updated columns.
+        keys_table = "sg_keys_%032x" % getrandbits(128)
+        self.run_sql(
+            SQL("CREATE TEMPORARY TABLE {} (").format(Identifier(keys_table))
+            + SQL(",").join(
+                Identifier(c) + SQL(" " + t)
+                for c, t in [(SG_UD_FLAG, "BOOLEAN")] + [(c, "TEXT") for c in ri_cols]
+            )
+            + SQL(")")
+        )
+        self._copy_keys(keys_table, inserted, deleted)
+
         # Store upserts
         # INSERT INTO target_table (sg_ud_flag, col1, col2...)
         #   (SELECT true, t.col1, t.col2, ...
-        #    FROM VALUES ((pk1_1, pk1_2), (pk2_1, pk2_2)...)) v JOIN source_table t
-        #    ON v.pk1 = t.pk1::pk1_type AND v.pk2::pk2_type = t.pk2...
-        #    -- the cast is required since the audit trigger gives us strings for values of updated columns
-        #    -- and we're intending to join those with the PKs in the original table.
-        if inserted:
-            if non_ri_cols:
-                query = (
-                    SQL("INSERT INTO {}.{} (").format(Identifier(schema), Identifier(table))
-                    + SQL(",").join(Identifier(c) for c in [SG_UD_FLAG] + all_cols)
-                    + SQL(")")
-                    + SQL("(SELECT %s, ")
-                    + SQL(",").join(SQL("t.") + Identifier(c) for c in all_cols)
-                    + SQL(
-                        " FROM (VALUES "
-                        + ",".join(
-                            itertools.repeat(
-                                "(" + ",".join(itertools.repeat("%s", len(inserted[0]))) + ")",
-                                len(inserted),
-                            )
-                        )
-                        + ")"
-                    )
-                    + SQL(" AS v (")
-                    + SQL(",").join(Identifier(c) for c in ri_cols)
-                    + SQL(")")
-                    + SQL("JOIN {}.{} t").format(
-                        Identifier(source_schema), Identifier(source_table)
-                    )
-                    + SQL(" ON ")
-                    + SQL(" AND ").join(
-                        SQL("t.{0} = v.{0}::%s" % r).format(Identifier(c))
-                        for c, r in zip(ri_cols, ri_types)
-                    )
-                    + SQL(")")
+        #    FROM keys_table v JOIN source_table t
+        #    ON t.pk1 = v.pk1::pk1_type AND t.pk2 = v.pk2::pk2_type...
+        #    WHERE v.sg_ud_flag)
+        if inserted and non_ri_cols:
+            self.run_sql(
+                SQL("INSERT INTO {}.{} (").format(Identifier(schema), Identifier(table))
+                + SQL(",").join(Identifier(c) for c in [SG_UD_FLAG] + all_cols)
+                + SQL(") SELECT true, ")
+                + SQL(",").join(SQL("t.") + Identifier(c) for c in all_cols)
+                + SQL(" FROM {} v JOIN {}.{} t ON ").format(
+                    Identifier(keys_table), Identifier(source_schema), Identifier(source_table)
                 )
-                # Flatten the args
-                args = [True] + [p for pk in inserted for p in pk]
-            else:
-                # If the whole tuple is the PK, there's no point joining on the actual source table
-                query = (
-                    SQL("INSERT INTO {}.{} (").format(Identifier(schema), Identifier(table))
-                    + SQL(",").join(Identifier(c) for c in [SG_UD_FLAG] + ri_cols)
-                    + SQL(")")
-                    + SQL(
-                        "VALUES "
-                        + ",".join(
-                            itertools.repeat(
-                                "(" + ",".join(itertools.repeat("%s", len(inserted[0]) + 1)) + ")",
-                                len(inserted),
-                            )
-                        )
-                    )
+                + SQL(" AND ").join(
+                    SQL("t.{0} = v.{0}::%s" % r).format(Identifier(c))
+                    for c, r in zip(ri_cols, ri_types)
                 )
-                args = [p for pk in inserted for p in [True] + list(pk)]
-            self.run_sql(query, args)
+                + SQL(" WHERE v.{}").format(Identifier(SG_UD_FLAG))
+            )
 
-        # Store the deletes
-        # we don't actually have the old values here so we put NULLs (which should be compressed out).
-        if deleted:
+        # Store the deletes (and the upserts if the whole tuple is the PK, in which case
+        # there's no point joining on the actual source table).
+        # We don't actually have the old values here so we put NULLs (which should be compressed out).
+        if deleted or not non_ri_cols:
             query = (
                 SQL("INSERT INTO {}.{} (").format(Identifier(schema), Identifier(table))
                 + SQL(",").join(Identifier(c) for c in [SG_UD_FLAG] + ri_cols)
-                + SQL(")")
-                + SQL(
-                    "VALUES "
-                    + ",".join(
-                        itertools.repeat(
-                            "(" + ",".join(itertools.repeat("%s", len(deleted[0]) + 1)) + ")",
-                            len(deleted),
-                        )
-                    )
+                + SQL(") SELECT v.{}, ").format(Identifier(SG_UD_FLAG))
+                + SQL(",").join(
+                    SQL("v.{}::%s" % r).format(Identifier(c)) for c, r in zip(ri_cols, ri_types)
                 )
+                + SQL(" FROM {} v").format(Identifier(keys_table))
+            )
+            if non_ri_cols:
+                query += SQL(" WHERE NOT v.{}").format(Identifier(SG_UD_FLAG))
+            else:
+                query += SQL(" ORDER BY v.{} DESC").format(Identifier(SG_UD_FLAG))
+            self.run_sql(query)
+
+        self.run_sql(SQL("DROP TABLE {}").format(Identifier(keys_table)))
+
+    def _copy_keys(self, keys_table: str, inserted: Any, deleted: Any) -> None:
+        def _rows() -> Iterator[str]:
+            for flag, pks in ((True, inserted), (False, deleted)):
+                for pk in pks or []:
+                    yield "\t".join([_to_copy_text(flag)] + [_to_copy_text(p) for p in pk]) + "\n"
+
+        with self.connection.cursor() as cur:
+            cur.copy_expert(
+                SQL("COPY {} FROM STDIN WITH (FORMAT text)").format(Identifier(keys_table)),
+                _CopyStream(_rows()),
             )
-            args = [p for pk in deleted for p in [False] + list(pk)]
-            self.run_sql(query, args)
 
     def store_object(
         self,
@@ -1293,6 +1530,119 @@ class PostgresEngine(AuditTriggerChangeEngine, ObjectEngine):
         )
         self.run_sql(query, (extra_qual_args * len(objects)) if extra_qual_args else None)
 
+    def load_fragments(
+        self,
+        objects: List[Tuple[str, str]],
+        target_schema: str,
+        target_table: str,
+        schema_spec: "TableSchema",
+        progress_every: Optional[int] = None,
+    ) -> None:
+        """
+        Load fragments into a table with plain INSERTs. Unlike `apply_fragments`, this doesn't
+        delete rows that the fragments overwrite: it's only correct if no two fragments (and no
+        fragment and the rows already in the table) contain the same primary key. Rows that the
+        fragments mark as deleted are skipped.
+
+        :param objects: List of (schema, table) of fragments.
+        :param target_schema: Schema of the target table
+        :param target_table: Target table
+        :param schema_spec: Schema of the fragments
+        :param progress_every: If set, show a progress bar, loading this many fragments at a time.
+        """
+        if not objects:
+            return
+        all_cols = SQL(",").join(
+            Identifier(c) for c in itertools.chain(*self._schema_spec_to_cols(schema_spec))
+        )
+
+        def _load_batch(batch: List[Tuple[str, str]]) -> None:
+            self.run_sql(
+                SQL(";").join(
+                    SQL("INSERT INTO {}.{} (").format(
+                        Identifier(target_schema), Identifier(target_table)
+                    )
+                    + all_cols
+                    + SQL(") SELECT ")
+                    + all_cols
+                    + SQL(" FROM {}.{} WHERE {} = true").format(
+                        Identifier(ss), Identifier(st), Identifier(SG_UD_FLAG)
+                    )
+                    for ss, st in batch
+                )
+            )
+
+        if progress_every:
+            with tqdm(total=len(objects), unit="obj") as pbar:
+                for batch in chunk(objects, chunk_size=progress_every):
+                    _load_batch(batch)
+                    pbar.update(len(batch))
+        else:
+            _load_batch(objects)
+
+    def get_fragment_merge_query(
+        self,
+        objects: List[Tuple[str, str]],
+        schema_spec: "TableSchema",
+        extra_quals: Optional[Composed] = None,
+        extra_qual_args: Optional[Tuple[str]] = None,
+    ) -> bytes:
+        """
+        Generate a read-only subquery that returns the same rows as applying the fragments
+        to an empty table with `apply_fragments` would, without having to create the table.
+
+        For every primary key, only its latest version across the fragments is kept and it's
+        dropped if that version is a deletion. The table must have a primary key: without one,
+        duplicate rows would get collapsed into one.
+
+        :param objects: List of (schema, table) of fragments, in order of application.
+        :param schema_spec: Schema of the fragments
+        :param extra_quals: Qualifiers to filter the fragments on before merging them. These
+            must only reference the primary key, since other columns of a row could have been
+            changed by a later fragment.
+        :param extra_qual_args: Arguments to the qualifiers
+        :return: Subquery (bytes) that can be used in place of a table name.
+        """
+        ri_cols, non_ri_cols = self._schema_spec_to_cols(schema_spec)
+        all_cols = SQL(",").join(Identifier(c) for c in ri_cols + non_ri_cols)
+        ri_cols_sql = SQL(",").join(Identifier(c) for c in ri_cols)
+        flag = Identifier(SG_UD_FLAG)
+
+        # Tag every row with the position of its fragment so that the latest version of each
+        # key can be picked out with DISTINCT ON. Within a fragment, upserts take precedence
+        # over deletions (since apply_fragments deletes first and inserts afterwards).
+        fragments = SQL(" UNION ALL ").join(
+            SQL("SELECT {} AS sg_fragment_order,").format(Literal(i))
+            + all_cols
+            + SQL(",{} FROM {}.{}").format(flag, Identifier(ss), Identifier(st))
+            + (SQL(" WHERE ") + extra_quals if extra_quals and extra_qual_args else SQL(""))
+            for i, (ss, st) in enumerate(objects)
+        )
+        query = (
+            SQL("(SELECT ")
+            + all_cols
+            + SQL(" FROM (SELECT DISTINCT ON (")
+            + ri_cols_sql
+            + SQL(") ")
+            + all_cols
+            + SQL(",{} FROM (").format(flag)
+            + fragments
+            + SQL(") sg_fragments ORDER BY ")
+            + ri_cols_sql
+            + SQL(", sg_fragment_order DESC, {} DESC) sg_latest WHERE {}) sg_merged").format(
+                flag, flag
+            )
+        )
+
+        with self.connection.cursor() as cur:
+            return cast(
+                bytes,
+                cur.mogrify(
+                    query,
+                    (extra_qual_args * len(objects)) if extra_quals and extra_qual_args else None,
+                ),
+            )
+
     def upload_objects(self, objects: List[str], remote_engine: "PostgresEngine") -> None:
 
         # We don't have direct access to the remote engine's storage and we also
@@ -1546,6 +1896,47 @@ def _convert_vals(vals: Any) -> Any:
     return [Json(v) if isinstance(v, dict) else v for v in vals]
 
 
+class _CopyStream:
+    """
+    Read-only file-like object over an iterator of lines in the COPY text format, so that
+    `copy_expert` can stream them to the engine without them all being held in memory.
+    """
+
+    def __init__(self, lines: Iterator[str]) -> None:
+        self._lines = lines
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        buffered = len(self._buffer)
+        for line in self._lines:
+            chunks.append(line)
+            buffered += len(line)
+            if 0 <= size <= buffered:
+                break
+        data = "".join(chunks)
+        if size < 0:
+            size = len(data)
+        result, self._buffer = data[:size], data[size:]
+        return result
+
+
+def _to_copy_text(value: Any) -> str:
+    """Render a value into Postgres' COPY text format so that it can later be cast
+    into the column's actual type."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
 def _generate_where_clause(table: str, cols: List[str], table_2: str) -> Composed:
     return SQL(" AND ").join(
         SQL("{}.{} = {}.{}").format(
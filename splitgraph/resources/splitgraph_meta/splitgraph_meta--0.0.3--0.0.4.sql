@@ -0,0 +1,4 @@
+-- Track how many times each cached object has been claimed, for frequency-aware
+-- cache eviction and admission policies.
+ALTER TABLE splitgraph_meta.object_cache_status
+    ADD COLUMN access_count integer NOT NULL DEFAULT 1;
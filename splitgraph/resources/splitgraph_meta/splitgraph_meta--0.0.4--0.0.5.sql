@@ -0,0 +1,36 @@
+-- Object and table access statistics, written in batches by object managers
+-- when SG_ACCESS_STATS is enabled.
+
+-- scan_count:   number of times the object was used by a query or a materialization
+-- bytes_read:   total size of the object times the number of times it was used
+-- rows_read:    total number of rows in the object times the number of times it was used
+-- last_scanned: Timestamp (UTC) the object was last used.
+CREATE TABLE splitgraph_meta.object_access_stats (
+    object_id varchar NOT NULL PRIMARY KEY,
+    scan_count bigint NOT NULL DEFAULT 0,
+    bytes_read bigint NOT NULL DEFAULT 0,
+    rows_read bigint NOT NULL DEFAULT 0,
+    last_scanned timestamp
+);
+
+-- query_count:       number of layered queries against the table
+-- fragments_total:   total number of fragments in the table, summed over all queries
+-- fragments_scanned: number of fragments that queries had to scan after filtering them
+--                    with the query qualifiers
+-- rows_scanned:      estimated number of rows that queries had to scan
+-- last_quals:        shapes (columns and operators) of the last distinct qualifiers used
+--                    to query the table, most recent first
+-- last_queried:      Timestamp (UTC) the table was last queried.
+CREATE TABLE splitgraph_meta.table_access_stats (
+    namespace varchar(64) NOT NULL,
+    repository varchar(64) NOT NULL,
+    image_hash varchar NOT NULL,
+    table_name varchar NOT NULL,
+    query_count bigint NOT NULL DEFAULT 0,
+    fragments_total bigint NOT NULL DEFAULT 0,
+    fragments_scanned bigint NOT NULL DEFAULT 0,
+    rows_scanned bigint NOT NULL DEFAULT 0,
+    last_quals jsonb NOT NULL DEFAULT '[]',
+    last_queried timestamp,
+    PRIMARY KEY (namespace, repository, image_hash, table_name)
+);
@@ -94,6 +94,15 @@ $BODY$
 LANGUAGE plpython3u
 VOLATILE;
 
+CREATE OR REPLACE FUNCTION splitgraph_api.list_partial_downloads ()
+    RETURNS varchar[]
+    AS $BODY$
+    from splitgraph.core.server import list_partial_downloads
+    return list_partial_downloads()
+$BODY$
+LANGUAGE plpython3u
+VOLATILE;
+
 CREATE OR REPLACE FUNCTION splitgraph_api.object_exists (
     object_id varchar
 )
@@ -104,3 +113,82 @@ CREATE OR REPLACE FUNCTION splitgraph_api.object_exists (
 $BODY$
 LANGUAGE plpython3u
 VOLATILE;
+
+-- Homomorphic hashing (see splitgraph.core.fragment_manager.Digest) done engine-side,
+-- so that the object engine doesn't have to send every row hash back to the client.
+-- The state is 16 running sums (one per 2-byte component of the SHA-256 row hash) that
+-- only get wrapped around in the final function.
+CREATE OR REPLACE FUNCTION splitgraph_api.lthash_accum (
+    state bigint[],
+    row_hash bytea
+)
+    RETURNS bigint[]
+    AS $$
+BEGIN
+    RETURN ARRAY[
+        state[1] + (get_byte(row_hash, 0) << 8) + get_byte(row_hash, 1),
+        state[2] + (get_byte(row_hash, 2) << 8) + get_byte(row_hash, 3),
+        state[3] + (get_byte(row_hash, 4) << 8) + get_byte(row_hash, 5),
+        state[4] + (get_byte(row_hash, 6) << 8) + get_byte(row_hash, 7),
+        state[5] + (get_byte(row_hash, 8) << 8) + get_byte(row_hash, 9),
+        state[6] + (get_byte(row_hash, 10) << 8) + get_byte(row_hash, 11),
+        state[7] + (get_byte(row_hash, 12) << 8) + get_byte(row_hash, 13),
+        state[8] + (get_byte(row_hash, 14) << 8) + get_byte(row_hash, 15),
+        state[9] + (get_byte(row_hash, 16) << 8) + get_byte(row_hash, 17),
+        state[10] + (get_byte(row_hash, 18) << 8) + get_byte(row_hash, 19),
+        state[11] + (get_byte(row_hash, 20) << 8) + get_byte(row_hash, 21),
+        state[12] + (get_byte(row_hash, 22) << 8) + get_byte(row_hash, 23),
+        state[13] + (get_byte(row_hash, 24) << 8) + get_byte(row_hash, 25),
+        state[14] + (get_byte(row_hash, 26) << 8) + get_byte(row_hash, 27),
+        state[15] + (get_byte(row_hash, 28) << 8) + get_byte(row_hash, 29),
+        state[16] + (get_byte(row_hash, 30) << 8) + get_byte(row_hash, 31)];
+END;
+$$
+LANGUAGE plpgsql
+IMMUTABLE STRICT PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION splitgraph_api.lthash_combine (
+    state_1 bigint[],
+    state_2 bigint[]
+)
+    RETURNS bigint[]
+    AS $$
+BEGIN
+    RETURN ARRAY (
+        SELECT s1 + s2
+        FROM unnest(state_1, state_2) AS s (s1, s2));
+END;
+$$
+LANGUAGE plpgsql
+IMMUTABLE STRICT PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION splitgraph_api.lthash_final (
+    state bigint[]
+)
+    RETURNS bytea
+    AS $$
+DECLARE
+    result bytea := decode(repeat('00', 32), 'hex');
+BEGIN
+    FOR i IN 0..15 LOOP
+        result := set_byte(result, 2 * i, ((state[i + 1] >> 8) & 255)::integer);
+        result := set_byte(result, 2 * i + 1, (state[i + 1] & 255)::integer);
+    END LOOP;
+    RETURN result;
+END;
+$$
+LANGUAGE plpgsql
+IMMUTABLE STRICT PARALLEL SAFE;
+
+-- lthash_sum(row_hash): sum up 256-bit row hashes into a 256-bit (32-byte) homomorphic hash.
+-- Returns 32 zero bytes (the empty hash) for an empty set of rows.
+DROP AGGREGATE IF EXISTS splitgraph_api.lthash_sum (bytea);
+
+CREATE AGGREGATE splitgraph_api.lthash_sum (bytea) (
+    SFUNC = splitgraph_api.lthash_accum,
+    STYPE = bigint[],
+    COMBINEFUNC = splitgraph_api.lthash_combine,
+    FINALFUNC = splitgraph_api.lthash_final,
+    INITCOND = '{0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0}',
+    PARALLEL = SAFE
+);
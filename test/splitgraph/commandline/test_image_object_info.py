@@ -180,6 +180,27 @@ def test_commandline_basics(pg_repo_local):
     assert "Name of the fruit" in result.output
 
 
+def test_commandline_sql_select_into(pg_repo_local):
+    # SELECT ... INTO can't be run through a server-side cursor.
+    runner = CliRunner()
+    result = runner.invoke(
+        sql_c,
+        ['SELECT * INTO "test/pg_mount".fruits_copy FROM "test/pg_mount".fruits'],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    assert pg_repo_local.run_sql("SELECT * FROM fruits_copy ORDER BY fruit_id") == [
+        (1, "apple"),
+        (2, "orange"),
+    ]
+
+    result = runner.invoke(
+        sql_c, ['SELECT name FROM "test/pg_mount".fruits_copy'], catch_exceptions=False
+    )
+    assert result.exit_code == 0
+    assert "apple" in result.output
+
+
 def test_commandline_show_empty_image(local_engine_empty):
     # Check size calculations etc in an empty image don't cause errors.
     runner = CliRunner()
@@ -6,6 +6,7 @@ from test.splitgraph.commands.test_layered_querying import _prepare_fully_remote
 from test.splitgraph.conftest import OUTPUT
 
 from splitgraph.core.indexing.bloom import _prepare_bloom_quals, filter_bloom_index, describe
+from splitgraph.core.object_manager import ObjectManager
 from splitgraph.core.repository import clone, Repository
 from splitgraph.engine import ResultShape
 from splitgraph.exceptions import ObjectIndexingError
@@ -268,6 +269,28 @@ def test_bloom_index_post_factum(local_engine_empty):
         )
 
 
+def test_bloom_reindex_failure_cache(local_engine_empty):
+    # Check that a failed reindex doesn't leave the new index in the object metadata cache.
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    OUTPUT.run_sql("INSERT INTO test VALUES (1, 'apple')")
+    head = OUTPUT.commit()
+    obj = head.get_table("test").objects[0]
+    object_index = OUTPUT.objects.get_object_meta([obj])[obj].object_index
+    assert "bloom" not in object_index
+
+    with mock.patch.object(
+        ObjectManager, "register_objects", side_effect=ValueError("Simulated failure")
+    ):
+        with pytest.raises(ValueError):
+            head.get_table("test").reindex(
+                extra_indexes={"bloom": {"value_1": {"probability": 0.01}}}
+            )
+
+    assert OUTPUT.objects.get_object_meta([obj])[obj].object_index == object_index
+    assert "bloom" not in object_index
+
+
 def test_bloom_reindex_changed_table(local_engine_empty):
     OUTPUT.init()
     OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR, value_2 INTEGER)")
@@ -231,6 +231,113 @@ def test_commit_chunking_order(local_engine_empty):
         ) == list(range(max_key, min_key - 1, -1))
 
 
+def test_commit_chunking_parallel(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR, value_2 INTEGER)")
+    for i in range(11):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s, %s)", (i + 1, chr(ord("z") - i), i * 2))
+    head = OUTPUT.commit(chunk_size=5, workers=3)
+    objects = head.get_table("test").objects
+    assert len(objects) == 3
+
+    # The staging table got cleaned up
+    assert not [
+        t
+        for t in local_engine_empty.get_all_tables(SPLITGRAPH_META_SCHEMA)
+        if t.startswith("sg_tmp_")
+    ]
+
+    # Chunking the same table sequentially produces the same objects and indexes
+    head_seq = OUTPUT.commit(snap_only=True, chunk_size=5, workers=1)
+    assert head_seq.get_table("test").objects == objects
+    object_meta = OUTPUT.objects.get_object_meta(objects)
+    for i, obj in enumerate(objects):
+        min_key = i * 5 + 1
+        max_key = min(i * 5 + 5, 11)
+        assert object_meta[obj].object_index["range"]["key"] == [min_key, max_key]
+        assert object_meta[obj].rows_inserted == max_key - min_key + 1
+        assert local_engine_empty.run_sql(
+            SQL("SELECT key FROM {}.{} ORDER BY key").format(
+                Identifier(SPLITGRAPH_META_SCHEMA), Identifier(obj)
+            ),
+            return_shape=ResultShape.MANY_ONE,
+        ) == list(range(min_key, max_key + 1))
+
+    head.checkout()
+    assert OUTPUT.run_sql("SELECT COUNT(*) FROM test", return_shape=ResultShape.ONE_ONE) == 11
+
+
+def test_diff_fragments(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(20):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    head = OUTPUT.commit(chunk_size=5)
+
+    OUTPUT.run_sql("UPDATE test SET value_1 = 'updated' WHERE key = 7")
+    OUTPUT.run_sql("DELETE FROM test WHERE key = 12")
+    OUTPUT.run_sql("INSERT INTO test VALUES (25, 'val_25')")
+    new_head = OUTPUT.commit()
+
+    # Only fragments covering the changed PK ranges need to be compared.
+    objects_1, objects_2 = OUTPUT.objects.get_fragment_diff(
+        head.get_table("test").objects,
+        new_head.get_table("test").objects,
+        head.get_table("test").table_schema,
+    )
+    assert head.get_table("test").objects[0] not in objects_1
+    assert len(objects_1) < len(head.get_table("test").objects)
+    assert len(objects_2) < len(new_head.get_table("test").objects)
+
+    expected = [
+        (False, (7, "val_7")),
+        (False, (12, "val_12")),
+        (True, (7, "updated")),
+        (True, (25, "val_25")),
+    ]
+    assert sorted(OUTPUT.diff("test", head, new_head)) == expected
+    assert OUTPUT.diff("test", head, new_head, aggregate=True) == (2, 2, 0)
+
+    # Same result as materializing both tables and comparing them.
+    with mock.patch.object(
+        OUTPUT.objects, "get_fragment_diff", side_effect=TypeError("can't compare")
+    ):
+        assert sorted(OUTPUT.diff("test", head, new_head)) == expected
+        assert OUTPUT.diff("test", head, new_head, aggregate=True) == (2, 2, 0)
+    assert sorted(OUTPUT.diff("test", new_head, head)) == sorted(
+        (not added, row) for added, row in expected
+    )
+
+
+def test_diff_content_hash(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(10):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    head = OUTPUT.commit(chunk_size=5)
+
+    OUTPUT.run_sql("UPDATE test SET value_1 = 'updated' WHERE key = 3")
+    updated = OUTPUT.commit()
+    OUTPUT.run_sql("UPDATE test SET value_1 = 'val_3' WHERE key = 3")
+    reverted = OUTPUT.commit()
+
+    # The table in the first and the last image consists of different objects but has the same rows.
+    assert head.get_table("test").objects != reverted.get_table("test").objects
+    assert head.get_table("test").content_hash() == reverted.get_table("test").content_hash()
+    assert head.get_table("test").content_hash() != updated.get_table("test").content_hash()
+
+    # The diff is computed without comparing any rows.
+    with mock.patch("splitgraph.core.repository.fragment_diff") as fd, mock.patch(
+        "splitgraph.core.repository.slow_diff"
+    ) as sd:
+        assert OUTPUT.diff("test", head, reverted) == []
+        assert OUTPUT.diff("test", head, reverted, aggregate=True) == (0, 0, 0)
+    assert fd.call_count == 0
+    assert sd.call_count == 0
+
+    assert OUTPUT.diff("test", head, updated) == [(False, (3, "val_3")), (True, (3, "updated"))]
+
+
 def test_commit_diff_splitting(local_engine_empty):
     # Similar setup to the chunking test
     OUTPUT.init()
@@ -1086,6 +1193,35 @@ def test_unicode_columns(local_engine_empty):
     assert OUTPUT.run_sql("SELECT * FROM таблица WHERE столбец = 'one'") == [(1, "one")]
 
 
+def test_commit_diff_copy_special_characters(local_engine_empty):
+    # Changed PKs are streamed into the engine with COPY: make sure values that need escaping
+    # in the COPY text format survive the roundtrip.
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key VARCHAR PRIMARY KEY, value BOOLEAN, data VARCHAR)")
+    OUTPUT.run_sql("INSERT INTO test VALUES ('a', true, 'one'), ('b\\c', false, 'two')")
+    OUTPUT.commit()
+
+    OUTPUT.run_sql("INSERT INTO test VALUES (E'd\\te', true, 'three'), (E'f\\ng', NULL, NULL)")
+    OUTPUT.run_sql("UPDATE test SET value = NULL WHERE key = 'a'")
+    OUTPUT.run_sql("DELETE FROM test WHERE key = 'b\\c'")
+    head = OUTPUT.commit()
+
+    assert sorted(OUTPUT.diff("test", head.parent_id, head.image_hash)) == [
+        (False, ("a", True, "one")),
+        (False, ("b\\c", False, "two")),
+        (True, ("a", None, "one")),
+        (True, ("d\te", True, "three")),
+        (True, ("f\ng", None, None)),
+    ]
+
+    head.checkout()
+    assert OUTPUT.run_sql("SELECT * FROM test ORDER BY key") == [
+        ("a", None, "one"),
+        ("d\te", True, "three"),
+        ("f\ng", None, None),
+    ]
+
+
 def test_commit_diff_views(pg_repo_local):
     # Test that having views in the tracked schema doesn't crash sgr on commit (they're not
     # stored and have to get deleted on checkout because they explicitly depend on tables
@@ -1,7 +1,10 @@
+from unittest.mock import patch
+
 import pytest
 
 # Test cases: ops are a list of operations (with commit after each set);
 #             diffs are expected diffs produced by each operation.
+from splitgraph.config import CONFIG
 from splitgraph.core.fragment_manager import _conflate_changes
 
 CASES = [
@@ -120,6 +123,28 @@ def test_diff_conflation_on_commit(pg_repo_local, test_case):
         assert pg_repo_local.diff("fruits", pg_repo_local.head.parent_id, head) == expected_diff
 
 
+@pytest.mark.parametrize("test_case", CASES)
+def test_diff_conflation_on_commit_batched(pg_repo_local, test_case):
+    # Same as above, but force the changes to be conflated on the engine and stored
+    # as one fragment per changed row.
+    with patch.dict(CONFIG, {"SG_COMMIT_CHANGESET_BATCH_SIZE": "1"}):
+        for operation, expected_diff in test_case:
+            pg_repo_local.run_sql(operation)
+            pg_repo_local.commit_engines()
+
+            # Check the engine-side conflation matches the in-memory one.
+            engine = pg_repo_local.object_engine
+            in_memory = _conflate_changes({}, engine.get_pending_changes("test/pg_mount", "fruits"))
+            on_engine = {}
+            for batch in engine.get_conflated_changes("test/pg_mount", "fruits", 1):
+                assert len(batch) == 1
+                on_engine.update(batch)
+            assert on_engine == in_memory
+
+            head = pg_repo_local.commit()
+            assert pg_repo_local.diff("fruits", pg_repo_local.head.parent_id, head) == expected_diff
+
+
 def test_diff_conflation_insert_same(pg_repo_local):
     pg_repo_local.run_sql("ALTER TABLE fruits ADD PRIMARY KEY (fruit_id)")
     pg_repo_local.commit()
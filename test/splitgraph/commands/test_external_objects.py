@@ -1,10 +1,20 @@
-from unittest.mock import patch
+import os
+from io import BytesIO
+from unittest.mock import patch, call, MagicMock
 
 import pytest
 from test.splitgraph.conftest import PG_MNT
 
+from splitgraph.config import CONFIG
 from splitgraph.core.engine import repository_exists
 from splitgraph.core.repository import clone
+from splitgraph.core.server import (
+    _download_file,
+    _download_range,
+    delete_object_files,
+    list_objects,
+    list_partial_downloads,
+)
 from splitgraph.engine import ResultShape
 from splitgraph.exceptions import IncompleteObjectUploadError, IncompleteObjectDownloadError
 from splitgraph.hooks.s3 import S3ExternalObjectHandler
@@ -13,6 +23,7 @@ from splitgraph.hooks.s3_server import (
     get_object_download_urls,
     S3_HOST,
     S3_PORT,
+    S3_BUCKET,
 )
 
 
@@ -257,3 +268,101 @@ def test_pull_download_error(local_engine_empty, unprivileged_pg_repo, clean_min
         )
         == 2
     )
+
+
+@pytest.mark.registry
+def test_s3_ranged_download(clean_minio, tmp_path):
+    # Upload a 2.5MB file and download it in 1MB parts
+    data = os.urandom(int(2.5 * 1024 * 1024))
+    clean_minio.put_object(S3_BUCKET, "large_object", BytesIO(data), len(data))
+    url = clean_minio.presigned_get_object(S3_BUCKET, "large_object")
+    path = str(tmp_path / "large_object")
+
+    with patch.dict(CONFIG, {"SG_OBJECT_TRANSFER_PART_SIZE": "1"}):
+        _download_file(url, path)
+        with open(path, "rb") as f:
+            assert f.read() == data
+        assert not os.path.exists(path + ".partial")
+        assert not os.path.exists(path + ".parts")
+
+        # Simulate a failed download where only the second part was fetched:
+        # the next download should only get the missing last part.
+        os.remove(path)
+        with open(path + ".partial", "wb") as f:
+            f.write(b"\0" * 1024 * 1024 + data[1024 * 1024 : 2 * 1024 * 1024])
+            f.truncate(len(data))
+        with open(path + ".parts", "w") as f:
+            f.write("%d\n%d\n" % (len(data), 1024 * 1024))
+
+        with patch(
+            "splitgraph.core.server._download_range", wraps=_download_range
+        ) as download_range:
+            _download_file(url, path)
+        assert download_range.call_args_list == [
+            call(url, path + ".partial", 2 * 1024 * 1024, len(data) - 1)
+        ]
+        with open(path, "rb") as f:
+            assert f.read() == data
+
+
+def test_download_unknown_size(tmp_path):
+    # If the server doesn't know the size of the file (Content-Range: bytes 0-N/*),
+    # it gets downloaded in one go instead of in parts.
+    data = b"some data"
+
+    def _response(status_code, headers):
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = headers
+        response.raw = BytesIO(data)
+        response.__enter__.return_value = response
+        return response
+
+    ranged = _response(206, {"Content-Range": "bytes 0-1048575/*"})
+    full = _response(200, {})
+    path = str(tmp_path / "object")
+    with patch("requests.get", side_effect=[ranged, full]) as get:
+        _download_file("http://example.com/object", path)
+
+    assert len(get.call_args_list) == 2
+    assert "headers" not in get.call_args_list[1][1]
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize(
+    "status_code,part",
+    [
+        # The server ignored the range and sent the whole file
+        (200, b"0123456789"),
+        # The part got cut short
+        (206, b"45"),
+    ],
+)
+def test_download_range_mismatch(tmp_path, status_code, part):
+    # Parts whose response doesn't match the requested range raise, so that they don't get
+    # recorded as done and the next download fetches them again.
+    response = MagicMock()
+    response.status_code = status_code
+    response.iter_content.return_value = [part]
+    response.__enter__.return_value = response
+    path = str(tmp_path / "object.partial")
+    with open(path, "wb") as f:
+        f.truncate(10)
+
+    with patch("requests.get", return_value=response):
+        with pytest.raises(IOError):
+            _download_range("http://example.com/object", path, 4, 7)
+
+
+def test_delete_partial_downloads(tmp_path):
+    for f in ["o1", "o1.footer", "o1.schema", "o2.partial", "o2.parts", "o2.footer.partial"]:
+        (tmp_path / f).touch()
+
+    with patch("splitgraph.core.server.SG_ENGINE_OBJECT_PATH", str(tmp_path)):
+        assert list_objects() == ["o1"]
+        assert list_partial_downloads() == ["o2"]
+
+        delete_object_files("o2")
+        assert list_partial_downloads() == []
+        assert sorted(os.listdir(str(tmp_path))) == ["o1", "o1.footer", "o1.schema"]
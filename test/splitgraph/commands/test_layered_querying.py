@@ -14,7 +14,7 @@ from splitgraph.core.fragment_manager import get_chunk_groups
 from splitgraph.core.indexing.range import extract_min_max_pks
 from splitgraph.core.object_manager import ObjectManager
 from splitgraph.core.repository import clone, Repository
-from splitgraph.core.table import _generate_select_query
+from splitgraph.core.table import _generate_select_query, QUERY_PLAN_CACHE
 from splitgraph.engine import ResultShape, _prepare_engine_config
 from splitgraph.engine.postgres.engine import PostgresEngine
 from splitgraph.exceptions import ObjectNotFoundError
@@ -147,6 +147,7 @@ class TestLayeredQuerying:
         table = lq_test_repo.head.get_table("fruits")
 
         quals, expected = ([[("fruit_id", "=", "2")]], [{"name": "guitar", "timestamp": _DT}])
+        QUERY_PLAN_CACHE.clear()
 
         # Check "query plan" is reused and the table doesn't run qual filtering again
         with mock.patch.object(
@@ -157,6 +158,14 @@ class TestLayeredQuerying:
             table.query(columns=["name", "timestamp"], quals=quals)
             assert fo.call_count == 1
 
+            # The plan is shared with other instances of the same table
+            other_table = lq_test_repo.images[table.image.image_hash].get_table("fruits")
+            assert other_table is not table
+            other_plan = other_table.get_query_plan(quals=quals, columns=["name", "timestamp"])
+            assert fo.call_count == 1
+            assert other_plan.table is other_table
+            assert (QUERY_PLAN_CACHE.hits, QUERY_PLAN_CACHE.misses) == (2, 1)
+
         query_plan = table.get_query_plan(quals=quals, columns=["name", "timestamp"])
         assert query_plan.estimated_rows == 2
         assert len(query_plan.required_objects) == 4
@@ -174,6 +183,60 @@ def test_layered_querying_against_single_fragment(pg_repo_local):
     ) == [(2, "guitar", 1, _DT), (3, "mayonnaise", 1, _DT)]
 
 
+def test_direct_table_lq_parallel(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(20):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    head = OUTPUT.commit(chunk_size=5)
+    table = head.get_table("test")
+    assert len(table.objects) == 4
+
+    expected = [{"key": i, "value_1": "val_%d" % i} for i in range(20)]
+    sequential = table.query(columns=["key", "value_1"], quals=[], workers=1)
+    _assert_dict_list_equal(sequential, expected)
+
+    with mock.patch.object(
+        PostgresEngine, "run_sql_iter", wraps=OUTPUT.object_engine.run_sql_iter
+    ) as rsi:
+        # Results are returned in the same order as when scanning fragments sequentially
+        assert table.query(columns=["key", "value_1"], quals=[], workers=4) == sequential
+        # Fragments don't overlap, so all of them were scanned in parallel
+        assert rsi.call_count == 0
+
+    with table.query_lazy(columns=["key", "value_1"], quals=[], workers=4, ordered=False) as r:
+        _assert_dict_list_equal(list(r), expected)
+
+
+def test_lq_pipelined_downloads(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(20):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    table = OUTPUT.commit(chunk_size=5).get_table("test")
+    expected = table.query(columns=["key", "value_1"], quals=[])
+
+    with mock.patch.dict(CONFIG, {"SG_LQ_DOWNLOAD_BATCH_SIZE": "2"}), mock.patch.object(
+        ObjectManager, "ensure_objects", wraps=OUTPUT.objects.ensure_objects
+    ) as ensure_objects:
+        tables, callback, plan = table.query_indirect(columns=["key", "value_1"], quals=None)
+        assert len(plan.singletons) == 4
+
+        # Objects are only claimed (and downloaded) when the caller gets to them.
+        assert ensure_objects.call_count == 0
+        next(tables)
+        assert ensure_objects.call_count == 1
+        assert ensure_objects.call_args_list[0][1]["objects"] == plan.singletons[:2]
+
+        assert len(list(tables)) == 3
+        assert ensure_objects.call_count == 2
+        assert ensure_objects.call_args_list[1][1]["objects"] == plan.singletons[2:]
+        assert len(callback) == 2
+        callback()
+
+        assert table.query(columns=["key", "value_1"], quals=[]) == expected
+
+
 def test_layered_querying_type_conversion(pg_repo_local):
     # For type bigint, Multicorn for some reason converts quals to be strings. Test we can handle that.
     prepare_lq_repo(pg_repo_local, commit_after_every=False, include_pk=True)
@@ -665,7 +728,8 @@ def test_disjoint_table_lq_two_singletons_one_overwritten_indirect(pg_repo_local
     pg_repo_local.run_sql("INSERT INTO fruits VALUES (4, 'fruit_4'), (5, 'fruit_5')")
     fruits = pg_repo_local.commit().get_table("fruits")
 
-    tables, callback, _ = fruits.query_indirect(columns=["fruit_id", "name"], quals=None)
+    with mock.patch.dict(CONFIG, {"SG_LQ_MERGE_ON_READ": "false"}):
+        tables, callback, _ = fruits.query_indirect(columns=["fruit_id", "name"], quals=None)
 
     # At this point, we've "claimed" all objects but haven't done anything with them.
     # We're not really testing object claiming here since the objects were created locally
@@ -710,6 +774,112 @@ def test_disjoint_table_lq_two_singletons_one_overwritten_indirect(pg_repo_local
     assert not pg_repo_local.engine.table_exists(SPLITGRAPH_META_SCHEMA, tmp_table)
 
 
+def test_disjoint_table_lq_merge_on_read(pg_repo_local):
+    # Check overlapping fragments are merged with a read-only query instead of
+    # going through a staging table.
+    prepare_lq_repo(pg_repo_local, commit_after_every=True, include_pk=True)
+    pg_repo_local.run_sql("INSERT INTO fruits VALUES (4, 'fruit_4'), (5, 'fruit_5')")
+    fruits = pg_repo_local.commit().get_table("fruits")
+
+    with mock.patch.object(
+        PostgresEngine, "apply_fragments", wraps=pg_repo_local.engine.apply_fragments
+    ) as apply_fragments:
+        tables, callback, plan = fruits.query_indirect(columns=["fruit_id", "name"], quals=None)
+        tables = list(tables)
+        assert apply_fragments.call_count == 0
+
+    # Two singletons and one merge query for the group of overlapping fragments
+    assert len(tables) == 3
+    assert len(plan.non_singleton_groups) == 1
+    assert tables[2].startswith(b"(SELECT ")
+    assert len(callback) == 1
+    callback()
+
+    # Results are the same as when using a staging table, including when the
+    # qualifiers reference columns that were changed by later fragments.
+    for quals in [
+        None,
+        [[("fruit_id", "=", "2")]],
+        [[("fruit_id", ">", "1")], [("fruit_id", "<", "4")]],
+        [[("name", "=", "orange")]],
+        [[("name", "=", "guitar")]],
+    ]:
+        expected = fruits.query(columns=["fruit_id", "name"], quals=quals)
+        with mock.patch.dict(CONFIG, {"SG_LQ_MERGE_ON_READ": "false"}):
+            _assert_dict_list_equal(
+                fruits.query(columns=["fruit_id", "name"], quals=quals), expected
+            )
+
+
+def test_lq_no_pk_duplicate_rows(local_engine_empty):
+    # Tables without a PK can't be merged on read: they can have duplicate rows and rows
+    # that only differ in non-indexable columns, which have to be kept.
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER, value_1 VARCHAR, value_2 JSON)")
+    OUTPUT.run_sql(
+        "INSERT INTO test VALUES (1, 'a', '{}'), (1, 'a', '{}'), "
+        "(2, 'b', '{\"x\": 1}'), (2, 'b', '{\"x\": 2}'), (3, 'c', '[]')"
+    )
+    OUTPUT.commit()
+    OUTPUT.run_sql("INSERT INTO test VALUES (1, 'a', '{}')")
+    OUTPUT.run_sql("UPDATE test SET value_1 = 'updated' WHERE key = 3")
+    table = OUTPUT.commit().get_table("test")
+    expected = sorted(OUTPUT.run_sql("SELECT key, value_1, value_2::text FROM test"), key=str)
+
+    # Merging on read is enabled by default but the group still gets applied to a staging table.
+    tables, callback, plan = table.query_indirect(columns=["key", "value_1", "value_2"], quals=None)
+    tables = list(tables)
+    callback()
+    assert len(plan.non_singleton_groups) == 1
+    assert not any(t.startswith(b"(SELECT ") for t in tables)
+
+    result = table.query(columns=["key", "value_1", "value_2"], quals=None)
+    assert len(result) == 6
+    assert (
+        sorted([(r["key"], r["value_1"], json.dumps(r["value_2"])) for r in result], key=str)
+        == expected
+    )
+
+
+@pytest.mark.parametrize("merge_on_read", [True, False])
+def test_lq_groups_released_early(local_engine_empty, merge_on_read):
+    # Make a table with two groups of overlapping fragments and check that
+    # objects in the first group are released before we get to the second one.
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(10):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    OUTPUT.commit(chunk_size=5)
+    OUTPUT.run_sql("UPDATE test SET value_1 = 'updated' WHERE key IN (2, 7)")
+    table = OUTPUT.commit(split_changeset=True).get_table("test")
+
+    with mock.patch.dict(
+        CONFIG, {"SG_LQ_MERGE_ON_READ": "true" if merge_on_read else "false"}
+    ), mock.patch.object(ObjectManager, "_release_objects") as release_objects:
+        tables, callback, plan = table.query_indirect(columns=["key", "value_1"], quals=None)
+        groups = plan.non_singleton_groups
+        assert len(groups) == 2
+
+        next(tables)
+        if merge_on_read:
+            # The group is released once the caller asks for the next query.
+            assert release_objects.call_args_list == []
+        else:
+            # The group is released as soon as it's been applied to the staging table.
+            assert release_objects.call_args_list == [call(groups[0])]
+
+        next(tables)
+        assert release_objects.call_args_list[0] == call(groups[0])
+
+        with pytest.raises(StopIteration):
+            next(tables)
+        assert release_objects.call_args_list[:2] == [call(groups[0]), call(groups[1])]
+
+        # Objects that have been released don't get released again.
+        callback()
+        assert release_objects.call_args_list[-1] == call([])
+
+
 def test_disjoint_table_lq_temp_table_deletion_doesnt_lock_up(pg_repo_local):
     # When Multicorn reads from the temporary table, it does that in the context of the
     # transaction that it's been called from. It hence can hold a read lock on the
@@ -721,7 +891,8 @@ def test_disjoint_table_lq_temp_table_deletion_doesnt_lock_up(pg_repo_local):
     pg_repo_local.run_sql("INSERT INTO fruits VALUES (4, 'fruit_4'), (5, 'fruit_5')")
     fruits = pg_repo_local.commit().get_table("fruits")
 
-    tables, callback, plan = fruits.query_indirect(columns=["fruit_id", "name"], quals=None)
+    with mock.patch.dict(CONFIG, {"SG_LQ_MERGE_ON_READ": "false"}):
+        tables, callback, plan = fruits.query_indirect(columns=["fruit_id", "name"], quals=None)
 
     # Force a materialization and get the query that makes us read from the temporary table.
     last_table = list(tables)[-1]
@@ -1,6 +1,10 @@
+from unittest import mock
+
 import pytest
 
+from splitgraph.config import CONFIG
 from splitgraph.core.repository import Repository
+from splitgraph.core.table import Table
 from splitgraph.engine import ResultShape
 from splitgraph.exceptions import ImageNotFoundError
 
@@ -170,3 +174,167 @@ def test_repository_validation():
 
     Repository("", "repository")
     Repository("namespace", "repository")
+
+
+def test_parallel_checkout(pg_repo_local):
+    head = pg_repo_local.head
+    pg_repo_local.run_sql("INSERT INTO fruits VALUES (3, 'mayonnaise')")
+    pg_repo_local.run_sql("CREATE TABLE new_table AS SELECT 1 AS key")
+    new_head = pg_repo_local.commit()
+
+    head.checkout(workers=2)
+    assert sorted(pg_repo_local.engine.get_all_tables(pg_repo_local.to_schema())) == [
+        "fruits",
+        "vegetables",
+    ]
+    assert pg_repo_local.head == head
+    assert pg_repo_local.run_sql("SELECT * FROM fruits") == [(1, "apple"), (2, "orange")]
+
+    new_head.checkout(workers=2)
+    assert sorted(pg_repo_local.engine.get_all_tables(pg_repo_local.to_schema())) == [
+        "fruits",
+        "new_table",
+        "vegetables",
+    ]
+    assert pg_repo_local.run_sql("SELECT * FROM fruits") == [
+        (1, "apple"),
+        (2, "orange"),
+        (3, "mayonnaise"),
+    ]
+
+    # The new tables are tracked by the audit triggers.
+    assert not pg_repo_local.has_pending_changes()
+    pg_repo_local.run_sql("DELETE FROM new_table")
+    assert pg_repo_local.has_pending_changes()
+    new_head.checkout(force=True, workers=2)
+    assert pg_repo_local.run_sql("SELECT * FROM new_table") == [(1,)]
+
+
+def test_parallel_checkout_failure(pg_repo_local):
+    head = pg_repo_local.head
+    pg_repo_local.run_sql("INSERT INTO fruits VALUES (3, 'mayonnaise')")
+    new_head = pg_repo_local.commit()
+
+    original_materialize = Table.materialize
+
+    def _materialize(self, destination, *args, **kwargs):
+        if self.table_name == "vegetables":
+            raise ValueError("Materialization failed")
+        return original_materialize(self, destination, *args, **kwargs)
+
+    with mock.patch.object(Table, "materialize", _materialize):
+        with pytest.raises(ValueError):
+            head.checkout(workers=2)
+
+    # The previous checkout is left intact.
+    assert pg_repo_local.head == new_head
+    assert sorted(pg_repo_local.engine.get_all_tables(pg_repo_local.to_schema())) == [
+        "fruits",
+        "vegetables",
+    ]
+    assert pg_repo_local.run_sql("SELECT * FROM fruits") == [
+        (1, "apple"),
+        (2, "orange"),
+        (3, "mayonnaise"),
+    ]
+
+
+def _make_fragmented_table(repo):
+    repo.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(20):
+        repo.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    disjoint = repo.commit(chunk_size=5)
+
+    # Overwrite and delete rows spanning the first two fragments.
+    repo.run_sql("UPDATE test SET value_1 = 'updated' WHERE key IN (3, 7)")
+    repo.run_sql("DELETE FROM test WHERE key = 4")
+    overlapping = repo.commit()
+    return disjoint, overlapping
+
+
+def test_materialize_bulk_load(pg_repo_local):
+    disjoint, overlapping = _make_fragmented_table(pg_repo_local)
+    engine = pg_repo_local.object_engine
+
+    # Fragments that don't overlap get loaded without applying them to one another.
+    table = disjoint.get_table("test")
+    assert len(table.objects) == 4
+    with mock.patch.object(engine, "apply_fragments", wraps=engine.apply_fragments) as af:
+        table.materialize("test_bulk", destination_schema=pg_repo_local.to_schema())
+    assert af.call_count == 0
+    assert pg_repo_local.run_sql("SELECT * FROM test_bulk ORDER BY key") == [
+        (i, "val_%d" % i) for i in range(20)
+    ]
+    assert engine.get_primary_keys(pg_repo_local.to_schema(), "test_bulk") == [("key", "integer")]
+
+    # Overlapping fragments are applied to one another, the rest are loaded directly.
+    table = overlapping.get_table("test")
+    with mock.patch.object(engine, "apply_fragments", wraps=engine.apply_fragments) as af:
+        table.materialize("test_bulk", destination_schema=pg_repo_local.to_schema())
+    assert af.call_count > 0
+    assert sum(len(c[0][0]) for c in af.call_args_list) < len(table.objects)
+
+    with mock.patch.dict(CONFIG, {"SG_MATERIALIZE_BULK_LOAD": "false"}):
+        table.materialize("test_legacy", destination_schema=pg_repo_local.to_schema())
+
+    expected = pg_repo_local.run_sql("SELECT * FROM test_legacy ORDER BY key")
+    assert len(expected) == 19
+    assert (3, "updated") in expected
+    assert pg_repo_local.run_sql("SELECT * FROM test_bulk ORDER BY key") == expected
+    assert engine.get_primary_keys(pg_repo_local.to_schema(), "test_bulk") == [("key", "integer")]
+    # No temporary staging tables are left over.
+    assert (
+        engine.run_sql(
+            "SELECT COUNT(*) FROM pg_tables WHERE tablename LIKE 'sg_tmp_%%'",
+            return_shape=ResultShape.ONE_ONE,
+        )
+        == 0
+    )
+
+
+def test_incremental_checkout(pg_repo_local):
+    disjoint, overlapping = _make_fragmented_table(pg_repo_local)
+    pg_repo_local.run_sql("INSERT INTO test VALUES (20, 'val_20')")
+    appended = pg_repo_local.commit()
+    engine = pg_repo_local.object_engine
+
+    def _check_contents(image):
+        rows = image.get_table("test").query(columns=["key", "value_1"], quals=None)
+        assert pg_repo_local.run_sql("SELECT * FROM test ORDER BY key") == sorted(
+            (r["key"], r["value_1"]) for r in rows
+        )
+
+    disjoint.checkout()
+    with mock.patch.object(
+        Table, "materialize", autospec=True, side_effect=Table.materialize
+    ) as materialize:
+        # Only the new patches get applied to the test table.
+        appended.checkout()
+        assert materialize.call_count == 0
+        _check_contents(appended)
+        assert not pg_repo_local.has_pending_changes()
+
+        # The table is still tracked by the audit triggers.
+        pg_repo_local.run_sql("DELETE FROM test WHERE key = 20")
+        assert pg_repo_local.has_pending_changes()
+
+        # The table has been changed: it has to be rematerialized.
+        overlapping.checkout(force=True)
+        assert [c[0][0].table_name for c in materialize.call_args_list] == ["test"]
+        _check_contents(overlapping)
+
+        # Checking out an earlier image rematerializes the table.
+        disjoint.checkout()
+        assert materialize.call_count == 2
+        _check_contents(disjoint)
+
+        # The feature can be turned off.
+        with mock.patch.dict(CONFIG, {"SG_CHECKOUT_INCREMENTAL": "false"}):
+            overlapping.checkout()
+        assert materialize.call_count == 3
+        _check_contents(overlapping)
+
+        # Tables that haven't changed don't get rematerialized with parallel checkouts either.
+        appended.checkout(workers=2)
+        assert materialize.call_count == 3
+        _check_contents(appended)
@@ -11,6 +11,7 @@ from splitgraph.commandline.engine import copy_to_container
 from splitgraph.config import SPLITGRAPH_META_SCHEMA, CONFIG
 from splitgraph.core.common import META_TABLES
 from splitgraph.core.engine import get_current_repositories
+from splitgraph.core.metadata_manager import OBJECT_META_CACHE
 from splitgraph.core.object_manager import ObjectManager
 from splitgraph.core.registry import (
     setup_registry_mode,
@@ -241,6 +242,8 @@ def clean_out_engine(engine):
     )
     ObjectManager(engine).cleanup()
     engine.commit()
+    # Some tests change the object metadata behind the object manager's back.
+    OBJECT_META_CACHE.clear()
 
 
 with open(
@@ -412,6 +415,7 @@ def readonly_pg_repo(unprivileged_remote_engine, pg_repo_remote_registry):
         (READONLY_NAMESPACE, REMOTE_NAMESPACE),
     )
     pg_repo_remote_registry.engine.commit()
+    OBJECT_META_CACHE.clear()
     yield Repository.from_template(target, engine=unprivileged_remote_engine)
 
 
@@ -0,0 +1,124 @@
+import json
+from unittest import mock
+
+from click.testing import CliRunner
+from test.splitgraph.conftest import OUTPUT
+
+from splitgraph.commandline.cache import stats_c
+from splitgraph.config import CONFIG
+from splitgraph.core import access_stats
+from splitgraph.core.access_stats import (
+    AccessStatsRecorder,
+    get_access_stats_recorder,
+    get_object_access_stats,
+    get_table_access_stats,
+    qual_shape,
+)
+
+
+def test_qual_shape():
+    assert qual_shape(None) == []
+    assert qual_shape([[("key", "<", 5)], [("value", "=", "a"), ("key", ">", 10)]]) == [
+        [["key", "<"]],
+        [["key", ">"], ["value", "="]],
+    ]
+
+
+def test_access_stats_recorder_batching():
+    engine = mock.MagicMock()
+    engine.name = "test_engine"
+    table = mock.MagicMock()
+    table.repository.namespace = "test"
+    table.repository.repository = "repo"
+    table.image.image_hash = "abcdef"
+    table.table_name = "table"
+
+    with mock.patch.dict(
+        CONFIG, {"SG_ACCESS_STATS_FLUSH_INTERVAL": "3600", "SG_ACCESS_STATS_QUALS": "2"}
+    ):
+        recorder = AccessStatsRecorder(engine)
+
+    recorder.record_objects([("o1", 100, 10), ("o2", 200, 20)])
+    recorder.record_objects([("o1", 100, 10)])
+    for quals in (
+        [[("key", "=", 1)]],
+        [[("value", "=", "a")]],
+        [[("key", "=", 2)]],
+        [[("key", ">", 2)]],
+        None,
+    ):
+        recorder.record_table_query(
+            table, quals, fragments_total=4, fragments_scanned=1, rows_scanned=5
+        )
+
+    # Nothing gets written out until the flush interval has passed.
+    recorder.flush_if_needed()
+    assert engine.run_sql_batch.call_count == 0
+
+    recorder.flush()
+    assert engine.run_sql_batch.call_count == 2
+    object_rows = engine.run_sql_batch.call_args_list[0][0][1]
+    assert [r[:4] for r in object_rows] == [("o1", 2, 200, 20), ("o2", 1, 200, 20)]
+
+    table_rows = engine.run_sql_batch.call_args_list[1][0][1]
+    assert len(table_rows) == 1
+    assert table_rows[0][:8] == ("test", "repo", "abcdef", "table", 5, 20, 5, 25)
+    # Only the last 2 distinct qualifier shapes are kept, most recent first.
+    assert json.loads(table_rows[0][9]) == [[[["key", ">"]]], [[["key", "="]]]]
+    assert table_rows[0][10] == 2
+
+    # Statistics are reset after being flushed.
+    recorder.flush()
+    assert engine.run_sql_batch.call_count == 2
+
+    # Pending statistics can be discarded.
+    recorder.record_objects([("o1", 100, 10)])
+    recorder.clear()
+    recorder.flush()
+    assert engine.run_sql_batch.call_count == 2
+
+
+def test_access_stats_end_to_end(local_engine_empty):
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, value_1 VARCHAR)")
+    for i in range(20):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s)", (i, "val_%d" % i))
+    table = OUTPUT.commit(chunk_size=5).get_table("test")
+    assert len(table.objects) == 4
+
+    with mock.patch.dict(
+        CONFIG, {"SG_ACCESS_STATS": "true", "SG_ACCESS_STATS_FLUSH_INTERVAL": "0"}
+    ), mock.patch.dict(access_stats._RECORDERS, clear=True):
+        assert table.query(columns=["key"], quals=[[("key", "<", 5)]]) == [
+            {"key": i} for i in range(5)
+        ]
+        assert len(table.query(columns=["key"], quals=[])) == 20
+
+        table_stats = get_table_access_stats(OUTPUT.engine)
+        assert len(table_stats) == 1
+        assert table_stats[0].table_name == "test"
+        assert table_stats[0].query_count == 2
+        assert table_stats[0].fragments_total == 8
+        assert table_stats[0].fragments_scanned == 5
+        assert table_stats[0].rows_scanned == 25
+        assert table_stats[0].last_quals == [[[["key", "<"]]]]
+
+        object_stats = get_object_access_stats(OUTPUT.engine)
+        assert sorted(o.object_id for o in object_stats) == sorted(table.objects)
+        assert [o.scan_count for o in object_stats] == [2, 1, 1, 1]
+        assert sum(o.rows_read for o in object_stats) == 25
+
+        runner = CliRunner()
+        result = runner.invoke(stats_c, catch_exceptions=False)
+        assert result.exit_code == 0
+        assert "output:" + table.image.image_hash[:12] in result.output
+        assert "(key <)" in result.output
+        assert object_stats[0].object_id in result.output
+
+        result = runner.invoke(stats_c, ["--reset"], catch_exceptions=False)
+        assert result.exit_code == 0
+        assert get_table_access_stats(OUTPUT.engine) == []
+        assert get_object_access_stats(OUTPUT.engine) == []
+
+    # Statistics aren't recorded by default.
+    assert get_access_stats_recorder(OUTPUT.engine) is None
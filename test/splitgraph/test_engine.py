@@ -20,6 +20,8 @@ from splitgraph.engine.postgres.engine import (
     _API_VERSION,
     _paginate_by_size,
     PsycopgEngine,
+    KeepAliveConnectionPool,
+    _CopyStream,
 )
 from splitgraph.exceptions import (
     EngineInitializationError,
@@ -156,6 +158,26 @@ def test_object_not_found_error(pg_repo_local):
         pg_repo_local.engine.run_sql("SELECT * FROM splitgraph_meta." + fruits.objects[0])
 
 
+def test_run_sql_iter(local_engine_empty):
+    query = "SELECT i, i * 2 AS j FROM generate_series(1, 25) i"
+    result = local_engine_empty.run_sql_iter(query, batch_size=10)
+    assert next(result) == (1, 2)
+    assert list(result) == [(i, i * 2) for i in range(2, 26)]
+
+    result = list(local_engine_empty.run_sql_iter(query + " WHERE i > %s", (20,), named=True))
+    assert [r.j for r in result] == [42, 44, 46, 48, 50]
+
+    # Check errors roll back the transaction and get reraised
+    with pytest.raises(psycopg2.errors.UndefinedTable):
+        list(local_engine_empty.run_sql_iter("SELECT * FROM nonexistent_table"))
+    assert local_engine_empty.run_sql("SELECT 1") == [(1,)]
+
+    # Streaming also works outside of a transaction
+    conn_params = _prepare_engine_config(CONFIG)
+    engine = PostgresEngine(conn_params=conn_params, name="test_engine", autocommit=True)
+    assert list(engine.run_sql_iter(query, batch_size=10)) == [(i, i * 2) for i in range(1, 26)]
+
+
 def test_engine_autocommit(local_engine_empty):
     conn_params = _prepare_engine_config(CONFIG)
     engine = PostgresEngine(conn_params=conn_params, name="test_engine", autocommit=True)
@@ -167,6 +189,75 @@ def test_engine_autocommit(local_engine_empty):
     assert repository_exists(Repository.from_template(repo, engine=local_engine_empty))
 
 
+def test_engine_keepalive(local_engine_empty):
+    conn_params = _prepare_engine_config(CONFIG)
+    with mock.patch.dict(CONFIG, {"SG_ENGINE_KEEPALIVE": "true"}):
+        engine = PostgresEngine(conn_params=conn_params, name="test_engine")
+    assert isinstance(engine._pool, KeepAliveConnectionPool)
+
+    try:
+        pid = engine.run_sql("SELECT pg_backend_pid()", return_shape=ResultShape.ONE_ONE)
+        engine.commit()
+        assert engine.run_sql("SELECT pg_backend_pid()", return_shape=ResultShape.ONE_ONE) == pid
+        engine.rollback()
+        assert engine._pool.connects == 1
+        assert engine._pool.reuses == 1
+
+        # Connections that have been closed or are too old get replaced.
+        engine.connection.close()
+        engine.commit()
+        assert engine.run_sql("SELECT 1") == [(1,)]
+        engine.commit()
+        engine._pool.max_age = 0
+        assert engine.run_sql("SELECT 1") == [(1,)]
+        assert engine._pool.connects == 3
+        assert engine._pool.reuses == 3
+    finally:
+        engine._pool.closeall()
+
+
+def test_copy_stream():
+    # Lines only get consumed from the iterator as COPY reads them.
+    consumed = []
+
+    def _lines():
+        for i in range(10):
+            consumed.append(i)
+            yield "%d\tvalue_%d\n" % (i, i)
+
+    stream = _CopyStream(_lines())
+    first = stream.read(12)
+    assert first == "0\tvalue_0\n1\t"
+    assert consumed == [0, 1]
+
+    rest = ""
+    while True:
+        data = stream.read(5)
+        if not data:
+            break
+        rest += data
+    assert first + rest == "".join("%d\tvalue_%d\n" % (i, i) for i in range(10))
+
+
+def test_keepalive_pool_cap():
+    # Connections put back into the pool when it already holds `maxconn` idle connections
+    # get closed instead of being kept.
+    pool = KeepAliveConnectionPool(minconn=0, maxconn=1)
+    conns = [MagicMock(closed=False) for _ in range(2)]
+    for i, conn in enumerate(conns):
+        conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        pool._used[i] = conn
+        pool._rused[id(conn)] = i
+
+    for conn in conns:
+        pool.putconn(conn)
+
+    assert pool._pool == [conns[0]]
+    assert not pool._used
+    conns[0].close.assert_not_called()
+    conns[1].close.assert_called_once()
+
+
 @pytest.mark.registry
 def test_client_api_compat(unprivileged_remote_engine):
     with pytest.raises(ValueError) as e:
@@ -0,0 +1,202 @@
+import tempfile
+from datetime import datetime as dt, timedelta
+
+import pytest
+from click.testing import CliRunner
+
+from splitgraph.commandline.cache import simulate_c
+from splitgraph.core.eviction import (
+    ARCPolicy,
+    CacheEntry,
+    DecayPolicy,
+    GDSFPolicy,
+    LFUPolicy,
+    LRUPolicy,
+    SizeAdmissionPolicy,
+    TRACE_TIMESTAMP_FORMAT,
+    get_eviction_policy,
+    read_trace,
+    simulate,
+    EVICTION_POLICIES,
+)
+
+NOW = dt(2020, 1, 1)
+
+
+def _entry(object_id, size=100, age=0, access_count=1):
+    return CacheEntry(object_id, size, NOW - timedelta(seconds=age), access_count)
+
+
+def _victims(policy, candidates, required_space):
+    return [v.object_id for v in policy.select_victims(candidates, required_space, NOW)]
+
+
+def test_decay_policy():
+    policy = DecayPolicy(decay=0.002, floor=100)
+    # An object that hasn't been used for a while goes first, unless the other object is much smaller.
+    assert _victims(policy, [_entry("o1", age=0), _entry("o2", age=600)], 100) == ["o2"]
+    assert _victims(policy, [_entry("o1", age=0, size=100), _entry("o2", size=10000)], 100) == [
+        "o1"
+    ]
+    # Enough objects get evicted to free the required space.
+    assert _victims(policy, [_entry("o1"), _entry("o2", age=1), _entry("o3", age=2)], 150) == [
+        "o3",
+        "o2",
+    ]
+    assert _victims(policy, [_entry("o1")], 0) == []
+
+
+def test_lru_lfu_policies():
+    candidates = [_entry("o1", age=10, access_count=5), _entry("o2", age=0, access_count=1)]
+    assert _victims(LRUPolicy(), candidates, 100) == ["o1"]
+
+    # LFU falls back to access counts from the cache status table for objects it hasn't seen.
+    policy = LFUPolicy()
+    assert _victims(policy, candidates, 100) == ["o2"]
+
+    # Accesses that the policy has seen take precedence.
+    for _ in range(10):
+        policy.on_access(_entry("o2"))
+    policy.on_access(_entry("o1"))
+    assert _victims(policy, candidates, 100) == ["o1"]
+
+    # Once evicted, the policy forgets about the object's accesses.
+    policy.on_evict(_entry("o2"))
+    assert "o2" not in policy._counts
+
+
+def test_gdsf_policy():
+    policy = GDSFPolicy(floor=1)
+    big = _entry("big", size=1000)
+    small = _entry("small", size=10)
+    policy.on_access(big)
+    policy.on_access(small)
+
+    # Big objects are evicted first, since they free more space per unit of refetching cost.
+    assert _victims(policy, [big, small], 10) == ["big"]
+    assert policy.inflation == 0
+
+    # Evicting an object inflates the priority of objects accessed afterwards.
+    policy.on_evict(big)
+    assert policy.inflation == 1
+    policy.on_access(big)
+    assert policy.priority(big, NOW) == 2
+
+
+def test_arc_policy():
+    # Objects the policy hasn't seen are classified by their access count.
+    policy = ARCPolicy(cache_size=300)
+    unknown_once = _entry("u1", age=100)
+    unknown_twice = _entry("u2", age=100, access_count=2)
+    assert _victims(policy, [unknown_twice, unknown_once], 100) == ["u1"]
+
+    o1, o2, o3 = _entry("o1"), _entry("o2"), _entry("o3")
+    for entry in (o1, o2, o3):
+        policy.on_access(entry)
+    # o1 has been used twice and is in T2: evict objects that have only been used once first.
+    policy.on_access(o1)
+    assert _victims(policy, [o1, o2, o3], 100) == ["o2"]
+    assert _victims(policy, [o1, o2, o3], 200) == ["o2", "o3"]
+
+    # Evicted objects go into the ghost lists and accessing them again adapts the T1 target size.
+    policy.on_evict(o2)
+    assert "o2" in policy._b1
+    policy.on_access(o2)
+    assert policy.target == 100
+    assert "o2" in policy._t2
+
+    # T1 (o3) is now within its target size, so objects that were used more than once get evicted.
+    assert _victims(policy, [o1, o2, o3], 100) == ["o1"]
+
+
+def test_size_admission_policy():
+    policy = SizeAdmissionPolicy(max_size=100)
+    assert policy.admit(_entry("small", size=100))
+    assert not policy.admit(_entry("big", size=1000))
+    # The object was rejected, but the policy remembers that it was used.
+    assert policy.admit(_entry("big", size=1000))
+    assert policy.admit(_entry("big2", size=1000, access_count=2))
+
+    policy = SizeAdmissionPolicy(max_size=100, history_size=1)
+    assert not policy.admit(_entry("big", size=1000))
+    assert not policy.admit(_entry("big2", size=1000))
+    assert not policy.admit(_entry("big", size=1000))
+
+
+def test_get_eviction_policy():
+    assert isinstance(get_eviction_policy("LRU", cache_size=100), LRUPolicy)
+    assert get_eviction_policy("arc", cache_size=100).cache_size == 100
+    assert get_eviction_policy("decay", cache_size=100, decay=0.1, floor=5).floor == 5
+
+    with pytest.raises(ValueError) as e:
+        get_eviction_policy("mru", cache_size=100)
+    assert "Unknown eviction policy mru" in str(e.value)
+
+
+def _scan_trace():
+    # A small working set that's accessed repeatedly, interleaved with one-off accesses
+    # to large objects.
+    trace = []
+    time = NOW
+    for i in range(20):
+        for object_id in ("hot1", "hot2", "hot3"):
+            time += timedelta(seconds=1)
+            trace.append((time, object_id, 100))
+        time += timedelta(seconds=1)
+        trace.append((time, "scan_%d" % i, 250))
+    return trace
+
+
+@pytest.mark.parametrize("policy", list(EVICTION_POLICIES))
+def test_simulate(policy):
+    trace = _scan_trace()
+    result = simulate(trace, 500, get_eviction_policy(policy, cache_size=500, floor=1))
+    assert result.hits + result.misses == len(trace)
+    assert result.bytes_hit + result.bytes_missed == sum(t[2] for t in trace)
+    # All one-off objects are misses.
+    assert result.misses >= 20
+    assert 0 <= result.hit_ratio <= 1
+
+
+def test_simulate_admission():
+    trace = _scan_trace()
+
+    # With LRU, every large object pushes one of the frequently used objects out of the cache.
+    result = simulate(trace, 500, LRUPolicy())
+    assert result.hits == 0
+
+    # With admission control, large objects that have only been used once are evicted as soon
+    # as they've been used, so every large object only pushes one other object out of the cache.
+    result = simulate(trace, 500, LRUPolicy(), SizeAdmissionPolicy(max_size=200))
+    assert result.hits == 38
+    assert result.misses == 42
+    assert result.evictions == 20
+
+
+def test_simulate_object_larger_than_cache():
+    trace = [(NOW, "o1", 1000), (NOW, "o1", 1000)]
+    result = simulate(trace, 500, LRUPolicy())
+    assert result.hits == 0
+    assert result.misses == 2
+
+
+def test_cache_simulate_cli():
+    with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+        for timestamp, object_id, size in _scan_trace():
+            f.write("%s,%s,%d\n" % (timestamp.strftime(TRACE_TIMESTAMP_FORMAT), object_id, size))
+        f.flush()
+
+        with open(f.name) as trace:
+            assert list(read_trace(trace)) == _scan_trace()
+
+        runner = CliRunner()
+        result = runner.invoke(
+            simulate_c,
+            [f.name, "--cache-size", "1", "--policy", "lru", "--policy", "arc"],
+            catch_exceptions=False,
+        )
+    assert result.exit_code == 0
+    assert "lru" in result.output
+    assert "arc" in result.output
+    assert "gdsf" not in result.output
+    assert "100.00%" not in result.output
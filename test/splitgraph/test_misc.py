@@ -4,10 +4,10 @@ from unittest.mock import patch
 import pytest
 from psycopg2.errors import CheckViolation
 
-from splitgraph.core.common import Tracer, adapt, coerce_val_to_json
+from splitgraph.core.common import Tracer, adapt, coerce_val_to_json, LRUCache
 from splitgraph.core.output import parse_dt
 from splitgraph.core.engine import lookup_repository
-from splitgraph.core.metadata_manager import Object
+from splitgraph.core.metadata_manager import Object, OBJECT_META_CACHE
 from splitgraph.core.repository import Repository
 from splitgraph.engine.postgres.engine import API_MAX_QUERY_LENGTH
 from splitgraph.exceptions import RepositoryNotFoundError
@@ -291,6 +291,58 @@ def test_pg_type_adapt():
     assert adapt("2.0", "numeric") == 2.0
 
 
+def test_lru_cache():
+    cache = LRUCache(maxsize=10, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get_many(["a", "c"]) == {"a": "aaaa"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # "b" is the least recently used entry and gets evicted to make space for "c"
+    cache.put("c", "cccc")
+    assert "b" not in cache
+    assert cache.get_many(["a", "b", "c"]) == {"a": "aaaa", "c": "cccc"}
+    assert cache.size == 8
+
+    # Values that are bigger than the cache aren't stored at all
+    cache.put("d", "d" * 11)
+    assert len(cache) == 2
+
+    cache.invalidate(["a"])
+    assert cache.get_many(["a", "c"]) == {"c": "cccc"}
+    assert cache.size == 4
+
+
+def test_min_max_pks_cached(pg_repo_local):
+    table = pg_repo_local.head.get_table("fruits")
+    table_pks = [(c.name, c.pg_type) for c in table.table_schema if c.is_pk] or [
+        (c.name, c.pg_type) for c in table.table_schema
+    ]
+    min_max = pg_repo_local.objects.get_min_max_pks(table.objects, table_pks)
+
+    with patch.object(
+        pg_repo_local.objects.metadata_engine, "run_chunked_sql", side_effect=AssertionError
+    ):
+        assert pg_repo_local.objects.get_min_max_pks(table.objects, table_pks) == min_max
+
+
+def test_object_meta_cached(pg_repo_local):
+    objects = pg_repo_local.head.get_table("fruits").objects
+    meta = pg_repo_local.objects.get_object_meta(objects)
+
+    hits = OBJECT_META_CACHE.hits
+    with patch.object(
+        pg_repo_local.objects.metadata_engine, "run_chunked_sql", side_effect=AssertionError
+    ):
+        assert pg_repo_local.objects.get_object_meta(objects) == meta
+    assert OBJECT_META_CACHE.hits == hits + len(objects)
+
+    # Overwriting the object invalidates its cache entry.
+    new_meta = meta[objects[0]]._replace(rows_inserted=42)
+    pg_repo_local.objects.register_objects([new_meta])
+    assert pg_repo_local.objects.get_object_meta([objects[0]]) == {objects[0]: new_meta}
+
+
 def test_val_to_json():
     assert coerce_val_to_json(datetime(2010, 1, 1)) == "2010-01-01 00:00:00"
     assert coerce_val_to_json([1, 2, datetime(2010, 1, 1)]) == [1, 2, "2010-01-01 00:00:00"]
@@ -11,11 +11,15 @@ from test.splitgraph.conftest import (
     prepare_lq_repo,
 )
 
-from splitgraph.config import SPLITGRAPH_META_SCHEMA
+from splitgraph.config import SPLITGRAPH_META_SCHEMA, CONFIG
+from splitgraph.core.eviction import SizeAdmissionPolicy
 from splitgraph.core.indexing.range import _quals_to_clause
+from splitgraph.core.metadata_manager import OBJECT_META_CACHE
+from splitgraph.core.object_manager import ObjectManager
 from splitgraph.core.repository import clone
 from splitgraph.core.sql import select
-from splitgraph.engine import ResultShape
+from splitgraph.engine import ResultShape, _prepare_engine_config
+from splitgraph.engine.postgres.engine import PostgresEngine
 from splitgraph.exceptions import ObjectCacheError
 
 
@@ -142,6 +146,106 @@ def test_object_cache_non_existing_objects(local_engine_empty, pg_repo_remote, c
     assert fruits_v3.objects[0] in str(e.value)
 
 
+def test_object_cache_wait_for_other_downloads(local_engine_empty, pg_repo_remote, clean_minio):
+    pg_repo_local = _setup_object_cache_test(pg_repo_remote)
+    object_manager = pg_repo_local.objects
+    fruits_v3 = pg_repo_local.images["latest"].get_table("fruits")
+    objects = sorted(fruits_v3.objects)
+
+    # Simulate another process downloading the same objects on a different connection.
+    other_engine = PostgresEngine(conn_params=_prepare_engine_config(CONFIG), name="other_engine")
+    other_manager = ObjectManager(other_engine)
+    try:
+        for manager in [other_manager, object_manager]:
+            manager._claim_objects(objects)
+            manager.object_engine.commit()
+
+        # The other manager gets to download the objects first.
+        to_fetch, in_flight = other_manager._prepare_fetch_list(objects)
+        assert sorted(to_fetch) == objects
+        assert in_flight == []
+
+        # We don't block on the whole cache and don't try to download the objects again.
+        to_fetch, in_flight = object_manager._prepare_fetch_list(objects)
+        assert to_fetch == []
+        assert sorted(in_flight) == objects
+
+        # The other manager downloads one object and fails to download the other one.
+        other_manager._set_ready_flags([objects[0]], is_ready=True)
+        other_manager._delete_cache_entries([objects[1]])
+        other_engine.commit()
+
+        # We only have to get the failed object ourselves.
+        assert object_manager._wait_for_downloads(objects) == [objects[1]]
+    finally:
+        other_engine.rollback()
+        other_engine.close()
+
+
+def test_object_cache_leases(local_engine_empty, pg_repo_remote, clean_minio):
+    pg_repo_local = _setup_object_cache_test(pg_repo_remote)
+    with mock.patch.dict(CONFIG, {"SG_OBJECT_LEASE_TIME": "3600"}):
+        object_manager = ObjectManager(pg_repo_local.objects.object_engine)
+    fruits_v2 = pg_repo_local.images[pg_repo_local.images["latest"].parent_id].get_table("fruits")
+    fruit_snap = fruits_v2.objects[0]
+
+    try:
+        with object_manager.ensure_objects(fruits_v2) as required_objects:
+            assert required_objects == [fruit_snap]
+            assert _get_refcount(object_manager, fruit_snap) == 1
+
+        # The process keeps its claim on the object after it's done with it.
+        assert _get_refcount(object_manager, fruit_snap) == 1
+        last_used = _get_last_used(object_manager, fruit_snap)
+
+        # Using the object again doesn't write to the cache status table.
+        with object_manager.ensure_objects(fruits_v2) as required_objects:
+            assert required_objects == [fruit_snap]
+            assert _get_refcount(object_manager, fruit_snap) == 1
+        assert _get_refcount(object_manager, fruit_snap) == 1
+        assert _get_last_used(object_manager, fruit_snap) == last_used
+
+        # The lease hasn't expired yet and can only be released forcibly.
+        object_manager.flush_leases()
+        assert _get_refcount(object_manager, fruit_snap) == 1
+        object_manager.flush_leases(force=True)
+        assert _get_refcount(object_manager, fruit_snap) == 0
+    finally:
+        object_manager.flush_leases(force=True)
+        object_manager.object_engine.commit()
+
+
+def test_object_cache_admission(local_engine_empty, pg_repo_remote, clean_minio):
+    pg_repo_local = _setup_object_cache_test(pg_repo_remote)
+    object_manager = pg_repo_local.objects
+    # Only admit objects smaller than 100 bytes to the cache on their first use.
+    object_manager.admission_policy = SizeAdmissionPolicy(max_size=100)
+    fruits_v2 = pg_repo_local.images[pg_repo_local.images["latest"].parent_id].get_table("fruits")
+    fruit_snap = fruits_v2.objects[0]
+
+    # The object is larger than the admission limit and gets evicted after its first use.
+    with object_manager.ensure_objects(fruits_v2):
+        assert fruit_snap in object_manager.get_downloaded_objects()
+    assert fruit_snap not in object_manager.get_downloaded_objects()
+    _assert_cache_occupancy(object_manager, 0)
+
+    # The second time it's used, it's kept in the cache.
+    with object_manager.ensure_objects(fruits_v2):
+        pass
+    assert fruit_snap in object_manager.get_downloaded_objects()
+
+    with object_manager.ensure_objects(fruits_v2):
+        pass
+    assert (
+        object_manager.object_engine.run_sql(
+            select("object_cache_status", "access_count", "object_id = %s"),
+            (fruit_snap,),
+            return_shape=ResultShape.ONE_ONE,
+        )
+        == 2
+    )
+
+
 def test_object_cache_eviction(local_engine_empty, pg_repo_remote, clean_minio):
     pg_repo_local = _setup_object_cache_test(pg_repo_remote)
 
@@ -284,6 +388,7 @@ def test_object_cache_eviction_orphaned(local_engine_empty, pg_repo_remote, clea
         + ")",
         fruits_v3.objects,
     )
+    OBJECT_META_CACHE.clear()
 
     # Make sure the eviction works deleting orphaned objects as well.
     object_manager.run_eviction(keep_objects=[], required_space=0)
@@ -1,4 +1,5 @@
 import operator
+import random
 from functools import reduce
 from hashlib import sha256
 
@@ -8,6 +9,7 @@ from test.splitgraph.conftest import OUTPUT, PG_DATA, load_splitfile
 from splitgraph.config import SPLITGRAPH_META_SCHEMA
 from splitgraph.core.fragment_manager import Digest
 from splitgraph.core.repository import Repository
+from splitgraph.engine import ResultShape
 from splitgraph.splitfile import execute_commands
 
 TEST_ROWS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
@@ -57,6 +59,25 @@ def test_digest_negation():
     assert (Digest.from_hex(HASH_SUM) + neg_dig).hex() == sub_sum.hex()
 
 
+def test_digest_batch_sum():
+    # Summing up multiple hashes at once gives the same result as adding them up one-by-one.
+    assert Digest.from_memoryviews(TEST_ROW_HASHES_BYTES).hex() == HASH_SUM
+    assert Digest.from_memoryviews([]).hex() == Digest.empty().hex()
+
+    # Check the wraparound with a lot of random hashes spanning multiple batches.
+    random_hashes = [
+        sha256(str(random.getrandbits(64)).encode("ascii")).digest() for _ in range(25000)
+    ]
+    assert (
+        Digest.from_memoryviews(random_hashes).hex()
+        == _sum_digests(map(Digest.from_memoryview, random_hashes)).hex()
+    )
+    assert (
+        Digest.from_memoryviews(memoryview(h) for h in random_hashes).hex()
+        == _sum_digests(map(Digest.from_memoryview, random_hashes)).hex()
+    )
+
+
 def test_base_fragment_hashing(pg_repo_local):
     fruits = pg_repo_local.head.get_table("fruits")
 
@@ -85,6 +106,59 @@ def test_base_fragment_hashing(pg_repo_local):
     assert om.calculate_content_hash(pg_repo_local.to_schema(), "fruits") == (insertion_hash, 2)
 
 
+def test_lthash_sum_aggregate(local_engine_empty):
+    # Check the engine-side hash aggregation matches the Digest implementation.
+    query = "SELECT splitgraph_api.lthash_sum(digest(r, 'sha256')) FROM unnest(%s::text[]) r"
+    result = local_engine_empty.run_sql(query, (TEST_ROWS,), return_shape=ResultShape.ONE_ONE)
+    assert Digest.from_memoryview(result).hex() == HASH_SUM
+
+    result = local_engine_empty.run_sql(query, ([],), return_shape=ResultShape.ONE_ONE)
+    assert Digest.from_memoryview(result).hex() == Digest.empty().hex()
+
+
+def test_content_hash_client_side(pg_repo_local):
+    # Check that hashing on the client (on engines that don't have the LtHash aggregate)
+    # gives the same result as hashing on the engine.
+    om = pg_repo_local.objects
+    assert om._lthash_sum_available()
+    engine_hash = om.calculate_content_hash(pg_repo_local.to_schema(), "fruits")
+
+    om._has_lthash_sum = False
+    assert om.calculate_content_hash(pg_repo_local.to_schema(), "fruits") == engine_hash
+
+
+def test_base_fragment_stats_single_pass(local_engine_empty):
+    # Check that the hash and the index computed in one pass over the source table
+    # are the same as the ones computed by scanning the new object.
+    OUTPUT.init()
+    OUTPUT.run_sql(
+        "CREATE TABLE test (key_1 INTEGER, key_2 VARCHAR, value NUMERIC, "
+        "PRIMARY KEY (key_1, key_2))"
+    )
+    for i in range(10):
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s, %s)", (i % 3, "key_%d" % (9 - i), i * 1.5))
+
+    om = OUTPUT.objects
+    table_schema = local_engine_empty.get_full_table_schema(OUTPUT.to_schema(), "test")
+    extra_indexes = {"bloom": {"key_2": {"probability": 0.01}, "value": {"size": 16}}}
+    object_id = om.create_base_fragment(
+        OUTPUT.to_schema(),
+        "test",
+        OUTPUT.namespace,
+        extra_indexes=extra_indexes,
+        table_schema=table_schema,
+    )
+
+    content_hash, rows, object_index = om._calculate_base_fragment_stats(
+        OUTPUT.to_schema(), "test", table_schema, extra_indexes=extra_indexes
+    )
+    assert (content_hash, rows) == om.calculate_content_hash(OUTPUT.to_schema(), "test")
+    assert object_index == om.generate_object_index(
+        object_id, table_schema, extra_indexes=extra_indexes
+    )
+    assert object_index["range"]["$pk"] == ((0, "key_0"), (2, "key_7"))
+
+
 def test_base_fragment_reused(pg_repo_local):
     fruits = pg_repo_local.head.get_table("fruits")
 
@@ -434,3 +508,51 @@ def test_import_query_reuses_hash(pg_repo_local):
     assert v2.get_table("fruits_all").objects == v1.get_table("fruits_all").objects
     assert v2.get_table("fruits_one").objects == v1.get_table("fruits_one").objects
     assert len(OUTPUT.objects.get_all_objects()) == 3  # No new objects have been created.
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_table_content_hash_random_patches(seed, local_engine_empty):
+    # Check that the content hash assembled from object metadata matches the hash of the
+    # materialized table after a random chain of inserts, updates and deletes.
+    rng = random.Random(seed)
+    OUTPUT.init()
+    OUTPUT.run_sql("CREATE TABLE test (key INTEGER PRIMARY KEY, val1 INTEGER, val2 VARCHAR)")
+    keys = list(range(20))
+    for key in keys:
+        OUTPUT.run_sql("INSERT INTO test VALUES (%s, %s, %s)", (key, key, "val_%d" % key))
+    OUTPUT.commit(chunk_size=5)
+    om = OUTPUT.objects
+
+    for i in range(10):
+        for _ in range(rng.randint(1, 5)):
+            action = rng.choice(["insert", "update", "delete"]) if keys else "insert"
+            if action == "insert":
+                key = max(keys, default=0) + rng.randint(-5, 10)
+                OUTPUT.run_sql(
+                    "INSERT INTO test VALUES (%s, %s, %s) ON CONFLICT (key) DO UPDATE "
+                    "SET val1 = EXCLUDED.val1, val2 = EXCLUDED.val2",
+                    (key, rng.randint(0, 100), "inserted_%d" % i),
+                )
+                if key not in keys:
+                    keys.append(key)
+            elif action == "update":
+                OUTPUT.run_sql(
+                    "UPDATE test SET val1 = %s, val2 = %s WHERE key = %s",
+                    (rng.randint(0, 100), "updated_%d" % i, rng.choice(keys)),
+                )
+            else:
+                key = rng.choice(keys)
+                OUTPUT.run_sql("DELETE FROM test WHERE key = %s", (key,))
+                keys.remove(key)
+        table = OUTPUT.commit(split_changeset=rng.random() < 0.5).get_table("test")
+
+        content_hash, rows = om.calculate_content_hash(OUTPUT.to_schema(), "test")
+        assert rows == len(keys)
+        assert table.content_hash() == content_hash
+
+    # The content hash doesn't depend on how the table is split into objects.
+    OUTPUT.run_sql("CREATE TABLE test_copy AS SELECT * FROM test")
+    OUTPUT.run_sql("ALTER TABLE test_copy ADD PRIMARY KEY (key)")
+    copy = OUTPUT.commit(chunk_size=7).get_table("test_copy")
+    assert copy.objects != table.objects
+    assert copy.content_hash() == table.content_hash()